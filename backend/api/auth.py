@@ -4,21 +4,39 @@ Zeus OAuth Authentication Module
 This module provides OAuth authentication using Zeus' zauth system.
 """
 
+import os
 import tomllib
 from pathlib import Path
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.conf import settings
 from authlib.integrations.requests_client import OAuth2Session
+import logging
 import requests
 
-# Load configuration
+logger = logging.getLogger(__name__)
+
+# Load configuration; without a config.toml (a fresh checkout, CI, the
+# load-testing harness) fall back to the template's placeholders, which the
+# ZAUTH_* environment variables below can override
 config_path = Path(settings.BASE_DIR) / 'config.toml'
+if not config_path.exists():
+    logger.debug("%s not found, using config.toml.template (set ZAUTH_* to configure)", config_path)
+    config_path = config_path.with_name('config.toml.template')
 with open(config_path, 'rb') as f:
     config = tomllib.load(f)
 
-ZAUTH_CONFIG = config['zauth']
+ZAUTH_CONFIG = {
+    'user_info_url': 'https://zauth.zeus.gent/current_user',
+    **config['zauth'],
+}
+
+# Any key can be overridden from the environment as ZAUTH_<KEY>, e.g.
+# ZAUTH_AUTHORIZE_URL, so the load-testing harness can swap in its stub
+for key in list(ZAUTH_CONFIG):
+    ZAUTH_CONFIG[key] = os.environ.get(f'ZAUTH_{key.upper()}', ZAUTH_CONFIG[key])
 
 
 def get_oauth_session(token=None, state=None):
@@ -60,32 +78,31 @@ def get_user_info(access_token):
     
     # Try multiple endpoints - Zeus might use different paths
     endpoints = [
-        f"https://zauth.zeus.gent/current_user"
+        ZAUTH_CONFIG['user_info_url']
     ]
     
     errors = []
     
     for endpoint in endpoints:
         try:
-            print(f"Trying endpoint: {endpoint}")
+            logger.debug("Trying endpoint: %s", endpoint)
             response = requests.get(endpoint, headers=headers, timeout=10)
             
-            print(f"Response status: {response.status_code}")
+            logger.debug("Response status: %s", response.status_code)
             
             if response.status_code == 200:
                 user_data = response.json()
-                print(f"✓ Successfully fetched user info from: {endpoint}")
-                print(f"User data: {user_data}")
+                logger.info("Fetched user info from %s", endpoint)
                 return user_data
             else:
                 error_msg = f"{response.status_code} - {response.text[:200]}"
                 errors.append(f"{endpoint}: {error_msg}")
-                print(f"✗ Failed at {endpoint}: {error_msg}")
+                logger.warning("Failed at %s: %s", endpoint, error_msg)
                 
         except requests.exceptions.RequestException as e:
             error_msg = str(e)
             errors.append(f"{endpoint}: {error_msg}")
-            print(f"✗ Exception at {endpoint}: {error_msg}")
+            logger.warning("Exception at %s: %s", endpoint, error_msg)
             continue
     
     # All endpoints failed
@@ -93,20 +110,74 @@ def get_user_info(access_token):
     raise Exception(f"Failed to fetch user info from all endpoints:\n{full_error}")
 
 
+def compact_user(user_info):
+    """
+    Reduce a zauth user dict to the fields the app uses.
+
+    Only this record is kept in the session, so a cookie or cache backed
+    session stays small.
+    
+    Args:
+        user_info: User dict returned by zauth
+    
+    Returns:
+        dict: id, username, name and picture
+    """
+    return {
+        'id': user_info.get('id'),
+        'username': user_info.get('username'),
+        'name': user_info.get('name', user_info.get('username')),
+        'picture': user_info.get('picture'),
+    }
+
+
+def compact_token(token):
+    """
+    Keep only non-secret token metadata for the session.
+
+    The access token itself is only needed during the callback to fetch the
+    user, so it is never persisted.
+    
+    Args:
+        token: OAuth token dict
+    
+    Returns:
+        dict: token_type, scope and expires_at
+    """
+    return {
+        'token_type': token.get('token_type'),
+        'scope': token.get('scope'),
+        'expires_at': token.get('expires_at'),
+    }
+
+
 def login_required(view_func):
     """
     Decorator to require authentication for a view.
     
-    Returns 401 if user is not authenticated.
+    Returns 401 if user is not authenticated. Works for both sync and
+    async views; async views check the session without blocking the loop.
     """
+    def unauthorized():
+        return JsonResponse({
+            'success': False,
+            'error': 'Authentication required',
+            'login_url': '/api/auth/login'
+        }, status=401)
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not await request.session.ahas_key('user'):
+                return unauthorized()
+            return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         if 'user' not in request.session:
-            return JsonResponse({
-                'success': False,
-                'error': 'Authentication required',
-                'login_url': '/api/auth/login'
-            }, status=401)
+            return unauthorized()
         return view_func(request, *args, **kwargs)
     
     wrapper.__name__ = view_func.__name__
@@ -126,6 +197,19 @@ def get_current_user(request):
     return request.session.get('user')
 
 
+async def aget_current_user(request):
+    """
+    Async version of get_current_user for use in async views.
+    
+    Args:
+        request: Django request object
+    
+    Returns:
+        dict: User information or None if not authenticated
+    """
+    return await request.session.aget('user')
+
+
 def is_authenticated(request):
     """
     Check if the current request is authenticated.
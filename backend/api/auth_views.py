@@ -2,6 +2,8 @@
 Authentication views for Zeus OAuth integration
 """
 
+import logging
+
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.views.decorators.http import require_http_methods
@@ -9,11 +11,15 @@ from django.views.decorators.csrf import csrf_exempt
 from .auth import (
     get_oauth_session, 
     get_user_info, 
+    compact_user,
+    compact_token,
     get_current_user,
     is_authenticated,
     ZAUTH_CONFIG
 )
 
+logger = logging.getLogger(__name__)
+
 url = "http://localhost:5173"
 # url = "http://192.168.0.107:5173"
 
@@ -71,8 +77,7 @@ def callback(request):
             client_secret=ZAUTH_CONFIG['client_secret']
         )
         
-        print(f"Token received. Keys: {token.keys()}")
-        print(f"Token contents: {token}")
+        logger.debug("Token received. Keys: %s", list(token.keys()))
         
         # Try to get user info - first check if it's in the token response
         user_info = None
@@ -80,38 +85,42 @@ def callback(request):
         # Some OAuth providers include user info in the token response
         if 'user' in token:
             user_info = token['user']
-            print("User info found in token response")
+            logger.debug("User info found in token response")
         elif 'userinfo' in token:
             user_info = token['userinfo']
-            print("Userinfo found in token response")
+            logger.debug("Userinfo found in token response")
         else:
             # Fetch user information from API using the standard userinfo endpoint
             userinfo_url = f"{ZAUTH_CONFIG['api_base_url']}/user"
-            print(f"Trying to fetch user info from: {userinfo_url}")
+            logger.debug("Trying to fetch user info from: %s", userinfo_url)
             
             try:
                 user_info = get_user_info(token['access_token'])
-                print(f"User info retrieved successfully: {user_info}")
+                logger.debug("User info retrieved for %s", user_info.get("username"))
             except Exception as user_error:
                 # Log the full error and fail authentication
-                print(f"ERROR: Failed to fetch user info: {user_error}")
-                print(f"Token access_token present: {'access_token' in token}")
+                logger.error("Failed to fetch user info: %s (access_token present: %s)",
+                             user_error, 'access_token' in token)
                 
                 # Instead of creating a fake user, return an error
                 import urllib.parse
                 error_msg = urllib.parse.quote(f"Failed to get user info: {str(user_error)}")
                 return redirect(f'{url}/?login=error&message={error_msg}')
         
-        # Store user info and token in session
-        request.session['user'] = user_info
-        request.session['oauth_token'] = token
+        # Store a compact user record and token metadata in session
+        request.session['user'] = compact_user(user_info)
+        request.session['oauth_token'] = compact_token(token)
         
-        # Create or update leaderboard entry for this user
-        from .views import get_or_create_user_leaderboard_entry
+        # Create or update leaderboard entry for this user. This is the only
+        # place the picture is synced; the entry id is memoised in the session
+        # so request handlers don't have to look it up again.
+        from .views import LEADERBOARD_ENTRY_SESSION_KEY, get_or_create_user_leaderboard_entry
+        request.session.pop(LEADERBOARD_ENTRY_SESSION_KEY, None)
         try:
-            get_or_create_user_leaderboard_entry(user_info)
+            entry = get_or_create_user_leaderboard_entry(user_info)
+            request.session[LEADERBOARD_ENTRY_SESSION_KEY] = entry.id
         except Exception as e:
-            print(f"Warning: Failed to create/update leaderboard entry: {e}")
+            logger.warning("Failed to create/update leaderboard entry: %s", e)
         
         # Clean up state
         request.session.pop('oauth_state', None)
@@ -239,7 +248,8 @@ def debug_token(request):
     # Don't expose the full token for security
     return JsonResponse({
         'authenticated': True,
-        'has_access_token': 'access_token' in token,
+        # The access token is not kept after login (see compact_token)
+        'has_access_token': False,
         'token_type': token.get('token_type'),
         'user_keys': list(user.keys()) if user else [],
         'username': user.get('username', 'N/A'),
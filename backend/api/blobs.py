@@ -0,0 +1,59 @@
+"""
+Compact storage for submission source code and grader results.
+
+Blobs are compressed with zstandard when the optional `zstandard` package is
+installed, and with zlib otherwise. The first byte of every blob names its
+codec, so rows written by either keep decoding after the package is added
+or removed.
+
+Source code lives in SubmissionCode, one row per distinct text (keyed by
+its sha256), since many submissions resubmit identical code. Results are
+stored per submission, compressed JSON.
+"""
+
+import hashlib
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, zlib is always available
+    zstandard = None
+
+CODEC_ZLIB = b'z'
+CODEC_ZSTD = b's'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def pack(data):
+    """Compress bytes into a blob, prefixed with its codec."""
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, ZLIB_LEVEL)
+
+
+def unpack(blob):
+    """Decompress a blob written by `pack`."""
+    blob = bytes(blob)  # PostgreSQL hands back a memoryview
+    codec, payload = blob[:1], blob[1:]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Decoding this blob needs the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f'Unknown blob codec {codec!r}')
+
+
+def code_hash(code):
+    """sha256 hex digest identifying a source text."""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def pack_results(results):
+    return pack(json.dumps(results, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_results(blob):
+    return json.loads(unpack(blob)) if blob else []
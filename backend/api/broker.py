@@ -0,0 +1,143 @@
+"""
+Publish/subscribe broker for pushing live updates to connected clients.
+
+Publishers are ordinary (sync) code such as views, model helpers and the
+grading worker; subscribers are async streaming views. Two implementations:
+
+- InProcessBroker (default): delivers to subscribers in the same process.
+  Enough for a single backend process and for tests, but updates published
+  by other processes (other web workers, grade_submissions) are not seen.
+- RedisBroker: Redis pub/sub, shared by every process. Selected with
+  LEADERBOARD_BROKER = 'redis' (the default when REDIS_URL is set).
+
+Messages are JSON-serialisable dicts. A subscriber that falls too far behind
+loses messages and has `lagged` set, so it can resynchronise from the
+database instead.
+"""
+
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+
+# Messages buffered per subscriber before it is considered lagged
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class InProcessSubscription:
+    def __init__(self, broker, channel):
+        self._broker = broker
+        self.channel = channel
+        self.lagged = False
+        self._loop = None
+        self._queue = None
+
+    async def __aenter__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._broker._add(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._broker._remove(self)
+
+    def _deliver(self, message):
+        # Runs on the subscriber's event loop
+        if self._queue.full():
+            self.lagged = True
+        else:
+            self._queue.put_nowait(message)
+
+    def deliver(self, message):
+        """Hand a message over from any thread."""
+        self._loop.call_soon_threadsafe(self._deliver, message)
+
+    async def get(self, timeout):
+        """Next message, or None if nothing arrives within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def _add(self, subscription):
+        with self._lock:
+            self._subscriptions.setdefault(subscription.channel, set()).add(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            self._subscriptions.get(subscription.channel, set()).discard(subscription)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:  # its event loop has shut down
+                self._remove(subscription)
+
+    def subscribe(self, channel):
+        """Async context manager yielding a subscription with `get(timeout)`."""
+        return InProcessSubscription(self, channel)
+
+
+class RedisSubscription:
+    def __init__(self, url, channel):
+        self._url = url
+        self.channel = channel
+        self.lagged = False  # Redis drops slow subscribers itself
+        self._client = None
+        self._pubsub = None
+
+    async def __aenter__(self):
+        import redis.asyncio
+
+        self._client = redis.asyncio.Redis.from_url(self._url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+    async def get(self, timeout):
+        message = await self._pubsub.get_message(timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+
+class RedisBroker:
+    def __init__(self, url):
+        import redis  # Only needed when this broker is configured
+
+        self._url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self._client.publish(channel, json.dumps(message, separators=(',', ':')))
+
+    def subscribe(self, channel):
+        return RedisSubscription(self._url, channel)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker selected by settings.LEADERBOARD_BROKER."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.LEADERBOARD_BROKER == 'redis':
+                _broker = RedisBroker(settings.REDIS_URL)
+            else:
+                _broker = InProcessBroker()
+        return _broker
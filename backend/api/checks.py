@@ -0,0 +1,21 @@
+"""
+System checks for settings that only matter once several processes serve
+the site. They are deploy checks, so they run with `manage.py check --deploy`
+and not on every management command.
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .suite_cache import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_rate_limits(app_configs, **kwargs):
+    if settings.RATE_LIMIT_ENABLED and not cache_is_shared():
+        return [Warning(
+            "Rate limits use a per-process cache, so the global limits apply per process.",
+            hint="Set REDIS_URL to share them between the backend processes.",
+            id='api.W001',
+        )]
+    return []
@@ -0,0 +1,242 @@
+"""
+Submission grading queue.
+
+`/test/` only records a pending Submission; the `grade_submissions` management
+command runs a pool of workers that claim pending submissions, send them to
+the grader and store the verdict. Clients poll the submission status or
+subscribe to its event stream for the result.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import problem_stats, score_history, upstream, versions
+from .models import LeaderboardEntry, Submission
+from .utils import adjust_scores
+from .suite_cache import get_test_suite
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (Submission.STATUS_DONE, Submission.STATUS_FAILED)
+
+
+def serialize_submission_result(submission):
+    """
+    Build the client-facing payload for a submission job.
+
+    Args:
+        submission: Submission instance
+
+    Returns:
+        dict: Job status and, once graded, the verdict
+    """
+    data = {
+        'success': True,
+        'submission_id': submission.id,
+        'problem_id': submission.problem_id,
+        'status': submission.status,
+    }
+    if submission.status == Submission.STATUS_DONE:
+        data.update({
+            'submission_correct': submission.submission_correct,
+            'results': submission.results or [],
+            'total_tests': submission.total_tests,
+            'passed_tests': submission.passed_tests,
+        })
+    elif submission.status == Submission.STATUS_FAILED:
+        data['error'] = submission.error or 'Grading failed'
+    return data
+
+
+def submission_dedupe_key(user_entry_id, problem_id, code, suite_hash):
+    """
+    Hash identifying a grading run whose verdict can be reused.
+
+    Grading is deterministic, so the same user sending the same code for
+    the same problem against an unchanged test suite gets the same verdict.
+
+    Args:
+        user_entry_id: The submitter's LeaderboardEntry id
+        problem_id: The problem being tested
+        code: The submitted code
+        suite_hash: TestSuite.suite_hash of the problem's current tests
+
+    Returns:
+        str: sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    for part in (str(user_entry_id), str(problem_id), suite_hash, code):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def requeue_expired_jobs():
+    """
+    Hand running jobs whose lease expired back to the queue.
+
+    A job is running only while a worker holds it; if the worker died the job
+    would otherwise stay running forever. Jobs that used up their attempts
+    are marked failed instead.
+
+    Returns:
+        int: Number of jobs requeued or failed
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SUBMISSION_LEASE_SECONDS)
+    expired = Submission.objects.filter(status=Submission.STATUS_RUNNING, started_at__lt=cutoff)
+    failed = expired.filter(attempts__gte=settings.SUBMISSION_MAX_ATTEMPTS).update(
+        status=Submission.STATUS_FAILED,
+        error='Grading timed out',
+        finished_at=timezone.now(),
+    )
+    requeued = expired.update(status=Submission.STATUS_PENDING)
+    return failed + requeued
+
+
+def claim_next_submission(batch=10):
+    """
+    Atomically claim the oldest pending submission for this worker.
+
+    The claim is a conditional UPDATE on the status column, so concurrent
+    workers (in any number of processes) never grade the same job twice.
+
+    Args:
+        batch: How many candidates to look at per query
+
+    Returns:
+        Submission or None if the queue is empty
+    """
+    candidates = list(
+        Submission.objects.filter(status=Submission.STATUS_PENDING)
+        .order_by('id')
+        .values_list('id', flat=True)[:batch]
+    )
+    for submission_id in candidates:
+        claimed = Submission.objects.filter(
+            id=submission_id, status=Submission.STATUS_PENDING
+        ).update(
+            status=Submission.STATUS_RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            # The worker only writes the results, never reads them
+            return Submission.objects.select_related('problem', 'source').defer('results_blob').get(id=submission_id)
+    return None
+
+
+def record_verdict(submission, result):
+    """
+    Store the grader's verdict and award points on a first solve.
+
+    The write only lands while this worker still holds the claim: if the
+    lease expired and the job was handed to another worker (or already
+    finished), nothing is recorded, so stats and points are counted once.
+
+    Args:
+        submission: The claimed Submission
+        result: The grader response dict
+
+    Returns:
+        bool: False if the claim was lost and the verdict discarded
+    """
+    total_tests = result.get('total_tests', 0)
+    passed_tests = result.get('passed_tests', 0)
+    is_correct = result.get('correct', False)
+
+    with transaction.atomic():
+        # Lock the submitter so two of their submissions finishing at the
+        # same time cannot both count as the first solve.
+        entry = LeaderboardEntry.objects.select_for_update().get(id=submission.submisser_id)
+
+        submission.submission_correct = is_correct
+        submission.results = result.get('results', [])
+        submission.total_tests = total_tests
+        submission.passed_tests = passed_tests
+        submission.status = Submission.STATUS_DONE
+        submission.error = ''
+        submission.finished_at = timezone.now()
+        stored = Submission.objects.filter(
+            id=submission.id, status=Submission.STATUS_RUNNING, attempts=submission.attempts
+        ).update(
+            submission_correct=is_correct,
+            results_blob=submission.results_blob,
+            total_tests=total_tests,
+            passed_tests=passed_tests,
+            status=Submission.STATUS_DONE,
+            error='',
+            finished_at=submission.finished_at,
+        )
+        if not stored:
+            logger.warning("Discarding the verdict for submission %s: attempt %s lost its claim",
+                           submission.id, submission.attempts)
+            return False
+
+        # The submitter's other submissions for this problem, for the first
+        # solve check and the problem's stats
+        earlier = Submission.objects.filter(
+            problem_id=submission.problem_id,
+            submisser_id=entry.id,
+        ).exclude(id=submission.id).aggregate(
+            graded=Count('id', filter=Q(status=Submission.STATUS_DONE)),
+            correct=Count('id', filter=Q(submission_correct=True)),
+        )
+        previous_correct = earlier['correct'] > 0
+        problem_stats.record_graded_submission(submission, earlier['graded'], previous_correct)
+        if is_correct and not previous_correct:
+            versions.bump_version(versions.LEADERBOARD)  # a newly solved problem
+
+        # If all tests passed, award points the first time the problem is solved
+        if total_tests > 0 and total_tests == passed_tests:
+            if not previous_correct:
+                adjust_scores({entry.id: submission.problem.points}, score_history.REASON_SOLVE)
+    return True
+
+
+def record_failure(submission, error):
+    """
+    Put a submission back in the queue, or fail it after the last attempt.
+
+    Like record_verdict, this does nothing once the claim was lost.
+
+    Args:
+        submission: The claimed Submission
+        error: Description of what went wrong
+    """
+    final = submission.attempts >= settings.SUBMISSION_MAX_ATTEMPTS
+    Submission.objects.filter(
+        id=submission.id, status=Submission.STATUS_RUNNING, attempts=submission.attempts
+    ).update(
+        status=Submission.STATUS_FAILED if final else Submission.STATUS_PENDING,
+        error=str(error),
+        finished_at=timezone.now() if final else None,
+    )
+
+
+def grade(submission):
+    """
+    Grade one claimed submission against its problem's current test suite.
+
+    Args:
+        submission: A Submission in the running state
+
+    Returns:
+        bool: True if a verdict was recorded
+    """
+    try:
+        suite = get_test_suite(submission.problem_id)
+        result = upstream.grade_submission(submission.problem_id, submission.code, suite.payload)
+    except Exception as e:
+        logger.warning("Grading submission %s failed (attempt %s): %s",
+                       submission.id, submission.attempts, e)
+        record_failure(submission, e)
+        return False
+
+    return record_verdict(submission, result)
+
@@ -0,0 +1,82 @@
+"""
+Live leaderboard updates for the `/api/leaderboard/events/` stream.
+
+Every score change goes through score_history.record_score_events, which
+calls `publish_score_changes` once its transaction commits. Subscribers get
+a compact `delta` message holding only the players whose score changed,
+with their new score and rank; clients merge it into the board they hold
+and re-sort. The stream also sends a full snapshot on connect, periodically
+and whenever a subscriber lagged behind, so clients can resynchronise.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from .broker import get_broker
+from .models import LeaderboardEntry
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'leaderboard'
+
+
+def ranked_entries():
+    """Leaderboard rows with their rank, in the order of LeaderboardEntry.Meta.ordering (then id)."""
+    return LeaderboardEntry.objects.annotate(
+        rank=Window(RowNumber(), order_by=[F('score').desc(), F('created_at').asc(), F('id').asc()])
+    ).order_by('rank')
+
+
+def snapshot():
+    """The full leaderboard, as sent in `snapshot` events."""
+    return list(ranked_entries().values('id', 'rank', 'name', 'score', 'picture_url'))
+
+
+def ranks_of(entry_ids):
+    """
+    The changed players with their current rank, for `delta` events.
+
+    Each rank is counted from the players ahead of that one (a correlated
+    subquery on leaderboard_rank_idx) instead of ranking the whole table.
+    """
+    ahead = LeaderboardEntry.objects.filter(
+        Q(score__gt=OuterRef('score'))
+        | Q(score=OuterRef('score'), created_at__lt=OuterRef('created_at'))
+        | Q(score=OuterRef('score'), created_at=OuterRef('created_at'), id__lt=OuterRef('id'))
+    ).order_by().values(group=Value(1)).annotate(count=Count('*')).values('count')
+    return list(
+        LeaderboardEntry.objects.filter(id__in=entry_ids)
+        .annotate(rank=Coalesce(Subquery(ahead), 0) + 1)
+        .order_by('rank')
+        .values('id', 'rank', 'name', 'score')
+    )
+
+
+def _publish(entry_ids):
+    try:
+        changes = ranks_of(entry_ids)
+        if changes:
+            get_broker().publish(CHANNEL, {'type': 'delta', 'changes': changes})
+    except Exception:
+        # A missed delta is repaired by the next snapshot; never fail the write
+        logger.exception("Publishing leaderboard changes failed")
+
+
+def publish_score_changes(entry_ids):
+    """
+    Push the new scores and ranks of these players once the transaction commits.
+
+    Args:
+        entry_ids: Ids of the LeaderboardEntries whose score changed
+    """
+    entry_ids = list(entry_ids)
+    if entry_ids:
+        transaction.on_commit(lambda: _publish(entry_ids))
+
+
+def subscribe():
+    """Subscribe to leaderboard messages (async context manager)."""
+    return get_broker().subscribe(CHANNEL)
@@ -1,9 +1,27 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from api.models import Problem
+from api.management.seeding import BATCH_SIZE
+from api import versions
 
 
 class Command(BaseCommand):
-    help = "Add problems from hardcoded list (does not clear existing)."
+    help = (
+        "Sync problems with the hardcoded list, matched by name. Only new and "
+        "changed problems are written, so it is safe to run repeatedly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Also delete stored problems that are not in the list (and their tests and submissions)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without writing anything",
+        )
 
     def handle(self, *args, **options):
         try:
@@ -19,7 +37,16 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("No problems to add (PROBLEMS is empty)."))
             return
 
-        instances = []
+        dry_run = options["dry_run"]
+
+        # The oldest row wins if a name is stored more than once
+        existing = {}
+        for problem in Problem.objects.order_by("-id"):
+            existing[problem.name] = problem
+
+        to_create, to_update = [], []
+        seen = set()
+        unchanged_count = 0
         for i, item in enumerate(PROBLEMS, start=1):
             name = (item.get("name") or "").strip()
             points = item.get("points")
@@ -30,12 +57,50 @@ class Command(BaseCommand):
                     f"Skipping item #{i}: invalid name/points"
                 ))
                 continue
+            if name in seen:
+                self.stderr.write(self.style.WARNING(
+                    f"Skipping item #{i}: duplicate name '{name}'"
+                ))
+                continue
+            seen.add(name)
 
-            instances.append(Problem(name=name, points=points, assignment=assignment))
+            problem = existing.get(name)
+            if problem is None:
+                problem = Problem(name=name, points=points, assignment=assignment)
+                problem.refresh_derived_fields()  # bulk_create doesn't call save()
+                to_create.append(problem)
+                continue
 
-        if not instances:
-            self.stdout.write(self.style.WARNING("No valid problems to create."))
-            return
+            candidate = Problem(name=name, points=points, assignment=assignment)
+            if candidate.compute_content_hash() == problem.content_hash:
+                unchanged_count += 1
+                continue
+            problem.points = points
+            problem.assignment = assignment
+            problem.refresh_derived_fields()  # bulk_update doesn't call save()
+            to_update.append(problem)
+            self.stdout.write(f"Changed: '{name}'")
+
+        to_delete = []
+        if options["prune"]:
+            to_delete = [problem.id for name, problem in existing.items() if name not in seen]
+
+        if not dry_run and (to_create or to_update or to_delete):
+            with transaction.atomic():
+                Problem.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+                Problem.objects.bulk_update(
+                    to_update, ["points", "assignment", *Problem.DERIVED_FIELDS], batch_size=BATCH_SIZE
+                )
+                if to_delete:
+                    Problem.objects.filter(id__in=to_delete).delete()
+                versions.bump_version(versions.PROBLEMS)
 
-        Problem.objects.bulk_create(instances)
-        self.stdout.write(self.style.SUCCESS(f"Added {len(instances)} problems."))
+        self.stdout.write("\n" + "="*50)
+        if dry_run:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was written"))
+        self.stdout.write(self.style.SUCCESS(f"✓ Added: {len(to_create)} problem(s)"))
+        self.stdout.write(self.style.SUCCESS(f"✓ Updated: {len(to_update)} problem(s)"))
+        if options["prune"]:
+            self.stdout.write(self.style.SUCCESS(f"✓ Deleted: {len(to_delete)} problem(s)"))
+        self.stdout.write(f"  Unchanged: {unchanged_count} problem(s)")
+        self.stdout.write("="*50)
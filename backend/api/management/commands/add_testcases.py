@@ -1,53 +1,89 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from api.models import Problem, TestCase
+from api.suite_cache import invalidate_test_suite
+from api.management.seeding import BATCH_SIZE, TestCaseDiff
 from api.management.testcases_data import TESTCASES
 
 
 class Command(BaseCommand):
-    help = 'Add test cases for problems from hardcoded data'
+    help = (
+        'Sync test cases for problems with the hardcoded data. Only new, changed '
+        'and removed tests are written, so it is safe to run repeatedly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without writing anything",
+        )
 
     def handle(self, *args, **options):
-        added_count = 0
+        dry_run = options["dry_run"]
         skipped_count = 0
-        error_count = 0
 
+        # Problems are matched by name; the oldest wins if names repeat
+        problems = {}
+        for problem in Problem.objects.filter(name__in=list(TESTCASES)).order_by('-id'):
+            problems[problem.name] = problem
+
+        desired = {}
         for problem_name, testcases in TESTCASES.items():
-            try:
-                # Find the problem by name
-                problem = Problem.objects.filter(name=problem_name).first()
-                
-                if not problem:
-                    self.stdout.write(
-                        self.style.WARNING(f"Problem '{problem_name}' not found. Skipping test cases.")
-                    )
-                    skipped_count += len(testcases)
-                    continue
-                
-                # Add each test case
-                for testcase_data in testcases:
-                    TestCase.objects.create(
-                        problem=problem,
-                        input_data=testcase_data['input_data'],
-                        expected_output=testcase_data['expected_output'],
-                        is_public=testcase_data.get('is_public', True)  # Default to public if not specified
-                    )
-                    added_count += 1
-                
+            problem = problems.get(problem_name)
+            if not problem:
                 self.stdout.write(
-                    self.style.SUCCESS(f"Added {len(testcases)} test case(s) for '{problem_name}'")
+                    self.style.WARNING(f"Problem '{problem_name}' not found. Skipping test cases.")
                 )
-            
-            except Exception as e:
+                skipped_count += len(testcases)
+                continue
+            desired[problem.id] = [
+                {
+                    'input_data': testcase_data['input_data'],
+                    'expected_output': testcase_data['expected_output'],
+                    'is_public': testcase_data.get('is_public', True),  # Default to public if not specified
+                }
+                for testcase_data in testcases
+            ]
+
+        existing = {problem_id: [] for problem_id in desired}
+        for test in TestCase.objects.filter(problem_id__in=list(desired)).order_by('id'):
+            existing[test.problem_id].append(test)
+
+        to_create, to_update, to_delete = [], [], []
+        changed_problem_ids = []
+        unchanged_count = 0
+        for problem_name, problem in problems.items():
+            if problem.id not in desired:
+                continue
+            diff = TestCaseDiff(existing[problem.id], desired[problem.id])
+            unchanged_count += diff.unchanged
+            to_create.extend(TestCase(problem_id=problem.id, **item) for item in diff.create)
+            to_update.extend(diff.update)
+            to_delete.extend(test.id for test in diff.delete)
+            if diff.changed:
                 self.stdout.write(
-                    self.style.ERROR(f"Error adding test cases for '{problem_name}': {str(e)}")
+                    f"'{problem_name}': +{len(diff.create)} ~{len(diff.update)} -{len(diff.delete)}"
                 )
-                error_count += len(testcases)
-        
+                changed_problem_ids.append(problem.id)
+
+        if not dry_run:
+            with transaction.atomic():
+                TestCase.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+                TestCase.objects.bulk_update(to_update, ['expected_output', 'is_public'], batch_size=BATCH_SIZE)
+                for start in range(0, len(to_delete), BATCH_SIZE):
+                    TestCase.objects.filter(id__in=to_delete[start:start + BATCH_SIZE]).delete()
+                for problem_id in changed_problem_ids:
+                    invalidate_test_suite(problem_id)
+
         # Summary
         self.stdout.write("\n" + "="*50)
-        self.stdout.write(self.style.SUCCESS(f"✓ Successfully added: {added_count} test case(s)"))
+        if dry_run:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was written"))
+        self.stdout.write(self.style.SUCCESS(f"✓ Added: {len(to_create)} test case(s)"))
+        self.stdout.write(self.style.SUCCESS(f"✓ Updated: {len(to_update)} test case(s)"))
+        self.stdout.write(self.style.SUCCESS(f"✓ Deleted: {len(to_delete)} test case(s)"))
+        self.stdout.write(f"  Unchanged: {unchanged_count} test case(s)")
         if skipped_count > 0:
             self.stdout.write(self.style.WARNING(f"⊘ Skipped: {skipped_count} test case(s)"))
-        if error_count > 0:
-            self.stdout.write(self.style.ERROR(f"✗ Failed: {error_count} test case(s)"))
         self.stdout.write("="*50)
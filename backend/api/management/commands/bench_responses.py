@@ -0,0 +1,137 @@
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.conf import settings
+from api.responses import render_json, brotli
+import gzip
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = "Benchmark payload size and render time of the large list endpoints (stdlib vs orjson, gzip, brotli)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            "-n",
+            type=int,
+            default=5000,
+            help="Number of rows per synthetic payload (default: 5000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            "-r",
+            type=int,
+            default=5,
+            help="Timing repetitions, the best run is reported (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        repeat = options["repeat"]
+        rng = random.Random(42)
+
+        payloads = {
+            "tests/all": self.tests_payload(rows, rng),
+            "users/all": self.users_payload(rows, rng),
+            "problems/all": self.problems_payload(),
+            "users/<id>/submissions": self.submissions_payload(rows, rng),
+        }
+
+        self.stdout.write(f"{rows} rows per payload, best of {repeat} runs\n")
+        header = (
+            f"{'endpoint':<24} {'stdlib ms':>10} {'orjson ms':>10} {'raw KB':>9} "
+            f"{'gzip KB':>9} {'gzip ms':>8} {'br KB':>9} {'br ms':>8}"
+        )
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        for name, data in payloads.items():
+            stdlib_ms = self.best_of(repeat, lambda: JsonResponse(data).content)
+            orjson_ms = self.best_of(repeat, lambda: render_json(data))
+            body = render_json(data)
+
+            gzip_body = gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+            gzip_ms = self.best_of(repeat, lambda: gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL))
+            if brotli is not None:
+                br_body = brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+                br_ms = self.best_of(repeat, lambda: brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY))
+                br_kb = f"{len(br_body) / 1024:>9.1f}"
+                br_ms = f"{br_ms:>8.2f}"
+            else:
+                br_kb = f"{'n/a':>9}"
+                br_ms = f"{'n/a':>8}"
+
+            self.stdout.write(
+                f"{name:<24} {stdlib_ms:>10.2f} {orjson_ms:>10.2f} {len(body) / 1024:>9.1f} "
+                f"{len(gzip_body) / 1024:>9.1f} {gzip_ms:>8.2f} {br_kb} {br_ms}"
+            )
+
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("\nbrotli is not installed; only gzip was measured."))
+
+    def best_of(self, repeat, fn):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def tests_payload(self, rows, rng):
+        tests = []
+        for i in range(rows):
+            values = [rng.randint(-1000, 1000) for _ in range(rng.randint(5, 200))]
+            tests.append({
+                "id": i + 1,
+                "problem_id": rng.randint(1, 20),
+                "problem_name": "The Supply Chain Validator (String & List Logic)",
+                "input_data": [values],
+                "expected_output": str(sorted(values)),
+                "is_public": rng.random() < 0.8,
+            })
+        return {"success": True, "tests": tests, "total_count": len(tests)}
+
+    def users_payload(self, rows, rng):
+        users = [
+            {
+                "id": i + 1,
+                "name": f"user{i}",
+                "score": rng.randint(0, 5000),
+                "zauth_id": 1000 + i,
+                "picture_url": f"https://zauth.zeus.gent/users/{1000 + i}/photo",
+                "created_at": "2025-11-15T18:07:00+00:00",
+                "total_submissions": rng.randint(0, 300),
+                "correct_submissions": rng.randint(0, 50),
+            }
+            for i in range(rows)
+        ]
+        return {"success": True, "users": users, "total_count": len(users)}
+
+    def problems_payload(self):
+        from api.management.problems_data import PROBLEMS
+        problems = [
+            {"id": i, "name": p["name"], "points": p["points"], "assignment": p["assignment"]}
+            for i, p in enumerate(PROBLEMS, start=1)
+        ]
+        return {"success": True, "problems": problems}
+
+    def submissions_payload(self, rows, rng):
+        submissions = [
+            {
+                "id": i + 1,
+                "problem_id": rng.randint(1, 20),
+                "problem_name": "The Data Type Deluge",
+                "problem_points": 150,
+                "submission_time": "2025-11-15T18:07:00.123456+00:00",
+                "submission_correct": rng.random() < 0.3,
+            }
+            for i in range(rows)
+        ]
+        return {
+            "success": True,
+            "user_name": "user0",
+            "user_score": 1234,
+            "submissions": submissions,
+            "total_submissions": len(submissions),
+        }
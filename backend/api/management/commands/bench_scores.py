@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.utils import OperationalError
+from api.models import LeaderboardEntry
+from api.utils import adjust_score
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a few leaderboard entries with concurrent score updates and count lost updates, "
+        "comparing read-modify-write saves with the atomic adjust_score."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            "-t",
+            type=int,
+            default=8,
+            help="Concurrent updater threads (default: 8)",
+        )
+        parser.add_argument(
+            "--updates",
+            "-n",
+            type=int,
+            default=200,
+            help="Score updates per thread (default: 200)",
+        )
+        parser.add_argument(
+            "--players",
+            "-p",
+            type=int,
+            default=2,
+            help="Number of players the updates are spread over (default: 2)",
+        )
+
+    def handle(self, *args, **options):
+        threads = max(1, options["threads"])
+        updates = max(1, options["updates"])
+        players = max(1, options["players"])
+
+        self.stdout.write(f"{threads} threads x {updates} updates over {players} player(s)\n")
+        header = f"{'strategy':<18} {'updates/s':>10} {'errors':>7} {'lost pts':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        for name, update in (
+            ("read-modify-write", self.read_modify_write),
+            ("adjust_score", lambda entry_id, delta: adjust_score(entry_id, delta)["success"]),
+        ):
+            entries = [
+                LeaderboardEntry.objects.create(name=f"bench-scores-{i}", score=0)
+                for i in range(players)
+            ]
+            try:
+                self.run(name, update, [entry.id for entry in entries], threads, updates)
+            finally:
+                LeaderboardEntry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+
+    def run(self, name, update, entry_ids, threads, updates):
+        def worker(seed):
+            rng = random.Random(seed)
+            applied = {entry_id: 0 for entry_id in entry_ids}
+            errors = 0
+            try:
+                for _ in range(updates):
+                    entry_id = rng.choice(entry_ids)
+                    delta = rng.randint(1, 10)
+                    try:
+                        ok = update(entry_id, delta)
+                    except OperationalError:  # e.g. "database is locked" on SQLite
+                        ok = False
+                    if ok:
+                        applied[entry_id] += delta
+                    else:
+                        errors += 1
+            finally:
+                connection.close()
+            return applied, errors
+
+        close_old_connections()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - start
+
+        expected = {entry_id: 0 for entry_id in entry_ids}
+        errors = 0
+        for applied, worker_errors in outcomes:
+            errors += worker_errors
+            for entry_id, total in applied.items():
+                expected[entry_id] += total
+
+        # Points that were applied successfully but are missing from the stored score
+        stored = dict(LeaderboardEntry.objects.filter(id__in=entry_ids).values_list("id", "score"))
+        lost = sum(expected[entry_id] - stored[entry_id] for entry_id in entry_ids)
+
+        line = f"{name:<18} {threads * updates / elapsed:>10.0f} {errors:>7} {lost:>9}"
+        self.stdout.write(self.style.ERROR(line) if lost else self.style.SUCCESS(line))
+
+    def read_modify_write(self, entry_id, delta):
+        # What add_score_delta used to do: load, add in Python, save, each
+        # statement in its own autocommit transaction. Wrapping the two in
+        # atomic() would hide the race on SQLite, whose IMMEDIATE
+        # transactions (settings.py) take the write lock up front and so
+        # serialise the whole read-modify-write.
+        entry = LeaderboardEntry.objects.get(id=entry_id)
+        entry.score = max(entry.score + delta, 0)
+        entry.save(update_fields=["score", "updated_at"])
+        return True
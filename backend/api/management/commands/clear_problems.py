@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from api.models import Problem
+from api.suite_cache import invalidate_all_test_suites
 
 
 class Command(BaseCommand):
@@ -8,6 +9,8 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         count = Problem.objects.count()
         deleted_count, details = Problem.objects.all().delete()
+        # The deletes bump the PROBLEMS version through the post_delete signal
+        invalidate_all_test_suites()
         self.stdout.write(self.style.SUCCESS(
             f"Deleted {count} problems (rows affected including cascades: {deleted_count})."
         ))
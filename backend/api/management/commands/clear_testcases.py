@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from api.models import TestCase
+from api.suite_cache import invalidate_all_test_suites
 
 
 class Command(BaseCommand):
@@ -15,6 +16,7 @@ class Command(BaseCommand):
         
         # Delete all test cases
         deletion_details = TestCase.objects.all().delete()
+        invalidate_all_test_suites()
         
         # deletion_details is a tuple: (total_deleted, {model_name: count})
         total_deleted = deletion_details[0]
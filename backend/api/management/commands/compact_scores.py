@@ -0,0 +1,40 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.score_history import compact_score_events
+import time
+
+
+class Command(BaseCommand):
+    help = "Compact the score ledger (ScoreEvent) into leaderboard snapshots, once or periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            "-i",
+            type=float,
+            default=0,
+            help="Repeat every INTERVAL seconds instead of running once (default: run once)",
+        )
+        parser.add_argument(
+            "--prune-days",
+            type=float,
+            default=None,
+            help="Delete compacted events older than this many days (default: keep them)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        prune_days = options["prune_days"]
+
+        while True:
+            started = time.monotonic()
+            prune_before = timezone.now() - timedelta(days=prune_days) if prune_days is not None else None
+            read, written, pruned = compact_score_events(prune_before)
+            message = f"Compacted {read} score event(s) into {written} snapshot(s) in {time.monotonic() - started:.2f}s"
+            if pruned:
+                message += f", pruned {pruned} old event(s)"
+            self.stdout.write(self.style.SUCCESS(message))
+            if interval <= 0:
+                return
+            time.sleep(interval)
@@ -1,40 +1,44 @@
 from django.core.management.base import BaseCommand
-from django.core import serializers
 from api.models import Problem
-import json
+from api.management.jsonl import open_jsonl, write_header, write_row
 
 
 class Command(BaseCommand):
-    help = "Export all problems to a JSON fixture file"
+    help = "Export all problems to a (compressed) JSONL file, streaming one row at a time"
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--output",
             "-o",
             type=str,
-            default="problems_fixture.json",
-            help="Output filename for the fixture (default: problems_fixture.json)",
+            default="problems.jsonl.gz",
+            help="Output file; .gz, .zst or plain JSONL by extension (default: problems.jsonl.gz)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database per round trip (default: 2000)",
         )
 
     def handle(self, *args, **options):
         output_file = options["output"]
         
-        problems = Problem.objects.all()
-        count = problems.count()
+        problems = Problem.objects.order_by("id").values("id", "name", "points", "assignment")
+        
+        count = 0
+        with open_jsonl(output_file, "w") as f:
+            write_header(f, "problem")
+            for row in problems.iterator(chunk_size=options["chunk_size"]):
+                write_row(f, row)
+                count += 1
         
         if count == 0:
             self.stdout.write(self.style.WARNING("No problems found to export."))
             return
         
-        # Serialize to JSON
-        data = serializers.serialize("json", problems, indent=2)
-        
-        # Write to file
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(data)
-        
         self.stdout.write(self.style.SUCCESS(
             f"Successfully exported {count} problems to '{output_file}'"
         ))
-        self.stdout.write(f"To load this fixture later, run:")
-        self.stdout.write(f"  python manage.py loaddata {output_file}")
+        self.stdout.write(f"To load this export later, run:")
+        self.stdout.write(f"  python manage.py import_jsonl {output_file}")
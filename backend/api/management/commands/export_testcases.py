@@ -1,19 +1,18 @@
 from django.core.management.base import BaseCommand
-from django.core import serializers
 from api.models import TestCase
-import json
+from api.management.jsonl import open_jsonl, write_header, write_row
 
 
 class Command(BaseCommand):
-    help = "Export all test cases to a JSON fixture file"
+    help = "Export all test cases to a (compressed) JSONL file, streaming one row at a time"
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--output",
             "-o",
             type=str,
-            default="testcases_fixture.json",
-            help="Output filename for the fixture (default: testcases_fixture.json)",
+            default="testcases.jsonl.gz",
+            help="Output file; .gz, .zst or plain JSONL by extension (default: testcases.jsonl.gz)",
         )
         parser.add_argument(
             "--problem",
@@ -22,6 +21,12 @@ class Command(BaseCommand):
             default=None,
             help="Export test cases for a specific problem name only",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database per round trip (default: 2000)",
+        )
 
     def handle(self, *args, **options):
         output_file = options["output"]
@@ -33,7 +38,19 @@ class Command(BaseCommand):
         else:
             testcases = TestCase.objects.all()
         
-        count = testcases.count()
+        # The problem name travels with each row so an import can match
+        # problems in a database where their ids differ
+        testcases = testcases.order_by("id").values(
+            "id", "problem_id", "problem__name", "input_data", "expected_output", "is_public"
+        )
+        
+        count = 0
+        with open_jsonl(output_file, "w") as f:
+            write_header(f, "testcase")
+            for row in testcases.iterator(chunk_size=options["chunk_size"]):
+                row["problem_name"] = row.pop("problem__name")
+                write_row(f, row)
+                count += 1
         
         if count == 0:
             if problem_name:
@@ -44,13 +61,6 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING("No test cases found to export."))
             return
         
-        # Serialize to JSON
-        data = serializers.serialize("json", testcases, indent=2)
-        
-        # Write to file
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(data)
-        
         if problem_name:
             self.stdout.write(self.style.SUCCESS(
                 f"Successfully exported {count} test cases for '{problem_name}' to '{output_file}'"
@@ -59,5 +69,5 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(
                 f"Successfully exported {count} test cases to '{output_file}'"
             ))
-        self.stdout.write(f"To load this fixture later, run:")
-        self.stdout.write(f"  python manage.py loaddata {output_file}")
+        self.stdout.write(f"To load this export later, run:")
+        self.stdout.write(f"  python manage.py import_jsonl {output_file}")
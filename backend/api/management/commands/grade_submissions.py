@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from api.grading import claim_next_submission, grade, requeue_expired_jobs
+from api.metrics import Counter, Histogram, serve_metrics
+from api.suite_cache import cache_is_shared
+import threading
+import time
+
+JOBS = Counter(
+    "vibecode_grading_jobs_total",
+    "Grading attempts made by this worker, by outcome.",
+    ("outcome",),
+)
+JOB_DURATION = Histogram(
+    "vibecode_grading_job_duration_seconds",
+    "Time taken to grade one claimed submission, including the grader call.",
+)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of workers that drain the pending submission queue against the grader."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            "-w",
+            type=int,
+            default=4,
+            help="Number of concurrent grading workers (default: 4)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds an idle worker sleeps before checking the queue again (default: 0.5)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for new submissions",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=0,
+            help="Serve Prometheus metrics for this worker on PORT (default: off)",
+        )
+        parser.add_argument(
+            "--allow-local-state",
+            action="store_true",
+            help=(
+                "Run without a shared cache and broker (REDIS_URL). Test-suite changes made by "
+                "other processes are then not seen until SUITE_CACHE_TIMEOUT expires, and score "
+                "changes are not pushed to live leaderboard clients"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        # The web process and the CLI commands invalidate cached test suites,
+        # and the worker's score changes feed the live leaderboard; neither
+        # crosses process boundaries through per-process memory
+        local = not cache_is_shared() or settings.LEADERBOARD_BROKER != "redis"
+        if local and not options["allow_local_state"]:
+            raise CommandError(
+                "The grading worker needs a cache and leaderboard broker shared with the backend: "
+                "set REDIS_URL (or pass --allow-local-state to run with stale suites and no live pushes)"
+            )
+
+        workers = max(1, options["workers"])
+        poll_interval = options["poll_interval"]
+        once = options["once"]
+
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.graded = 0
+        self.failed = 0
+
+        if options["metrics_port"]:
+            serve_metrics(options["metrics_port"])
+            self.stdout.write(f"Serving metrics on :{options['metrics_port']}")
+
+        requeued = requeue_expired_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale running submission(s)"))
+
+        self.stdout.write(self.style.SUCCESS(f"Starting {workers} grading worker(s)"))
+        threads = [
+            threading.Thread(target=self.work, args=(poll_interval, once), name=f"grader-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                # The main thread doubles as the janitor for crashed workers
+                for thread in threads:
+                    thread.join(timeout=poll_interval)
+                if not once:
+                    requeue_expired_jobs()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write(self.style.SUCCESS(f"✓ Graded: {self.graded} submission(s)"))
+        if self.failed > 0:
+            self.stdout.write(self.style.ERROR(f"✗ Failed attempts: {self.failed}"))
+        self.stdout.write("="*50)
+
+    def work(self, poll_interval, once):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                submission = claim_next_submission()
+                if submission is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+
+                started = time.monotonic()
+                ok = grade(submission)
+                elapsed = time.monotonic() - started
+                JOBS.inc("graded" if ok else "failed")
+                JOB_DURATION.observe(elapsed)
+                with self.lock:
+                    if ok:
+                        self.graded += 1
+                    else:
+                        self.failed += 1
+                self.stdout.write(
+                    f"[{threading.current_thread().name}] submission {submission.id}: "
+                    f"{'graded' if ok else 'failed'} in {elapsed:.2f}s"
+                )
+        finally:
+            connection.close()
@@ -0,0 +1,118 @@
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.models import Problem, TestCase
+from api.management.jsonl import open_jsonl, read_rows
+from api.management.seeding import test_content_hash
+from api.suite_cache import invalidate_test_suite
+from api import versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Import problems or test cases from a (compressed) JSONL export, reading "
+        "and bulk-inserting in batches. Rows already present are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Export file written by export_problems or export_testcases")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per bulk_create call (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        with open_jsonl(options["path"], "r") as f:
+            model, rows = read_rows(f)
+            with transaction.atomic():
+                if model == "problem":
+                    created, skipped = self.import_problems(rows, batch_size)
+                elif model == "testcase":
+                    created, skipped = self.import_testcases(rows, batch_size)
+                else:
+                    raise CommandError(f"Unknown model '{model}' in export header")
+
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write(self.style.SUCCESS(f"✓ Imported: {created} {model}(s)"))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"⊘ Skipped: {skipped} {model}(s)"))
+        self.stdout.write("="*50)
+
+    def import_problems(self, rows, batch_size):
+        # Problems are matched by name, like add_problems
+        existing = set(Problem.objects.values_list("name", flat=True))
+        created = skipped = 0
+        batch = []
+        for row in rows:
+            if row["name"] in existing:
+                skipped += 1
+                continue
+            existing.add(row["name"])
+            problem = Problem(name=row["name"], points=row["points"], assignment=row["assignment"])
+            problem.refresh_derived_fields()  # bulk_create doesn't call save()
+            batch.append(problem)
+            if len(batch) >= batch_size:
+                Problem.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            Problem.objects.bulk_create(batch)
+            created += len(batch)
+        if created:
+            versions.bump_version(versions.PROBLEMS)
+        return created, skipped
+
+    def import_testcases(self, rows, batch_size):
+        problem_ids = dict(Problem.objects.order_by("-id").values_list("name", "id"))
+        # Content hashes of the tests each touched problem already has, so a
+        # repeated import doesn't duplicate them. Loaded on first use only.
+        stored = {}
+        missing = set()
+        created = skipped = 0
+        batch = []
+
+        for row in rows:
+            problem_id = problem_ids.get(row["problem_name"])
+            if problem_id is None:
+                if row["problem_name"] not in missing:
+                    missing.add(row["problem_name"])
+                    self.stdout.write(self.style.WARNING(
+                        f"Problem '{row['problem_name']}' not found. Skipping its test cases."
+                    ))
+                skipped += 1
+                continue
+
+            if problem_id not in stored:
+                stored[problem_id] = Counter(
+                    test_content_hash(*values)
+                    for values in TestCase.objects.filter(problem_id=problem_id)
+                    .values_list("input_data", "expected_output", "is_public")
+                    .iterator()
+                )
+            content_hash = test_content_hash(row["input_data"], row["expected_output"], row["is_public"])
+            if stored[problem_id][content_hash] > 0:
+                stored[problem_id][content_hash] -= 1
+                skipped += 1
+                continue
+
+            batch.append(TestCase(
+                problem_id=problem_id,
+                input_data=row["input_data"],
+                expected_output=row["expected_output"],
+                is_public=row["is_public"],
+            ))
+            if len(batch) >= batch_size:
+                TestCase.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+
+        if batch:
+            TestCase.objects.bulk_create(batch)
+            created += len(batch)
+        for problem_id in stored:
+            invalidate_test_suite(problem_id)
+        return created, skipped
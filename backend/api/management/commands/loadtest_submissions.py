@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, close_old_connections
+from api.models import LeaderboardEntry, Problem, Submission, SubmissionCode
+import statistics
+import threading
+import time
+
+LOADTEST_PREFIX = "__loadtest__"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent Submission insert throughput on the configured database "
+        "(run once per DJANGO_DB_PROFILE to compare backends)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            "-t",
+            type=int,
+            default=16,
+            help="Number of concurrent writer threads (default: 16)",
+        )
+        parser.add_argument(
+            "--submissions",
+            "-n",
+            type=int,
+            default=2000,
+            help="Total number of submissions to insert (default: 2000)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the generated rows instead of deleting them afterwards (the next run removes them)",
+        )
+
+    def handle(self, *args, **options):
+        threads = max(1, options["threads"])
+        total = max(1, options["submissions"])
+
+        # An earlier run that was killed outright (no finally) left its rows behind
+        leftovers = self.clean_up()
+        if leftovers:
+            self.stdout.write(self.style.WARNING(f"Removed {leftovers} row(s) left by an earlier run"))
+
+        # The load-test problem is visible in the problem list while this
+        # runs, so it is always removed, also when the run is interrupted
+        stop = threading.Event()
+        try:
+            self.run(threads, total, stop)
+        finally:
+            stop.set()
+            if not options["keep"]:
+                self.clean_up()
+
+    def clean_up(self):
+        """Delete the load-test problem and players (cascading to their submissions)."""
+        deleted, _ = Problem.objects.filter(name__startswith=LOADTEST_PREFIX).delete()
+        entries, _ = LeaderboardEntry.objects.filter(name__startswith=LOADTEST_PREFIX).delete()
+        return deleted + entries
+
+    def run(self, threads, total, stop):
+        problem = Problem.objects.create(
+            name=f"{LOADTEST_PREFIX} problem", points=0, assignment="Load test"
+        )
+        entries = LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(name=f"{LOADTEST_PREFIX} user {i}", score=0)
+            for i in range(threads)
+        ])
+        source = SubmissionCode.objects.store("def f(x):\n    return x\n")
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        per_thread = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+        barrier = threading.Barrier(threads)
+
+        def writer(index):
+            own_latencies = []
+            own_errors = []
+            try:
+                close_old_connections()
+                barrier.wait()
+                for _ in range(per_thread[index]):
+                    if stop.is_set():
+                        break
+                    started = time.perf_counter()
+                    try:
+                        # Inserted as already graded so a running grading
+                        # worker doesn't pick the rows up
+                        Submission.objects.create(
+                            problem=problem,
+                            submisser=entries[index],
+                            source=source,
+                            status=Submission.STATUS_DONE,
+                        )
+                    except Exception as e:
+                        own_errors.append(type(e).__name__)
+                        continue
+                    own_latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(own_latencies)
+                    errors.extend(own_errors)
+
+        db = settings.DATABASES["default"]
+        pooled = bool(db.get("OPTIONS", {}).get("pool"))
+        self.stdout.write(
+            f"Backend: {connection.vendor} (profile={settings.DB_PROFILE}, "
+            f"pool={'on' if pooled else 'off'}, CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)})"
+        )
+        self.stdout.write(f"Inserting {total} submissions from {threads} thread(s)...")
+
+        workers = [threading.Thread(target=writer, args=(i,), daemon=True) for i in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Let the writers finish their current insert before cleaning up
+            stop.set()
+            for worker in workers:
+                worker.join()
+            raise
+        elapsed = time.perf_counter() - started
+
+        self.report(latencies, errors, elapsed)
+
+    def report(self, latencies, errors, elapsed):
+        self.stdout.write("\n" + "="*50)
+        if latencies:
+            ordered = sorted(latencies)
+
+            def pct(p):
+                return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {len(latencies)} inserts in {elapsed:.2f}s = {len(latencies) / elapsed:.0f} inserts/s"
+            ))
+            self.stdout.write(
+                f"  latency ms: mean {statistics.mean(ordered) * 1000:.2f}  p50 {pct(0.50):.2f}  "
+                f"p95 {pct(0.95):.2f}  p99 {pct(0.99):.2f}  max {ordered[-1] * 1000:.2f}"
+            )
+        if errors:
+            kinds = {kind: errors.count(kind) for kind in set(errors)}
+            summary = ", ".join(f"{kind} x{count}" for kind, count in kinds.items())
+            self.stdout.write(self.style.ERROR(f"✗ {len(errors)} failed inserts: {summary}"))
+        self.stdout.write("="*50)
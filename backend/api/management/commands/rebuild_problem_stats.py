@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from api import problem_stats
+import time
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-problem statistics (ProblemStats) from all graded submissions."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = problem_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {written} problem(s) in {time.monotonic() - started:.2f}s"
+        ))
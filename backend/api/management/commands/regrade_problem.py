@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Problem
+from api.regrade import REGRADE_BATCH, REGRADE_WORKERS, regrade_problem
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-grade a problem's graded submissions against its current test suite "
+        "(e.g. after a test case was fixed) and correct the affected scores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("problem_id", type=int, help="The problem whose tests changed")
+        parser.add_argument(
+            "--batch-size",
+            "-b",
+            type=int,
+            default=REGRADE_BATCH,
+            help=f"Distinct code texts sent to the grader per batch (default: {REGRADE_BATCH})",
+        )
+        parser.add_argument(
+            "--workers",
+            "-w",
+            type=int,
+            default=REGRADE_WORKERS,
+            help=f"Concurrent grader requests within a batch (default: {REGRADE_WORKERS})",
+        )
+
+    def handle(self, *args, **options):
+        problem_id = options["problem_id"]
+        try:
+            report = regrade_problem(
+                problem_id,
+                batch_size=max(1, options["batch_size"]),
+                workers=max(1, options["workers"]),
+                progress=self.progress,
+            )
+        except Problem.DoesNotExist:
+            raise CommandError(f"Problem {problem_id} does not exist")
+
+        self.stdout.write("\n" + "="*50)
+        if not report.submissions:
+            self.stdout.write(self.style.WARNING(f"No graded submissions for problem {problem_id}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ Re-graded {report.updated}/{report.submissions} submission(s) "
+                f"({report.codes} distinct code text(s)) in {report.elapsed:.2f}s"
+            ))
+            self.stdout.write(f"  Verdicts changed: {report.flipped}")
+            if report.failed:
+                self.stdout.write(self.style.ERROR(
+                    f"✗ Grader failed for {report.failed} code text(s); their submissions were left unchanged"
+                ))
+        for name, old_score, new_score in report.score_changes.values():
+            self.stdout.write(f"  {name}: {old_score} -> {new_score}")
+        self.stdout.write("="*50)
+
+    def progress(self, report):
+        rate = report.codes_done / report.elapsed if report.elapsed else 0
+        self.stdout.write(
+            f"[{report.codes_done}/{report.codes} codes] "
+            f"{report.codes_done - report.failed} graded, {report.failed} failed, "
+            f"{rate:.1f} codes/s"
+        )
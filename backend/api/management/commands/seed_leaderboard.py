@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from api.models import LeaderboardEntry
+from api.score_history import REASON_SEED, record_score_events
 import random
 
 class Command(BaseCommand):
@@ -42,6 +43,7 @@ class Command(BaseCommand):
 
         # Bulk create for efficiency
         LeaderboardEntry.objects.bulk_create(entries)
+        record_score_events(((entry.id, 0, entry.score) for entry in entries), REASON_SEED)
 
         self.stdout.write(
             self.style.SUCCESS(f'Successfully seeded {len(entries)} leaderboard entries')
@@ -0,0 +1,79 @@
+"""
+Compressed JSONL files for the export/import commands.
+
+An export is one JSON object per line. The first line is a header naming
+the model, so import_jsonl knows what it is reading. The compression is
+picked from the file extension: `.gz` (gzip), `.zst` (zstandard, needs the
+optional `zstandard` package) or anything else for plain text. Rows are
+written and read one line at a time, so memory use doesn't grow with the
+size of the bank.
+"""
+
+import gzip
+import json
+
+from django.core.management.base import CommandError
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, gzip is always available
+    zstandard = None
+
+FORMAT = 'vibecode-jsonl'
+VERSION = 1
+
+
+def open_jsonl(path, mode):
+    """
+    Open a (possibly compressed) JSONL file in text mode.
+
+    Args:
+        path: File name; the extension selects the compression
+        mode: 'r' or 'w'
+
+    Returns:
+        A text file object
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise CommandError("Reading or writing .zst files needs the 'zstandard' package")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def write_header(stream, model):
+    stream.write(json.dumps({'format': FORMAT, 'version': VERSION, 'model': model}) + '\n')
+
+
+def write_row(stream, row):
+    stream.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def read_rows(stream):
+    """
+    Read an export produced by write_header/write_row.
+
+    Returns:
+        tuple: (model name, iterator over row dicts)
+    """
+    try:
+        header = json.loads(stream.readline())
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise CommandError('Not a vibecode JSONL export (missing header line)')
+    if header.get('version') != VERSION:
+        raise CommandError(f"Unsupported export version {header.get('version')}")
+
+    def rows():
+        for line_number, line in enumerate(stream, start=2):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise CommandError(f'Line {line_number}: invalid JSON ({e})')
+
+    return header['model'], rows()
@@ -0,0 +1,90 @@
+"""
+Diffing helpers for the idempotent seeding commands.
+
+add_problems and add_testcases compare the hardcoded data with what is
+already stored and only write the difference, so they can be re-run after
+editing problems_data.py / testcases_data.py without duplicating rows or
+throwing away ids (which submissions and grading results refer to).
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+
+BATCH_SIZE = 500
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def test_input_hash(input_data):
+    """Hash of a test's input; identifies "the same test" across reseeds."""
+    return _digest(json.dumps(input_data, sort_keys=True, separators=(',', ':')))
+
+
+def test_content_hash(input_data, expected_output, is_public):
+    """Hash of everything seeded for a test."""
+    return _digest(test_input_hash(input_data), str(expected_output), '1' if is_public else '0')
+
+
+class TestCaseDiff:
+    """
+    Inserts, updates and deletes that turn one problem's stored tests into
+    the desired ones.
+
+    Unchanged tests (same content hash) are kept. Of the rest, a desired
+    test whose input matches a stored one updates that row in place;
+    the remaining desired tests are created and the remaining stored ones
+    deleted. Duplicate tests are matched one for one.
+    """
+
+    def __init__(self, existing, desired):
+        """
+        Args:
+            existing: Stored TestCase instances of the problem
+            desired: Dicts with input_data, expected_output and is_public
+        """
+        self.create = []
+        self.update = []
+        self.delete = []
+        self.unchanged = 0
+
+        by_content = defaultdict(list)
+        for test in existing:
+            by_content[test_content_hash(test.input_data, test.expected_output, test.is_public)].append(test)
+
+        pending = []
+        for item in desired:
+            matches = by_content.get(test_content_hash(item['input_data'], item['expected_output'], item['is_public']))
+            if matches:
+                matches.pop()
+                self.unchanged += 1
+            else:
+                pending.append(item)
+
+        by_input = defaultdict(list)
+        for tests in by_content.values():
+            for test in tests:
+                by_input[test_input_hash(test.input_data)].append(test)
+
+        for item in pending:
+            matches = by_input.get(test_input_hash(item['input_data']))
+            if matches:
+                test = matches.pop()
+                test.expected_output = item['expected_output']
+                test.is_public = item['is_public']
+                self.update.append(test)
+            else:
+                self.create.append(item)
+
+        for tests in by_input.values():
+            self.delete.extend(tests)
+
+    @property
+    def changed(self):
+        return bool(self.create or self.update or self.delete)
@@ -0,0 +1,336 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Each process keeps its own registry: the web workers expose theirs on
+/metrics and the grading worker can serve its own on a separate port (see
+`serve_metrics`). Scrape every process and aggregate in Prometheus.
+
+Requests are timed by `MetricsMiddleware`. Database queries are counted by
+an execute wrapper installed on every new connection, which adds to the
+stats of the request being served (tracked through a context variable, so
+it also follows sync views run in a thread under ASGI).
+"""
+
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('api.requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """A cumulative histogram with fixed upper bounds and optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(state)) for labels, state in self._values.items())
+        names = self.labelnames + ('le',)
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f'{self.name}_bucket', _format_labels(names, labels + (_format_value(bound),)), cumulative
+            yield f'{self.name}_bucket', _format_labels(names, labels + ('+Inf',)), state[-1]
+            yield f'{self.name}_sum', _format_labels(self.labelnames, labels), state[-2]
+            yield f'{self.name}_count', _format_labels(self.labelnames, labels), state[-1]
+
+
+REGISTRY = []
+
+REQUEST_LATENCY = Histogram(
+    'vibecode_http_request_duration_seconds',
+    'Time spent producing a response, by view and method.',
+    ('view', 'method'),
+)
+REQUESTS = Counter(
+    'vibecode_http_requests_total',
+    'Responses sent, by view, method and status code.',
+    ('view', 'method', 'status'),
+)
+REQUEST_QUERIES = Histogram(
+    'vibecode_http_request_db_queries',
+    'Database queries executed per request, by view.',
+    ('view',),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    'vibecode_http_request_db_duration_seconds',
+    'Time spent in database queries per request, by view.',
+    ('view',),
+)
+UPSTREAM_LATENCY = Histogram(
+    'vibecode_upstream_request_duration_seconds',
+    'Latency of calls to the grader and LLM services, by service and outcome.',
+    ('service', 'outcome'),
+)
+
+RATE_LIMITED = Counter(
+    'vibecode_rate_limited_total',
+    'Requests rejected with 429, by endpoint and the bucket that ran out (user or global).',
+    ('endpoint', 'scope'),
+)
+
+SUBMISSIONS_DEDUPLICATED = Counter(
+    'vibecode_submissions_deduplicated_total',
+    'Test requests answered with an earlier submission instead of a new grading run, '
+    'by what matched (idempotency_key or content).',
+    ('match',),
+)
+GRADER_SECONDS_SAVED = Counter(
+    'vibecode_grader_seconds_saved_total',
+    'Grading time not spent on deduplicated test requests, measured on the reused run '
+    '(runs still in flight count once they are reused after finishing).',
+    ('match',),
+)
+
+
+def render():
+    """
+    Render every registered metric in the Prometheus text format.
+
+    Returns:
+        str: The exposition text
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class observe_upstream:
+    """
+    Context manager timing one upstream call into UPSTREAM_LATENCY.
+
+    The outcome label is `ok`, `timeout` or `error`.
+    """
+
+    def __init__(self, service):
+        self.service = service
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = 'ok'
+        elif issubclass(exc_type, TimeoutError) or 'Timeout' in exc_type.__name__:
+            outcome = 'timeout'
+        else:
+            outcome = 'error'
+        UPSTREAM_LATENCY.observe(time.perf_counter() - self.started, self.service, outcome)
+        return False
+
+
+# Query accounting ----------------------------------------------------------
+
+class QueryStats:
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+_query_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    # The wrapper list lives on the DatabaseWrapper, which outlives the
+    # underlying connection, so only add it once
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_wrapper)
+
+
+# Middleware ----------------------------------------------------------------
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and database usage for every request.
+
+    Requests slower than SLOW_REQUEST_THRESHOLD_MS are logged, sampled at
+    SLOW_REQUEST_LOG_SAMPLE_RATE so a slow spell can't flood the logs.
+    Streaming responses are timed until their headers are ready.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started, stats, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self._finish(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started, stats, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self._finish(request, response, started, stats)
+        return response
+
+    def _start(self):
+        stats = QueryStats()
+        return time.perf_counter(), stats, _query_stats.set(stats)
+
+    def _finish(self, request, response, started, stats):
+        duration = time.perf_counter() - started
+        view = _view_name(request)
+        REQUEST_LATENCY.observe(duration, view, request.method)
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        REQUEST_QUERIES.observe(stats.count, view)
+        REQUEST_DB_TIME.observe(stats.duration, view)
+
+        if (
+            duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS
+            and random.random() < settings.SLOW_REQUEST_LOG_SAMPLE_RATE
+        ):
+            logger.warning(
+                'Slow request: %s %s (%s) -> %s in %.0f ms, %d queries / %.0f ms',
+                request.method, request.path, view, response.status_code,
+                duration * 1000, stats.count, stats.duration * 1000,
+            )
+
+
+# Standalone exposition for processes without a web server -----------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, addr='0.0.0.0'):
+    """
+    Serve the registry over HTTP from a daemon thread.
+
+    Args:
+        port: Port to listen on
+        addr: Address to bind
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_submission_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submisser', '-submission_time', '-id'], name='submission_history_idx'),
+        ),
+    ]
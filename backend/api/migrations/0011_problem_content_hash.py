@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:36
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hashes(apps, schema_editor):
+    # Mirrors Problem.compute_content_hash (historical models have no methods)
+    Problem = apps.get_model('api', 'Problem')
+    problems = list(Problem.objects.all())
+    for problem in problems:
+        digest = hashlib.sha256()
+        for part in (problem.name, str(problem.points), problem.assignment):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        problem.content_hash = digest.hexdigest()
+    Problem.objects.bulk_update(problems, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_submission_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
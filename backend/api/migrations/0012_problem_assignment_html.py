@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:38
+
+import hashlib
+
+import nh3
+from django.db import migrations, models
+from markdown_it import MarkdownIt
+
+
+# A frozen copy of api.rendering as it was when this migration was written,
+# so later changes to the renderer can't change (or break) the migration
+
+def render_markdown(source):
+    markdown = MarkdownIt('commonmark', {'html': False}).enable(['table', 'strikethrough'])
+    attributes = {tag: set(attrs) for tag, attrs in nh3.ALLOWED_ATTRIBUTES.items()}
+    attributes.setdefault('code', set()).add('class')
+    return nh3.clean(markdown.render(source or ''), attributes=attributes)
+
+
+def html_hash(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def render_assignments(apps, schema_editor):
+    Problem = apps.get_model('api', 'Problem')
+    problems = list(Problem.objects.all())
+    for problem in problems:
+        problem.assignment_html = render_markdown(problem.assignment)
+        problem.assignment_html_hash = html_hash(problem.assignment_html)
+    Problem.objects.bulk_update(problems, ['assignment_html', 'assignment_html_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_problem_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='assignment_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='assignment_html_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(render_assignments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_baseline(apps, schema_editor):
+    # The ledger starts now; give every existing player an event holding
+    # their current score so their history doesn't start empty
+    LeaderboardEntry = apps.get_model('api', 'LeaderboardEntry')
+    ScoreEvent = apps.get_model('api', 'ScoreEvent')
+    ScoreEvent.objects.bulk_create(
+        (
+            ScoreEvent(entry_id=entry_id, delta=score, score=score, reason='baseline')
+            for entry_id, score in LeaderboardEntry.objects.values_list('id', 'score').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_problem_assignment_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('score', models.IntegerField()),
+                ('reason', models.CharField(blank=True, default='', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_events', to='api.leaderboardentry')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('score', models.IntegerField()),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.leaderboardentry')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entry', 'bucket_start'), name='snapshot_entry_bucket_uniq')],
+            },
+        ),
+        migrations.RunPython(record_baseline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_score_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='dedupe_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='idempotency_key',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['dedupe_key'], name='submission_dedupe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key', ''), _negated=True), fields=('submisser', 'idempotency_key'), name='submission_idempotency_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api import problem_stats
+
+
+def fill_problem_stats(apps, schema_editor):
+    problem_stats.rebuild(
+        apps.get_model('api', 'Problem'),
+        apps.get_model('api', 'ProblemStats'),
+        apps.get_model('api', 'Submission'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_submission_dedupe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemStats',
+            fields=[
+                ('problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.problem')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct_submissions', models.PositiveIntegerField(default=0)),
+                ('attempters', models.PositiveIntegerField(default=0)),
+                ('solvers', models.PositiveIntegerField(default=0)),
+                ('solve_attempts', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_problem_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:08
+
+import hashlib
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BATCH_SIZE = 1000
+
+
+# A frozen copy of api.blobs as it was when this migration was written, so
+# later changes to the storage format can't change (or break) the migration.
+# The codec prefix bytes are part of the stored format: api.blobs.unpack
+# must keep reading them.
+
+def pack(data):
+    if zstandard is not None:
+        return b's' + zstandard.ZstdCompressor(level=10).compress(data)
+    return b'z' + zlib.compress(data, 6)
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def pack_results(results):
+    return pack(json.dumps(results, separators=(',', ':')).encode('utf-8'))
+
+
+def compress_submissions(apps, schema_editor):
+    Submission = apps.get_model('api', 'Submission')
+    SubmissionCode = apps.get_model('api', 'SubmissionCode')
+
+    source_ids = {}  # code hash -> SubmissionCode id
+    last_id = 0
+    while True:
+        batch = list(
+            Submission.objects.filter(id__gt=last_id).order_by('id').only('id', 'code', 'results')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+
+        new_sources = {}
+        for submission in batch:
+            submission.code_hash = code_hash(submission.code) if submission.code else None
+            if submission.code_hash and submission.code_hash not in source_ids:
+                encoded = submission.code.encode('utf-8')
+                new_sources[submission.code_hash] = SubmissionCode(
+                    code_hash=submission.code_hash, data=pack(encoded), size=len(encoded)
+                )
+        for source in SubmissionCode.objects.bulk_create(new_sources.values()):
+            source_ids[source.code_hash] = source.id
+
+        for submission in batch:
+            submission.source_id = source_ids.get(submission.code_hash)
+            submission.results_blob = pack_results(submission.results) if submission.results else None
+        Submission.objects.bulk_update(batch, ['source', 'results_blob'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_problem_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code_hash', models.CharField(max_length=64, unique=True)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='results_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='submissions', to='api.submissioncode'),
+        ),
+        migrations.RunPython(compress_submissions, migrations.RunPython.noop),
+    ]
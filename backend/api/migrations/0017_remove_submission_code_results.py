@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Separate from 0016 so PostgreSQL doesn't alter the table in the
+    # transaction that just rewrote its rows
+
+    dependencies = [
+        ('api', '0016_submission_code'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='submission',
+            name='code',
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='results',
+        ),
+    ]
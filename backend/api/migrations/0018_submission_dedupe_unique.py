@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:22
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def clear_duplicate_dedupe_keys(apps, schema_editor):
+    # Concurrent identical submissions could be queued twice before the
+    # constraint existed; keep the key on the newest live one of each
+    Submission = apps.get_model('api', 'Submission')
+    live = Submission.objects.exclude(dedupe_key='').exclude(status='failed')
+    duplicates = live.values('dedupe_key').annotate(runs=Count('id'), newest=Max('id')).filter(runs__gt=1)
+    for row in duplicates.iterator():
+        live.filter(dedupe_key=row['dedupe_key']).exclude(id=row['newest']).update(dedupe_key='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_remove_submission_code_results'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_dedupe_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('dedupe_key', ''), _negated=True), models.Q(('status', 'failed'), _negated=True)), fields=('dedupe_key',), name='submission_dedupe_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_submission_dedupe_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['-score', 'created_at'], name='leaderboard_rank_idx'),
+        ),
+    ]
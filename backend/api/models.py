@@ -1,5 +1,10 @@
+import hashlib
+
 from django.db import models
 
+from . import blobs
+from .rendering import html_hash, render_markdown
+
 class LeaderboardEntry(models.Model):
     name = models.CharField(max_length=100)
     score = models.IntegerField()
@@ -10,6 +15,10 @@ class LeaderboardEntry(models.Model):
 
     class Meta:
         ordering = ['-score', 'created_at']  # Order by score descending, then by creation time
+        indexes = [
+            # The leaderboard order; also counts the players ahead of someone
+            models.Index(fields=['-score', 'created_at'], name='leaderboard_rank_idx'),
+        ]
         verbose_name = "Leaderboard Entry"
         verbose_name_plural = "Leaderboard Entries"
 
@@ -17,20 +26,182 @@ class LeaderboardEntry(models.Model):
         return f"{self.name} - {self.score}"
 
 
+class ScoreEvent(models.Model):
+    """One change of a player's score. Rows are only ever appended."""
+    entry = models.ForeignKey(LeaderboardEntry, on_delete=models.CASCADE, related_name='score_events')
+    delta = models.IntegerField()
+    score = models.IntegerField()  # Score after the change
+    reason = models.CharField(max_length=20, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class LeaderboardSnapshot(models.Model):
+    """A player's score at the end of a time bucket, compacted from ScoreEvents."""
+    entry = models.ForeignKey(LeaderboardEntry, on_delete=models.CASCADE, related_name='snapshots')
+    bucket_start = models.DateTimeField()
+    score = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index the score-history endpoint reads through
+            models.UniqueConstraint(fields=['entry', 'bucket_start'], name='snapshot_entry_bucket_uniq'),
+        ]
+
+
 class Problem(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=2_500)
     points = models.IntegerField()
     assignment = models.TextField()
+    # sha256 of name/points/assignment, lets clients skip unchanged statements
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Sanitised HTML rendering of `assignment`, refreshed on every save
+    assignment_html = models.TextField(blank=True, default='')
+    assignment_html_hash = models.CharField(max_length=64, blank=True, default='')
+
+    DERIVED_FIELDS = ('content_hash', 'assignment_html', 'assignment_html_hash')
+
+    def compute_content_hash(self):
+        digest = hashlib.sha256()
+        for part in (self.name, str(self.points), self.assignment):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def refresh_derived_fields(self):
+        """Recompute fields derived from the statement (bulk_create skips save())."""
+        self.content_hash = self.compute_content_hash()
+        self.assignment_html = render_markdown(self.assignment)
+        self.assignment_html_hash = html_hash(self.assignment_html)
+
+    def save(self, *args, **kwargs):
+        self.refresh_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.DERIVED_FIELDS)
+        super().save(*args, **kwargs)
+
+
+class ProblemStats(models.Model):
+    """
+    Per-problem submission statistics, kept up to date by grading.record_verdict
+    (rebuild from scratch with `manage.py rebuild_problem_stats`).
+    """
+    problem = models.OneToOneField(Problem, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)  # Graded submissions
+    correct_submissions = models.PositiveIntegerField(default=0)
+    attempters = models.PositiveIntegerField(default=0)  # Users with a graded submission
+    solvers = models.PositiveIntegerField(default=0)  # Users with a correct submission
+    # Submissions the solvers needed, up to and including their first correct one
+    solve_attempts = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SubmissionCodeManager(models.Manager):
+    def store(self, code):
+        """Return the row holding `code`, creating it the first time this text is seen."""
+        encoded = code.encode('utf-8')
+        source, _ = self.get_or_create(
+            code_hash=blobs.code_hash(code),
+            defaults={'data': blobs.pack(encoded), 'size': len(encoded)},
+        )
+        return source
+
+    async def astore(self, code):
+        """Async version of store."""
+        encoded = code.encode('utf-8')
+        source, _ = await self.aget_or_create(
+            code_hash=blobs.code_hash(code),
+            defaults={'data': blobs.pack(encoded), 'size': len(encoded)},
+        )
+        return source
+
+
+class SubmissionCode(models.Model):
+    """Submitted source code, stored compressed once per distinct text (see api/blobs.py)."""
+    code_hash = models.CharField(max_length=64, unique=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()  # Uncompressed length in bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SubmissionCodeManager()
+
+    @property
+    def code(self):
+        return blobs.unpack(self.data).decode('utf-8')
 
 
 class Submission(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     id = models.AutoField(primary_key=True)
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     submission_time = models.DateTimeField(auto_now_add=True)
     submission_correct = models.BooleanField(default=False)
     submisser = models.ForeignKey(LeaderboardEntry, on_delete=models.CASCADE)
 
+    # Grading job state, drained by the grade_submissions worker command
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    source = models.ForeignKey(
+        SubmissionCode, on_delete=models.PROTECT, null=True, blank=True, related_name='submissions'
+    )
+    results_blob = models.BinaryField(null=True, blank=True)  # Compressed per-test results from the grader
+    total_tests = models.IntegerField(default=0)
+    passed_tests = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Client-supplied Idempotency-Key header of the /test/ request, if any
+    idempotency_key = models.CharField(max_length=255, blank=True, default='')
+    # sha256 of (submitter, problem, code, test suite hash); see grading.submission_dedupe_key
+    dedupe_key = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='submission_queue_idx'),
+            # Keyset pagination of a user's history, newest first
+            models.Index(fields=['submisser', '-submission_time', '-id'], name='submission_history_idx'),
+            models.Index(fields=['dedupe_key'], name='submission_dedupe_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['submisser', 'idempotency_key'],
+                condition=~models.Q(idempotency_key=''),
+                name='submission_idempotency_uniq',
+            ),
+            # One live (not failed) run per dedupe key, so concurrent identical
+            # submissions can't both be queued
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=~models.Q(dedupe_key='') & ~models.Q(status='failed'),
+                name='submission_dedupe_uniq',
+            ),
+        ]
+
+    @property
+    def code(self):
+        """The submitted source (loads the SubmissionCode row unless selected with it)."""
+        return self.source.code if self.source_id else ''
+
+    @property
+    def results(self):
+        return blobs.unpack_results(self.results_blob)
+
+    @results.setter
+    def results(self, results):
+        self.results_blob = blobs.pack_results(results)
+
 
 class TestCase(models.Model):
     id = models.AutoField(primary_key=True)
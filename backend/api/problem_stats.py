@@ -0,0 +1,125 @@
+"""
+Materialised per-problem statistics (the ProblemStats table).
+
+Grading updates a problem's row incrementally in the transaction that
+stores the verdict (`record_graded_submission`), so the stats endpoint
+reads one row per problem instead of aggregating over every submission.
+Code that edits or deletes graded submissions (update_submission,
+delete_submission, regrade_problem) recomputes the problem's row with
+`rebuild_problem` in the same transaction. `rebuild` recomputes everything
+with a single grouped aggregate, for the initial fill and to repair drift
+(e.g. after submissions are edited in the database by hand).
+"""
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Problem, ProblemStats, Submission
+
+STAT_FIELDS = ('attempts', 'correct_submissions', 'attempters', 'solvers', 'solve_attempts')
+
+
+def record_graded_submission(submission, earlier_graded, solved_before):
+    """
+    Count a newly graded submission in its problem's stats.
+
+    Must run inside the transaction that marks the submission done.
+
+    Args:
+        submission: The graded Submission (submission_correct set)
+        earlier_graded: Number of the submitter's other graded submissions
+            for this problem
+        solved_before: Whether the submitter already had a correct one
+    """
+    first_solve = submission.submission_correct and not solved_before
+    # Make sure the row exists without racing another worker over the insert
+    ProblemStats.objects.bulk_create([ProblemStats(problem_id=submission.problem_id)], ignore_conflicts=True)
+    ProblemStats.objects.filter(problem_id=submission.problem_id).update(
+        attempts=F('attempts') + 1,
+        correct_submissions=F('correct_submissions') + int(submission.submission_correct),
+        attempters=F('attempters') + int(earlier_graded == 0),
+        solvers=F('solvers') + int(first_solve),
+        solve_attempts=F('solve_attempts') + (earlier_graded + 1 if first_solve else 0),
+        updated_at=timezone.now(),
+    )
+
+
+def grouped_stats(submission_table, done_status, problem_id=None):
+    """
+    Compute every problem's stats from the submissions in one query.
+
+    Args:
+        submission_table: db_table of the Submission model
+        done_status: Status value of graded submissions
+        problem_id: Only compute this problem's stats
+
+    Returns:
+        dict: problem id -> {field: value} for problems with graded submissions
+    """
+    table = connection.ops.quote_name(submission_table)
+    where, params = 'status = %s', [done_status]
+    if problem_id is not None:
+        where, params = where + ' AND problem_id = %s', params + [problem_id]
+    with connection.cursor() as cursor:
+        # The window finds each submitter's first correct submission, the
+        # GROUP BY folds everything into one row per problem
+        cursor.execute(
+            f"""
+            SELECT problem_id,
+                   COUNT(*),
+                   SUM(CASE WHEN submission_correct THEN 1 ELSE 0 END),
+                   COUNT(DISTINCT submisser_id),
+                   COUNT(DISTINCT CASE WHEN submission_correct THEN submisser_id END),
+                   SUM(CASE WHEN id <= first_solve THEN 1 ELSE 0 END)
+            FROM (
+                SELECT id, problem_id, submisser_id, submission_correct,
+                       MIN(CASE WHEN submission_correct THEN id END)
+                           OVER (PARTITION BY problem_id, submisser_id) AS first_solve
+                FROM {table}
+                WHERE {where}
+            ) AS graded
+            GROUP BY problem_id
+            """,
+            params,
+        )
+        return {row[0]: dict(zip(STAT_FIELDS, row[1:])) for row in cursor.fetchall()}
+
+
+def rebuild(problem_model=None, stats_model=None, submission_model=None):
+    """
+    Replace the ProblemStats table with freshly computed stats.
+
+    The model arguments let migrations pass their historical models.
+
+    Returns:
+        int: Number of problems written
+    """
+    problem_model = problem_model or Problem
+    stats_model = stats_model or ProblemStats
+    submission_model = submission_model or Submission
+
+    stats = grouped_stats(submission_model._meta.db_table, Submission.STATUS_DONE)
+    zero = dict.fromkeys(STAT_FIELDS, 0)
+    with transaction.atomic():
+        stats_model.objects.all().delete()
+        rows = stats_model.objects.bulk_create(
+            [
+                stats_model(problem_id=problem_id, **stats.get(problem_id, zero))
+                for problem_id in problem_model.objects.values_list('id', flat=True)
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def rebuild_problem(problem_id):
+    """
+    Recompute one problem's stats row, after its graded submissions were
+    edited or deleted. Run it inside the transaction making the change.
+    """
+    stats = grouped_stats(Submission._meta.db_table, Submission.STATUS_DONE, problem_id)
+    row = ProblemStats(problem_id=problem_id, **stats.get(problem_id, dict.fromkeys(STAT_FIELDS, 0)))
+    ProblemStats.objects.bulk_create(
+        [row], update_conflicts=True, unique_fields=['problem'], update_fields=[*STAT_FIELDS, 'updated_at']
+    )
@@ -0,0 +1,159 @@
+"""
+Token-bucket rate limits for the endpoints that hold scarce upstream capacity.
+
+Each limited endpoint has two buckets in the cache: one per user and one
+shared by everyone (see RATE_LIMITS in settings). A request takes a token
+from the user's bucket first and then from the global one, so a user who
+is over their own budget never drains the shared capacity, and the global
+bucket caps what all users together can send to the grader or the LLM.
+
+A bucket is stored as (tokens, last refill time) and refilled lazily on
+access. The cache API has no compare-and-set, so the read-modify-write is
+guarded by a short lock taken with `cache.add`. Limits are shared between
+processes only when the cache is (REDIS_URL, which docker-compose sets);
+with the default local-memory cache each process enforces them separately,
+so the global caps are multiplied by the number of backend processes.
+`manage.py check --deploy` warns about that (api/checks.py).
+"""
+
+import asyncio
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .responses import json_response
+
+# How long to wait for a bucket's lock before giving up on the request
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.005
+
+
+class Bucket:
+    """One token bucket: holds up to `capacity` tokens, refilled at `rate` per second."""
+
+    def __init__(self, key, capacity, per_minute):
+        self.key = f'ratelimit:{key}'
+        self.lock_key = f'{self.key}:lock'
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        # An idle bucket is full again after this long, which is the same as missing
+        self.timeout = math.ceil(capacity / self.rate) + 1
+
+    def _take(self, state, now, tokens):
+        """
+        Apply a take (or, with negative `tokens`, a refund) to a stored state.
+
+        Returns:
+            tuple: (new state or None to leave it untouched, seconds until
+            the take can succeed; 0 if it did)
+        """
+        level, updated = state or (self.capacity, now)
+        level = min(self.capacity, level + (now - updated) * self.rate)
+        if level < tokens:
+            return None, math.ceil((tokens - level) / self.rate)
+        return (min(self.capacity, level - tokens), now), 0
+
+    def take(self, tokens=1):
+        """Take tokens; returns 0 on success, otherwise the Retry-After in seconds."""
+        for _ in range(LOCK_ATTEMPTS):
+            if cache.add(self.lock_key, 1, timeout=1):
+                try:
+                    state, retry_after = self._take(cache.get(self.key), time.time(), tokens)
+                    if state is not None:
+                        cache.set(self.key, state, timeout=self.timeout)
+                    return retry_after
+                finally:
+                    cache.delete(self.lock_key)
+            time.sleep(LOCK_WAIT)
+        return 1  # Heavily contended; ask the client to come back shortly
+
+    async def atake(self, tokens=1):
+        """Async version of take."""
+        for _ in range(LOCK_ATTEMPTS):
+            if await cache.aadd(self.lock_key, 1, timeout=1):
+                try:
+                    state, retry_after = self._take(await cache.aget(self.key), time.time(), tokens)
+                    if state is not None:
+                        await cache.aset(self.key, state, timeout=self.timeout)
+                    return retry_after
+                finally:
+                    await cache.adelete(self.lock_key)
+            await asyncio.sleep(LOCK_WAIT)
+        return 1
+
+
+def _buckets(name, user_key):
+    limits = settings.RATE_LIMITS[name]
+    return (
+        ('user', Bucket(f'{name}:user:{user_key}', *limits['user'])),
+        ('global', Bucket(f'{name}:global', *limits['global'])),
+    )
+
+
+def _user_key(request, user):
+    # Views are behind login_required, the address is only a fallback
+    return (user or {}).get('id') or request.META.get('REMOTE_ADDR', 'anonymous')
+
+
+def _too_many_requests(request, name, scope, retry_after):
+    metrics.RATE_LIMITED.inc(name, scope)
+    response = json_response(request, {
+        'success': False,
+        'error': 'Too many requests, please slow down',
+        'retry_after': retry_after,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(name):
+    """
+    Decorator applying the RATE_LIMITS[name] user and global token buckets.
+
+    Over-limit requests get a 429 with a Retry-After header. OPTIONS
+    requests are not limited. Works for both sync and async views.
+
+    Args:
+        name: Key into settings.RATE_LIMITS
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if settings.RATE_LIMIT_ENABLED and request.method != 'OPTIONS':
+                    user = await request.session.aget('user')
+                    taken = []
+                    for scope, bucket in _buckets(name, _user_key(request, user)):
+                        retry_after = await bucket.atake()
+                        if retry_after:
+                            # Give back what the earlier bucket already handed out
+                            for earlier in taken:
+                                await earlier.atake(-1)
+                            return _too_many_requests(request, name, scope, retry_after)
+                        taken.append(bucket)
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATE_LIMIT_ENABLED and request.method != 'OPTIONS':
+                user = request.session.get('user')
+                taken = []
+                for scope, bucket in _buckets(name, _user_key(request, user)):
+                    retry_after = bucket.take()
+                    if retry_after:
+                        for earlier in taken:
+                            earlier.take(-1)
+                        return _too_many_requests(request, name, scope, retry_after)
+                    taken.append(bucket)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
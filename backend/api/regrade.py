@@ -0,0 +1,184 @@
+"""
+Re-grading a problem's past submissions after its test suite changed.
+
+When a test case is fixed (update_test), verdicts recorded against the old
+suite and the points awarded for them go stale. `regrade_problem` runs the
+problem's graded submissions against the current suite again:
+
+- submissions are grouped by their SubmissionCode row, so every distinct
+  text is sent to the grader once however often it was submitted;
+- the texts go to the grader in batches, the requests of a batch running
+  concurrently over the pooled grader client;
+- the verdicts are written back in one final transaction, with bulk_update,
+  while the problem's players are locked as record_verdict locks them;
+- in that transaction the players who solved the problem are read before
+  and after the write, over all their graded submissions, and the
+  difference is applied to the scores with adjust_scores.
+
+Submissions that finish after the run started (id above the cutoff) are not
+re-graded. update_test invalidates the cached suite, so the workers grade
+new submissions against the new tests, but one already being graded when
+the test changed may have used the old suite: run the command again once
+the queue has drained to catch those.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Max
+
+from . import blobs, problem_stats, score_history, upstream, versions
+from .models import LeaderboardEntry, Problem, Submission, SubmissionCode
+from .suite_cache import build_test_suite
+from .utils import adjust_scores
+
+logger = logging.getLogger(__name__)
+
+REGRADE_BATCH = 50
+REGRADE_WORKERS = 4
+
+
+@dataclass
+class RegradeReport:
+    submissions: int = 0  # graded submissions re-graded
+    codes: int = 0  # distinct code texts among them
+    codes_done: int = 0
+    failed: int = 0  # distinct texts the grader could not grade, left unchanged
+    updated: int = 0  # submissions given a new verdict
+    flipped: int = 0  # of which correct became incorrect or the other way round
+    score_changes: dict = field(default_factory=dict)  # entry id -> (name, old, new)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+def _solvers(problem_id, entry_ids):
+    """Ids of the players among `entry_ids` with a correct graded submission for the problem."""
+    return set(
+        Submission.objects.filter(
+            problem_id=problem_id, submisser_id__in=entry_ids,
+            status=Submission.STATUS_DONE, submission_correct=True,
+        ).values_list('submisser_id', flat=True).distinct()
+    )
+
+
+def _grade(problem_id, code, payload):
+    try:
+        return upstream.grade_submission(problem_id, code, payload)
+    except Exception as e:
+        logger.warning("Re-grading code for problem %s failed: %s", problem_id, e)
+        return None
+
+
+def _store_verdicts(submissions, verdicts):
+    """
+    Write the verdicts of the re-graded code texts onto their submissions.
+
+    Args:
+        submissions: The queryset being re-graded
+        verdicts: dict SubmissionCode id -> grader response
+
+    Returns:
+        tuple: (submissions updated, of which verdicts flipped)
+    """
+    # Every submission of the same text shares the verdict and the results blob
+    packed = {source_id: blobs.pack_results(result.get('results', [])) for source_id, result in verdicts.items()}
+    batch = list(
+        submissions.filter(source_id__in=verdicts)
+        .only('id', 'source_id', 'submission_correct')
+    )
+    flipped = 0
+    for submission in batch:
+        result = verdicts[submission.source_id]
+        correct = result.get('correct', False)
+        flipped += correct != submission.submission_correct
+        submission.submission_correct = correct
+        submission.results_blob = packed[submission.source_id]
+        submission.total_tests = result.get('total_tests', 0)
+        submission.passed_tests = result.get('passed_tests', 0)
+    # dedupe_key is left alone: it names the old suite, so it no longer
+    # matches new requests, and several of these submissions would share
+    # the new key (submission_dedupe_uniq allows one)
+    Submission.objects.bulk_update(
+        batch,
+        ['submission_correct', 'results_blob', 'total_tests', 'passed_tests'],
+        batch_size=1000,
+    )
+    return len(batch), flipped
+
+
+def regrade_problem(problem_id, batch_size=REGRADE_BATCH, workers=REGRADE_WORKERS, progress=None):
+    """
+    Re-grade a problem's graded submissions against its current test suite
+    and correct the scores of players whose solve status changed.
+
+    Args:
+        problem_id: The problem whose tests changed
+        batch_size: Distinct code texts per grader batch
+        workers: Concurrent grader requests within a batch
+        progress: Optional callable receiving the RegradeReport after each batch
+
+    Returns:
+        RegradeReport
+
+    Raises:
+        Problem.DoesNotExist: if there is no such problem
+    """
+    problem = Problem.objects.get(id=problem_id)
+    report = RegradeReport()
+
+    # Submissions without a source have no code to grade
+    graded = Submission.objects.filter(problem_id=problem_id, status=Submission.STATUS_DONE)
+    submissions = graded.filter(source__isnull=False)
+    cutoff = submissions.aggregate(last=Max('id'))['last']
+    if cutoff is None:
+        return report
+    submissions = submissions.filter(id__lte=cutoff)
+
+    # Read straight from the database, in case a stale suite is still cached
+    suite = build_test_suite(problem_id)
+    verdicts = {}
+    source_ids = list(submissions.order_by('source_id').values_list('source_id', flat=True).distinct())
+    report.submissions = submissions.count()
+    report.codes = len(source_ids)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for start in range(0, len(source_ids), batch_size):
+            sources = SubmissionCode.objects.in_bulk(source_ids[start:start + batch_size])
+            results = pool.map(lambda source: _grade(problem_id, source.code, suite.payload), sources.values())
+            batch = {
+                source_id: result
+                for source_id, result in zip(sources, results)
+                if result is not None
+            }
+            report.failed += len(sources) - len(batch)
+            verdicts.update(batch)
+            report.codes_done += len(sources)
+            if progress:
+                progress(report)
+
+    with transaction.atomic():
+        # Lock every player with a graded submission for the problem, so
+        # record_verdict cannot award or count a solve between the two reads
+        entry_ids = list(
+            LeaderboardEntry.objects.select_for_update()
+            .filter(id__in=graded.values('submisser_id')).order_by('id').values_list('id', flat=True)
+        )
+        # Solve status over all graded submissions, so a player's newer
+        # correct submission still counts when an old one flips
+        solved_before = _solvers(problem_id, entry_ids)
+        report.updated, report.flipped = _store_verdicts(submissions, verdicts)
+        solved_after = _solvers(problem_id, entry_ids)
+        deltas = {entry_id: problem.points for entry_id in solved_after - solved_before}
+        deltas.update({entry_id: -problem.points for entry_id in solved_before - solved_after})
+        report.score_changes = adjust_scores(deltas, score_history.REASON_REGRADE)
+        if solved_after != solved_before:
+            versions.bump_version(versions.LEADERBOARD)
+        problem_stats.rebuild_problem(problem_id)
+
+    return report
@@ -0,0 +1,37 @@
+"""
+Markdown rendering for problem statements.
+
+Statements are rendered to sanitised HTML once, when a problem is saved or
+imported, instead of on every client. Rendering uses CommonMark (close to
+what the frontend's `marked` produced) with raw HTML disabled, and the
+output is passed through an allow-list sanitiser as a second line of defence.
+"""
+
+import hashlib
+
+import nh3
+from markdown_it import MarkdownIt
+
+_markdown = MarkdownIt('commonmark', {'html': False}).enable(['table', 'strikethrough'])
+
+# Keep the fence language class so the frontend can syntax-highlight code
+_allowed_attributes = {tag: set(attrs) for tag, attrs in nh3.ALLOWED_ATTRIBUTES.items()}
+_allowed_attributes.setdefault('code', set()).add('class')
+
+
+def render_markdown(source):
+    """
+    Render markdown to sanitised HTML.
+
+    Args:
+        source: Markdown text
+
+    Returns:
+        str: Safe HTML fragment
+    """
+    return nh3.clean(_markdown.render(source or ''), attributes=_allowed_attributes)
+
+
+def html_hash(html):
+    """Return the sha256 hex digest of a rendered HTML fragment."""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
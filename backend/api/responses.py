@@ -0,0 +1,112 @@
+"""
+JSON response helpers shared by the API views.
+
+Responses are rendered with orjson and, above a size threshold, compressed
+with brotli or gzip depending on the client's Accept-Encoding header.
+"""
+
+import gzip
+
+import orjson
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def add_cors_headers(response):
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    response['Access-Control-Allow-Headers'] = 'Content-Type, Idempotency-Key'
+    return response
+
+
+def render_json(data):
+    """
+    Encode data to JSON bytes.
+
+    Falls back to Django's encoder for types orjson doesn't know about
+    (Decimal, lazy translation strings, ...).
+    """
+    return orjson.dumps(data, default=_django_encoder.default)
+
+
+def accepted_encodings(request):
+    """
+    Parse the Accept-Encoding header into the set of acceptable codings.
+
+    Args:
+        request: Django request object (or None)
+
+    Returns:
+        set: Lower-cased coding names the client accepts (q > 0)
+    """
+    header = request.headers.get('Accept-Encoding', '') if request is not None else ''
+    encodings = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            encodings.add(coding)
+    return encodings
+
+
+def compress(body, encodings):
+    """
+    Compress a body with the best coding the client accepts.
+
+    Args:
+        body: Raw response bytes
+        encodings: Codings accepted by the client
+
+    Returns:
+        tuple: (coding or None, body)
+    """
+    if brotli is not None and 'br' in encodings:
+        return 'br', brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    if 'gzip' in encodings or '*' in encodings:
+        return 'gzip', gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+    return None, body
+
+
+def json_response(request, data, status=200):
+    """
+    Render data as a JSON API response with CORS headers.
+
+    Bodies larger than RESPONSE_COMPRESSION_MIN_BYTES are compressed when the
+    client advertises brotli or gzip support.
+
+    Args:
+        request: The request being answered (used for content negotiation)
+        data: JSON-serialisable payload
+        status: HTTP status code
+
+    Returns:
+        HttpResponse
+    """
+    body = render_json(data)
+    coding = None
+    if len(body) >= settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        coding, body = compress(body, accepted_encodings(request))
+
+    response = HttpResponse(body, status=status, content_type='application/json')
+    if coding:
+        response['Content-Encoding'] = coding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return add_cors_headers(response)
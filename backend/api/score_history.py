@@ -0,0 +1,143 @@
+"""
+Score history: an append-only ledger plus compacted snapshots.
+
+Every change to a LeaderboardEntry's score also appends a ScoreEvent (in the
+same transaction). The `compact_scores` management command periodically
+folds the events into LeaderboardSnapshot rows, one per player per
+SCORE_SNAPSHOT_INTERVAL bucket holding the score at the end of that bucket,
+so the score-history endpoint reads a handful of precomputed rows instead of
+replaying the ledger or scanning submissions.
+
+Players only get a snapshot for buckets in which their score changed; a
+chart should carry the previous value forward.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from . import versions
+from .leaderboard_push import publish_score_changes
+from .models import LeaderboardSnapshot, ScoreEvent
+
+REASON_SIGNUP = 'signup'
+REASON_SOLVE = 'solve'
+REASON_BONUS = 'bonus'
+REASON_ADMIN = 'admin'
+REASON_SEED = 'seed'
+REASON_REGRADE = 'regrade'
+
+# Resolutions the history endpoint can downsample to, in seconds
+RESOLUTIONS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+}
+
+COMPACT_BATCH = 1000
+
+
+def record_score_events(changes, reason=''):
+    """
+    Append a ScoreEvent for each score that actually changed, and publish
+    the changes to live leaderboard subscribers once the transaction commits.
+
+    Args:
+        changes: Iterable of (entry id, old score, new score)
+        reason: Short label stored with the events
+    """
+    events = [
+        ScoreEvent(entry_id=entry_id, delta=new_score - old_score, score=new_score, reason=reason)
+        for entry_id, old_score, new_score in changes
+        if new_score != old_score
+    ]
+    if events:
+        ScoreEvent.objects.bulk_create(events, batch_size=COMPACT_BATCH)
+        # Every score change passes through here, so this is where the live
+        # leaderboard stream is fed from
+        publish_score_changes(event.entry_id for event in events)
+        versions.bump_version(versions.LEADERBOARD)
+
+
+def bucket_start(moment, seconds):
+    """Start of the `seconds`-wide bucket (aligned to the Unix epoch) containing `moment`."""
+    timestamp = int(moment.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % seconds, tz=dt_timezone.utc)
+
+
+def compact_score_events(prune_before=None):
+    """
+    Fold new ScoreEvents into LeaderboardSnapshot rows.
+
+    Events from the newest snapshot bucket onwards are replayed (that bucket
+    may have been compacted while it was still open), so running this
+    repeatedly is safe.
+
+    Args:
+        prune_before: Optionally delete events older than this datetime once
+            they are compacted
+
+    Returns:
+        tuple: (events read, snapshots written, events pruned)
+    """
+    interval = settings.SCORE_SNAPSHOT_INTERVAL
+    watermark = LeaderboardSnapshot.objects.aggregate(latest=Max('bucket_start'))['latest']
+
+    events = ScoreEvent.objects.order_by('created_at', 'id')
+    if watermark is not None:
+        events = events.filter(created_at__gte=watermark)
+
+    # Last score per (player, bucket); bounded by the players active since
+    # the watermark rather than by the number of events
+    latest = {}
+    read = 0
+    for entry_id, created_at, score in events.values_list('entry_id', 'created_at', 'score').iterator(
+        chunk_size=COMPACT_BATCH
+    ):
+        latest[(entry_id, bucket_start(created_at, interval))] = score
+        read += 1
+
+    with transaction.atomic():
+        LeaderboardSnapshot.objects.bulk_create(
+            [
+                LeaderboardSnapshot(entry_id=entry_id, bucket_start=start, score=score)
+                for (entry_id, start), score in latest.items()
+            ],
+            batch_size=COMPACT_BATCH,
+            update_conflicts=True,
+            unique_fields=['entry', 'bucket_start'],
+            update_fields=['score'],
+        )
+
+        pruned = 0
+        if prune_before is not None and latest:
+            # Never drop events of the newest bucket, the next run replays it
+            newest = max(start for _, start in latest)
+            pruned, _ = ScoreEvent.objects.filter(created_at__lt=min(prune_before, newest)).delete()
+
+    return read, len(latest), pruned
+
+
+def downsample(snapshots, resolution):
+    """
+    Reduce (bucket_start, score) rows, oldest first, to one point per
+    `resolution`-second bucket holding the last score in it.
+
+    Returns:
+        list: [(bucket start datetime, score)]
+    """
+    points = []
+    for start, score in snapshots:
+        start = bucket_start(start, resolution)
+        if points and points[-1][0] == start:
+            points[-1] = (start, score)
+        else:
+            points.append((start, score))
+    return points
+
+
+def history_since(days):
+    """Default window start for the history endpoint."""
+    return bucket_start(datetime.now(dt_timezone.utc) - timedelta(days=days), settings.SCORE_SNAPSHOT_INTERVAL)
@@ -0,0 +1,20 @@
+"""
+Model signal handlers, connected in ApiConfig.ready.
+
+Problems are also written outside the API views (Django admin, shell), so
+the PROBLEMS version is bumped from the model signals rather than only from
+the views. Bulk operations (bulk_create, bulk_update, QuerySet.update) send
+no signals; their callers bump the version themselves.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import versions
+from .models import Problem
+
+
+@receiver(post_save, sender=Problem, dispatch_uid='problem_saved_bump_version')
+@receiver(post_delete, sender=Problem, dispatch_uid='problem_deleted_bump_version')
+def bump_problems_version(sender, **kwargs):
+    versions.bump_version(versions.PROBLEMS)
@@ -0,0 +1,146 @@
+"""
+Per-problem cache of the serialised test suite sent to the grader.
+
+Every submission for a problem is graded against the same list of test cases,
+so the suite is encoded to JSON once and kept in the cache together with a
+hash of its contents. Views and commands that change test cases (or the
+problem itself) invalidate the entry once their transaction commits.
+
+The grading worker and the management commands are separate processes, so
+the cache must be shared (REDIS_URL) for their invalidations to reach each
+other; see `cache_is_shared`.
+"""
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import TestCase
+
+# Bumped by invalidate_all_test_suites so bulk deletes don't have to know
+# every problem id that had a cached suite.
+GENERATION_KEY = 'suite:generation'
+
+
+@dataclass(frozen=True)
+class TestSuite:
+    payload: bytes  # JSON-encoded list of test cases
+    suite_hash: str  # sha256 of payload, changes whenever the suite does
+    count: int
+
+
+def _version_key(problem_id):
+    return f'suite:version:{problem_id}'
+
+
+def _fresh_counter():
+    # Start from the current time in ms rather than 1 so a counter that was
+    # evicted never repeats a value whose entry may still be cached
+    return int(time.time() * 1000)
+
+
+def _bump(key):
+    if not cache.add(key, _fresh_counter(), timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:  # evicted in between
+            cache.add(key, _fresh_counter(), timeout=None)
+
+
+def _cache_key(problem_id):
+    """
+    The cache key of a problem's suite under the current counters.
+
+    Writes bump the problem's version (or the generation), so an entry built
+    from rows read before a write is stored under a key that is no longer
+    read instead of replacing the invalidation.
+    """
+    version_key = _version_key(problem_id)
+    counters = cache.get_many([GENERATION_KEY, version_key])
+    for key in (GENERATION_KEY, version_key):
+        if key not in counters:
+            cache.add(key, _fresh_counter(), timeout=None)
+            counters[key] = cache.get(key)
+    return f'suite:{counters[GENERATION_KEY]}:{problem_id}:{counters[version_key]}'
+
+
+def serialize_test_suite(problem_id):
+    """
+    Serialise a problem's test cases into the list the grader expects.
+
+    Args:
+        problem_id: The problem whose tests to serialise
+
+    Returns:
+        list: One dict per test case
+    """
+    return list(
+        TestCase.objects.filter(problem_id=problem_id)
+        .order_by('id')
+        .values('id', 'input_data', 'expected_output', 'is_public')
+    )
+
+
+def build_test_suite(problem_id):
+    """
+    Load and encode a problem's test suite straight from the database.
+
+    Args:
+        problem_id: The problem whose tests to encode
+
+    Returns:
+        TestSuite
+    """
+    tests = serialize_test_suite(problem_id)
+    payload = json.dumps(tests, separators=(',', ':')).encode('utf-8')
+    return TestSuite(
+        payload=payload,
+        suite_hash=hashlib.sha256(payload).hexdigest(),
+        count=len(tests),
+    )
+
+
+def get_test_suite(problem_id):
+    """
+    Return the encoded test suite for a problem, building it on a cache miss.
+
+    Args:
+        problem_id: The problem whose tests to fetch
+
+    Returns:
+        TestSuite
+    """
+    # The key is taken before reading the tests, see _cache_key
+    key = _cache_key(problem_id)
+    suite = cache.get(key)
+    if suite is None:
+        suite = build_test_suite(problem_id)
+        cache.set(key, suite, timeout=settings.SUITE_CACHE_TIMEOUT)
+    return suite
+
+
+def invalidate_test_suite(problem_id):
+    """
+    Drop a problem's cached suite once the current transaction commits.
+
+    Args:
+        problem_id: The problem whose tests changed
+    """
+    transaction.on_commit(lambda: _bump(_version_key(problem_id)))
+
+
+def invalidate_all_test_suites():
+    """Drop every cached suite once the current transaction commits."""
+    transaction.on_commit(lambda: _bump(GENERATION_KEY))
+
+
+def cache_is_shared():
+    """Whether the default cache is visible to other processes (not per-process memory)."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
@@ -1,3 +1,1094 @@
-from django.test import TestCase
+"""
+Query-count and response-time budgets for every API endpoint.
 
-# Create your tests here.
+The suite seeds a production-sized dataset (thousands of users, every problem
+from problems_data.py and tens of thousands of submissions) and requests each
+route in api/urls.py once. The budgets are constants, so an endpoint whose
+query count starts growing with the size of a table fails straight away.
+
+Behaviour of individual features (caches, the score and stats pipelines,
+submission storage and deduplication, ...) is tested by the smaller classes
+after it, each with a minimal fixture of its own.
+
+Upstream services are mocked; nothing here talks to the grader, the LLM or
+zauth.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+from html.parser import HTMLParser
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .management.problems_data import PROBLEMS
+from .management.seeding import TestCaseDiff
+from . import leaderboard_push, metrics, problem_stats, suite_cache, versions
+from .checks import check_shared_rate_limits
+from .grading import claim_next_submission, record_failure, record_verdict, requeue_expired_jobs
+from .models import LeaderboardEntry, Problem, ProblemStats, ScoreEvent, Submission, SubmissionCode, TestCase as ProblemTestCase
+from .pagination import InvalidPageRequest, decode_cursor, encode_cursor
+from .regrade import regrade_problem
+from .responses import brotli, json_response
+from .rendering import html_hash, render_markdown
+from .score_history import compact_score_events
+from .utils import adjust_score
+
+USERS = 2_000
+SUBMISSIONS = 20_000
+TESTS_PER_PROBLEM = 20
+
+# Wall-clock budget per request; generous so a slow CI box doesn't flake
+RESPONSE_TIME_BUDGET = 2.0
+
+ADMIN = {'id': 1, 'username': 'tyboro', 'name': 'tyboro', 'picture': None}
+
+
+def log_in(client, entry):
+    """Give the test client an authenticated session as ADMIN, playing as `entry`."""
+    session = client.session
+    session['user'] = ADMIN
+    session['oauth_token'] = {'token_type': 'Bearer', 'scope': None, 'expires_at': None}
+    session['leaderboard_entry_id'] = entry.id
+    session.save()
+
+
+def post_json(client, path, data, **extra):
+    return client.post(path, data=json.dumps(data), content_type='application/json', **extra)
+
+
+class EndpointBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1234)
+
+        problems = []
+        for item in PROBLEMS:
+            problem = Problem(name=item['name'], points=item['points'], assignment=item['assignment'])
+            problem.refresh_derived_fields()
+            problems.append(problem)
+        cls.problems = Problem.objects.bulk_create(problems)
+
+        ProblemTestCase.objects.bulk_create([
+            ProblemTestCase(
+                problem=problem,
+                input_data=json.dumps([i, i + 1]),
+                expected_output=json.dumps(2 * i + 1),
+                is_public=i % 4 == 0,
+            )
+            for problem in cls.problems
+            for i in range(TESTS_PER_PROBLEM)
+        ])
+
+        cls.admin_entry = LeaderboardEntry.objects.create(
+            name=ADMIN['username'], score=100, zauth_id=ADMIN['id']
+        )
+        users = LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(name=f'user{i}', score=rng.randint(0, 5_000), zauth_id=1_000 + i)
+            for i in range(USERS)
+        ])
+        cls.users = [cls.admin_entry] + users
+
+        source = SubmissionCode.objects.store('def f(x):\n    return x\n')
+        now = timezone.now()
+        Submission.objects.bulk_create([
+            Submission(
+                problem=rng.choice(cls.problems),
+                submisser=cls.admin_entry if i % 10 == 0 else rng.choice(users),
+                submission_time=now - timedelta(seconds=i),
+                submission_correct=rng.random() < 0.3,
+                status=Submission.STATUS_DONE,
+                source=source,
+                results=[{'test_id': 1, 'passed': True}],
+                total_tests=TESTS_PER_PROBLEM,
+                passed_tests=rng.randint(0, TESTS_PER_PROBLEM),
+            )
+            for i in range(SUBMISSIONS)
+        ], batch_size=2_000)
+        cls.submission = Submission.objects.filter(submisser=cls.admin_entry).first()
+
+    def setUp(self):
+        log_in(self.client, self.admin_entry)
+
+    def request(self, method, path, max_queries, data=None, **extra):
+        """
+        Issue a request and assert it stays within the query and time budget.
+
+        Session writes count towards the budget (a save is a SAVEPOINT, an
+        UPDATE and a RELEASE).
+        """
+        if data is not None:
+            extra.update(data=json.dumps(data), content_type='application/json')
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(path, **extra)
+            if response.streaming:
+                # Streamed bodies query while they are consumed
+                response.content_body = b''.join(response)
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(response.status_code, 500, f'{method.upper()} {path}: {response.status_code}')
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f'{method.upper()} {path} ran {len(queries)} queries (budget {max_queries}):\n'
+            + '\n'.join(q['sql'] for q in queries.captured_queries)
+        )
+        self.assertLess(
+            elapsed, RESPONSE_TIME_BUDGET,
+            f'{method.upper()} {path} took {elapsed:.2f}s (budget {RESPONSE_TIME_BUDGET}s)'
+        )
+        return response
+
+    # Leaderboard and users
+
+    def test_leaderboard(self):
+        response = self.request('get', '/api/leaderboard/', 1)
+        self.assertEqual(len(response.json()['leaderboard']), len(self.users))
+
+    @override_settings(LEADERBOARD_STREAM_TIMEOUT=0)
+    def test_leaderboard_events(self):
+        response = self.request('get', '/api/leaderboard/events/', 1)
+        self.assertTrue(response.content_body.startswith(b'event: snapshot\n'))
+
+    def test_all_users(self):
+        response = self.request('get', '/api/users/all/', 1)
+        users = {user['id']: user for user in response.json()['users']}
+        self.assertEqual(len(users), len(self.users))
+        self.assertEqual(
+            users[self.admin_entry.id]['total_submissions'],
+            Submission.objects.filter(submisser=self.admin_entry).count()
+        )
+
+    def test_update_user(self):
+        user = self.users[1]
+        self.request('put', f'/api/users/{user.id}/', 5, data={'score': 42})
+        self.assertEqual(ScoreEvent.objects.get(entry=user).score, 42)
+
+    def test_score_history(self):
+        now = timezone.now()
+        ScoreEvent.objects.bulk_create([
+            ScoreEvent(entry=self.admin_entry, delta=10, score=100 + 10 * i)
+            for i in range(1, 24 * 7 + 1)
+        ])
+        # created_at is auto_now_add; spread the events over the last week, one per hour
+        for i, event in enumerate(ScoreEvent.objects.filter(entry=self.admin_entry).order_by('id')):
+            ScoreEvent.objects.filter(id=event.id).update(created_at=now - timedelta(hours=24 * 7 - i))
+        compact_score_events()
+
+        path = f'/api/users/{self.admin_entry.id}/score-history/'
+        points = self.request('get', f'{path}?resolution=day', 2).json()['points']
+        self.assertIn(len(points), (7, 8))
+        self.assertEqual(points[-1]['score'], 100 + 10 * 24 * 7)
+        self.assertGreaterEqual(len(self.request('get', f'{path}?resolution=hour', 2).json()['points']), 24 * 7)
+
+    def test_user_submissions(self):
+        response = self.request('get', f'/api/users/{self.admin_entry.id}/submissions/', 3)
+        self.assertTrue(response.json()['next_cursor'])
+        cursor = response.json()['next_cursor']
+        self.request('get', f'/api/users/{self.admin_entry.id}/submissions/?cursor={cursor}', 3)
+
+    def test_user_submissions_ndjson(self):
+        self.request('get', f'/api/users/{self.admin_entry.id}/submissions/?format=ndjson', 4)
+
+    def test_user_solved_problems(self):
+        self.request('get', f'/api/users/{self.admin_entry.id}/solved-problems/', 3)
+
+    def test_process_text(self):
+        # Every endpoint resolving the session's entry checks it still exists (one query)
+        self.request('post', '/api/process-text/', 4, data={'text': 'hello world'})
+
+    # Problems
+
+    def test_all_problems(self):
+        self.request('get', '/api/problems/all/', 1)
+        self.request('get', '/api/problems/all/?view=summary', 1)
+
+    def test_problem_detail(self):
+        self.request('get', f'/api/problems/{self.problems[0].id}/', 1)
+
+    def test_update_problem(self):
+        problem = self.problems[0]
+        self.request('put', f'/api/problems/{problem.id}/', 2, data={'points': problem.points + 1})
+
+    def test_solved_problems(self):
+        self.request('get', '/api/problems/solved/', 2)
+
+    def test_bootstrap(self):
+        data = self.request('get', '/api/bootstrap/', 4).json()
+        self.assertEqual(len(data['problems']), len(self.problems))
+        self.assertTrue(data['solved_problem_ids'])
+        self.assertEqual(data['score'], self.admin_entry.score)
+        self.assertEqual(
+            data['rank'], LeaderboardEntry.objects.filter(score__gt=self.admin_entry.score).count() + 1
+        )
+        # The problem list is cached until a problem changes; the standing is not
+        self.request('get', '/api/bootstrap/', 3)
+
+    def test_problem_stats(self):
+        problem_stats.rebuild()
+        problems = self.request('get', '/api/problems/stats/', 1).json()['problems']
+        self.assertEqual(
+            sum(problem['attempts'] for problem in problems),
+            Submission.objects.filter(status=Submission.STATUS_DONE).count(),
+        )
+
+    # Test cases
+
+    def test_all_tests(self):
+        response = self.request('get', '/api/tests/all/', 2)
+        cursor = response.json()['next_cursor']
+        self.request('get', f'/api/tests/all/?cursor={cursor}', 2)
+
+    def test_all_tests_ndjson(self):
+        self.request('get', '/api/tests/all/?format=ndjson', 2)
+
+    def test_create_update_delete_test(self):
+        response = self.request('post', '/api/tests/create/', 2, data={
+            'problem_id': self.problems[0].id,
+            'input_data': '[1, 2]',
+            'expected_output': '3',
+        })
+        test_id = response.json()['test']['id']
+        self.request('put', f'/api/tests/{test_id}/', 2, data={'is_public': False})
+        self.request('delete', f'/api/tests/{test_id}/delete/', 2)
+
+    def test_bulk_tests(self):
+        problem = self.problems[0]
+        existing = list(ProblemTestCase.objects.filter(problem=problem).values_list('id', flat=True))
+        response = self.request('post', '/api/tests/bulk/', 7, data={
+            'problem_id': problem.id,
+            'upsert': [
+                {'input_data': [i, i], 'expected_output': str(2 * i)} for i in range(40)
+            ] + [
+                {'id': test_id, 'is_public': False} for test_id in existing[:10]
+            ],
+            'delete': existing[10:],
+        })
+        body = response.json()
+        self.assertEqual((len(body['created']), len(body['updated'])), (40, 10))
+        self.assertEqual(ProblemTestCase.objects.filter(problem=problem).count(), 50)
+
+        other = ProblemTestCase.objects.exclude(problem=problem).first()
+        response = self.request('post', '/api/tests/bulk/', 4, data={
+            'problem_id': problem.id,
+            'delete': [other.id],
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(ProblemTestCase.objects.filter(id=other.id).exists())
+
+    # Submissions
+
+    def test_submit_for_grading(self):
+        # Known code text: one lookup, no insert into SubmissionCode. The
+        # insert runs in its own atomic block (a savepoint pair in tests)
+        response = self.request('post', '/api/test/', 7, data={
+            'problem_id': self.problems[0].id,
+            'submission': 'def f(x):\n    return x\n',
+        })
+        self.assertEqual(response.status_code, 202)
+
+    def test_submit_for_grading_deduplicated(self):
+        data = {'problem_id': self.problems[0].id, 'submission': 'def g(x):\n    return x\n'}
+        # New code text: stored once (lookup, insert and its savepoint)
+        first = self.request('post', '/api/test/', 10, data=data, HTTP_IDEMPOTENCY_KEY='retry-1').json()
+        # A retry with the key and a double click without one both get the queued job back
+        retried = self.request('post', '/api/test/', 1, data=data, HTTP_IDEMPOTENCY_KEY='retry-1').json()
+        repeated = self.request('post', '/api/test/', 3, data=data).json()
+        self.assertEqual(retried['submission_id'], first['submission_id'])
+        self.assertEqual(repeated['submission_id'], first['submission_id'])
+        self.request('post', '/api/test/', 1, data={**data, 'submission': 'pass'}, HTTP_IDEMPOTENCY_KEY='retry-1')
+
+    def test_submission_status(self):
+        self.request('get', f'/api/submissions/{self.submission.id}/status/', 1)
+
+    def test_submission_events(self):
+        response = self.request('get', f'/api/submissions/{self.submission.id}/events/', 1)
+        self.assertIn(b'event: result', response.content_body)
+
+    def test_update_submission(self):
+        # The write, then the problem's stats row: aggregate and upsert, in a savepoint pair
+        self.request('put', f'/api/submissions/{self.submission.id}/', 6, data={'submission_correct': True})
+
+    def test_delete_submission(self):
+        self.request('delete', f'/api/submissions/{self.submission.id}/delete/', 6)
+
+    def test_generate_code(self):
+        with mock.patch('api.views.upstream.generate_code', new=mock.AsyncMock(return_value={'code': 'pass'})):
+            self.request('post', '/api/submit/', 0, data={'prompt': 'add a docstring', 'code': 'pass'})
+
+    # Authentication
+
+    def test_auth_routes(self):
+        self.request('get', '/api/auth/check', 0)
+        self.request('get', '/api/auth/profile', 0)
+        self.request('get', '/api/auth/test', 0)
+        self.request('get', '/api/auth/debug', 0)
+        self.request('post', '/api/auth/login', 3)
+
+    def test_auth_callback(self):
+        token = {'access_token': 'secret', 'token_type': 'Bearer', 'user': ADMIN}
+        with mock.patch('api.auth_views.get_oauth_session') as oauth_session:
+            oauth_session.return_value.fetch_token.return_value = token
+            response = self.request('get', '/api/auth/callback?code=x&state=y', 4)
+        self.assertIn('login=success', response['Location'])
+
+    def test_auth_logout(self):
+        self.request('post', '/api/auth/logout', 2)
+
+
+class SuiteCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='suite', points=10, assignment='Add one')
+        ProblemTestCase.objects.create(problem=cls.problem, input_data='[1]', expected_output='2')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_beats_a_late_set(self):
+        # A reader takes the key, a write invalidates, then the reader stores
+        # what it read before the write
+        stale_key = suite_cache._cache_key(self.problem.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProblemTestCase.objects.create(problem=self.problem, input_data='[2]', expected_output='3')
+            suite_cache.invalidate_test_suite(self.problem.id)
+        cache.set(stale_key, suite_cache.TestSuite(payload=b'[]', suite_hash='', count=1))
+
+        self.assertEqual(suite_cache.get_test_suite(self.problem.id).count, 2)
+
+
+class CursorTests(TestCase):
+    def test_tampered_cursors_are_rejected(self):
+        for key in (['1'], [1.5], [True], [None]):
+            with self.assertRaises(InvalidPageRequest):
+                decode_cursor(encode_cursor(key), (int,))
+        self.assertEqual(decode_cursor(encode_cursor([7]), (int,)), [7])
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        cursor = encode_cursor(['x'])
+        self.assertEqual(self.client.get(f'/api/tests/all/?cursor={cursor}').status_code, 400)
+        entry = LeaderboardEntry.objects.create(name='cursor', score=0)
+        cursor = encode_cursor(['2024-13-45T00:00:00', 1])
+        self.assertEqual(self.client.get(f'/api/users/{entry.id}/submissions/?cursor={cursor}').status_code, 400)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def registered(self, metric):
+        self.addCleanup(metrics.REGISTRY.remove, metric)
+        return metric
+
+    def test_sync_middleware_counts_the_request_and_its_queries(self):
+        def view(request):
+            LeaderboardEntry.objects.count()
+            LeaderboardEntry.objects.exists()
+            return HttpResponse(status=204)
+
+        before = metrics.REQUESTS._values.get(('<unresolved>', 'GET', '204'), 0)
+        queries = metrics.REQUEST_QUERIES._values.get(('<unresolved>',), [0, 0])[-2]
+        metrics.MetricsMiddleware(view)(self.factory.get('/sync'))
+        self.assertEqual(metrics.REQUESTS._values[('<unresolved>', 'GET', '204')], before + 1)
+        self.assertEqual(metrics.REQUEST_QUERIES._values[('<unresolved>',)][-2], queries + 2)
+
+    async def test_async_middleware_counts_the_request(self):
+        async def view(request):
+            return HttpResponse(status=202)
+
+        middleware = metrics.MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        before = metrics.REQUESTS._values.get(('<unresolved>', 'POST', '202'), 0)
+        response = await middleware(self.factory.post('/async'))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(metrics.REQUESTS._values[('<unresolved>', 'POST', '202')], before + 1)
+
+    def test_queries_outside_a_request_are_not_counted(self):
+        stats = metrics.QueryStats()
+        token = metrics._query_stats.set(stats)
+        try:
+            LeaderboardEntry.objects.count()
+        finally:
+            metrics._query_stats.reset(token)
+        LeaderboardEntry.objects.count()
+        self.assertEqual(stats.count, 1)
+
+    def test_render_format(self):
+        counter = self.registered(metrics.Counter('test_total', 'A counter.', ('path',)))
+        counter.inc('a"b\\c\nd')
+        histogram = self.registered(metrics.Histogram('test_seconds', 'A histogram.', buckets=(1, 2.5)))
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = metrics.render()
+        self.assertIn(
+            '# HELP test_total A counter.\n# TYPE test_total counter\ntest_total{path="a\\"b\\\\c\\nd"} 1\n', text
+        )
+        self.assertIn(
+            '# TYPE test_seconds histogram\n'
+            'test_seconds_bucket{le="1"} 1\n'
+            'test_seconds_bucket{le="2.5"} 1\n'
+            'test_seconds_bucket{le="+Inf"} 2\n'
+            'test_seconds_sum 5.5\n'
+            'test_seconds_count 2\n',
+            text,
+        )
+
+    def test_endpoint_needs_the_token_outside_debug(self):
+        with override_settings(DEBUG=False, METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=False, METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'# TYPE vibecode_http_requests_total counter', response.content)
+
+
+class NdjsonExportTests(TestCase):
+    def test_export_streams_without_buffering(self):
+        problem = Problem.objects.create(name='export', points=10, assignment='Add one')
+        ProblemTestCase.objects.bulk_create(
+            ProblemTestCase(problem=problem, input_data=[i], expected_output=str(i)) for i in range(3)
+        )
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = self.client.get('/api/tests/all/?format=ndjson')
+            lines = b''.join(response).splitlines()
+        self.assertEqual([json.loads(line)['expected_output'] for line in lines], ['0', '1', '2'])
+        self.assertFalse([w for w in caught if 'StreamingHttpResponse' in str(w.message)])
+
+
+class VersionSignalTests(TestCase):
+    def test_problem_writes_bump_the_problems_version(self):
+        cache.clear()
+        before, _ = versions.get_version(versions.PROBLEMS)
+        with self.captureOnCommitCallbacks(execute=True):
+            problem = Problem.objects.create(name='signals', points=10, assignment='Add one')
+        saved, _ = versions.get_version(versions.PROBLEMS)
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.delete()
+        deleted, _ = versions.get_version(versions.PROBLEMS)
+        self.assertLess(before, saved)
+        self.assertLess(saved, deleted)
+
+    def test_problem_detail_not_served_for_a_reused_id(self):
+        cache.clear()
+        problem = Problem.objects.create(name='old', points=10, assignment='Old statement')
+        self.assertEqual(self.client.get(f'/api/problems/{problem.id}/').json()['problem']['name'], 'old')
+        with self.captureOnCommitCallbacks(execute=True):
+            problem_id = problem.id
+            problem.delete()
+            Problem.objects.create(id=problem_id, name='new', points=10, assignment='New statement')
+        self.assertEqual(self.client.get(f'/api/problems/{problem_id}/').json()['problem']['name'], 'new')
+
+
+class LeaderboardEntrySessionTests(TestCase):
+    def test_deleted_entry_is_resolved_again(self):
+        entry = LeaderboardEntry.objects.create(name=ADMIN['username'], score=0, zauth_id=ADMIN['id'])
+        log_in(self.client, entry)
+        self.assertEqual(self.client.get('/api/problems/solved/').status_code, 200)
+
+        entry.delete()
+        self.assertEqual(self.client.get('/api/problems/solved/').status_code, 200)
+        replacement = LeaderboardEntry.objects.get(zauth_id=ADMIN['id'])
+        self.assertNotEqual(replacement.id, entry.id)
+        self.assertEqual(self.client.session['leaderboard_entry_id'], replacement.id)
+
+
+class LeaderboardPushTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = LeaderboardEntry.objects.create(name='leader', score=500)
+        cls.user = LeaderboardEntry.objects.create(name='user', score=100)
+
+    def test_score_change_is_pushed_with_its_rank(self):
+        # Drive the subscriber's event loop by hand so publishing happens in
+        # this thread, on the test transaction's connection
+        loop = asyncio.new_event_loop()
+        subscription = leaderboard_push.subscribe()
+        loop.run_until_complete(subscription.__aenter__())
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                adjust_score(self.user.id, 1_000)
+            message = loop.run_until_complete(subscription.get(timeout=1))
+        finally:
+            loop.run_until_complete(subscription.__aexit__(None, None, None))
+            loop.close()
+
+        self.assertEqual(message['type'], 'delta')
+        self.assertEqual(message['changes'], [
+            {'id': self.user.id, 'rank': 1, 'name': self.user.name, 'score': 1_100}
+        ])
+
+
+    def test_ranks_of_matches_the_full_ranking(self):
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(name=f'tied{i}', score=100) for i in range(3)
+        ] + [LeaderboardEntry(name='last', score=0)])
+        full = {row['id']: row for row in leaderboard_push.snapshot()}
+        for row in leaderboard_push.ranks_of(list(full)):
+            self.assertEqual(row['rank'], full[row['id']]['rank'])
+
+
+class GradingQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='queue', points=10, assignment='Add one')
+        cls.user = LeaderboardEntry.objects.create(name='user', score=0)
+
+    def queue(self):
+        return Submission.objects.create(
+            problem=self.problem, submisser=self.user, status=Submission.STATUS_PENDING,
+            source=SubmissionCode.objects.store('def f(x):\n    return x + 1\n'),
+        )
+
+    def expire_lease(self, submission):
+        Submission.objects.filter(id=submission.id).update(
+            started_at=timezone.now() - timedelta(seconds=settings.SUBMISSION_LEASE_SECONDS + 1)
+        )
+
+    def test_claim_takes_the_oldest_pending_job_once(self):
+        first, second = self.queue(), self.queue()
+        claimed = claim_next_submission()
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts), (first.id, Submission.STATUS_RUNNING, 1))
+        self.assertEqual(claim_next_submission().id, second.id)
+        self.assertIsNone(claim_next_submission())
+
+    def test_expired_lease_is_requeued_then_failed(self):
+        self.queue()
+        for attempt in range(1, settings.SUBMISSION_MAX_ATTEMPTS + 1):
+            submission = claim_next_submission()
+            self.assertEqual(submission.attempts, attempt)
+            self.expire_lease(submission)
+            self.assertEqual(requeue_expired_jobs(), 1)
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.error), (Submission.STATUS_FAILED, 'Grading timed out'))
+        self.assertIsNone(claim_next_submission())
+
+    def test_record_failure_retries_until_the_last_attempt(self):
+        self.queue()
+        for _ in range(settings.SUBMISSION_MAX_ATTEMPTS):
+            submission = claim_next_submission()
+            record_failure(submission, 'grader down')
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.error), (Submission.STATUS_FAILED, 'grader down'))
+
+    def test_verdict_after_a_lost_claim_is_discarded(self):
+        self.queue()
+        stale = claim_next_submission()
+        self.expire_lease(stale)
+        requeue_expired_jobs()
+        current = claim_next_submission()
+
+        verdict = {'correct': True, 'total_tests': 1, 'passed_tests': 1}
+        self.assertTrue(record_verdict(current, verdict))
+        self.assertFalse(record_verdict(stale, verdict))
+        record_failure(stale, 'late failure')
+
+        current.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(current.status, Submission.STATUS_DONE)
+        self.assertEqual(self.user.score, 10)
+        self.assertEqual(ProblemStats.objects.get(problem=self.problem).attempts, 1)
+
+
+class ProblemStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='stats', points=10, assignment='Add one')
+        cls.user = LeaderboardEntry.objects.create(name='user', score=0)
+
+    def test_incremental_matches_rebuild(self):
+        problem_stats.rebuild()
+        for correct in (False, True, True):
+            submission = Submission.objects.create(
+                problem=self.problem, submisser=self.user, status=Submission.STATUS_RUNNING
+            )
+            record_verdict(submission, {'correct': correct, 'total_tests': 1, 'passed_tests': int(correct)})
+
+        fields = problem_stats.STAT_FIELDS
+        incremental = ProblemStats.objects.filter(problem=self.problem).values(*fields).get()
+        problem_stats.rebuild()
+        self.assertEqual(ProblemStats.objects.filter(problem=self.problem).values(*fields).get(), incremental)
+
+    def test_edits_recompute_the_row(self):
+        submissions = [
+            Submission.objects.create(
+                problem=self.problem, submisser=self.user,
+                status=Submission.STATUS_DONE, submission_correct=correct,
+            )
+            for correct in (False, True)
+        ]
+        problem_stats.rebuild()
+
+        response = self.client.patch(
+            f'/api/submissions/{submissions[1].id}/', {'submission_correct': False}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        stats = ProblemStats.objects.get(problem=self.problem)
+        self.assertEqual((stats.attempts, stats.correct_submissions, stats.solvers), (2, 0, 0))
+
+        response = self.client.delete(f'/api/submissions/{submissions[0].id}/delete/')
+        self.assertEqual(response.status_code, 200)
+        stats.refresh_from_db()
+        self.assertEqual((stats.attempts, stats.attempters), (1, 1))
+
+
+class RegradeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='regrade', points=10, assignment='Add one')
+        cls.fixed = SubmissionCode.objects.store('def f(x):\n    return x + 1\n')
+        cls.broken = SubmissionCode.objects.store('def f(x):\n    return x\n')
+
+    def submit(self, entry, source, correct):
+        return Submission.objects.create(
+            problem=self.problem, submisser=entry, source=source,
+            status=Submission.STATUS_DONE, submission_correct=correct,
+        )
+
+    def grade(self, problem_id, code, payload):
+        correct = code == self.fixed.code
+        return {'correct': correct, 'total_tests': 1, 'passed_tests': int(correct)}
+
+    def test_regrade_problem(self):
+        # The old suite accepted the broken code and rejected the fixed one
+        gains = LeaderboardEntry.objects.create(name='gains', score=0)
+        loses = LeaderboardEntry.objects.create(name='loses', score=10)
+        for _ in range(2):
+            self.submit(gains, self.fixed, False)
+            self.submit(loses, self.broken, True)
+
+        with mock.patch('api.regrade.upstream.grade_submission', side_effect=self.grade) as grader:
+            report = regrade_problem(self.problem.id)
+
+        # One grader call per distinct code text
+        self.assertEqual(grader.call_count, 2)
+        self.assertEqual((report.updated, report.flipped), (4, 4))
+        self.assertEqual(
+            dict(LeaderboardEntry.objects.filter(id__in=[gains.id, loses.id]).values_list('name', 'score')),
+            {'gains': 10, 'loses': 0},
+        )
+        self.assertEqual(ScoreEvent.objects.filter(reason='regrade').count(), 2)
+        self.assertEqual(ProblemStats.objects.get(problem=self.problem).solvers, 1)
+
+    def test_newer_correct_submission_keeps_the_solve(self):
+        # An old submission flips to incorrect, but a newer one (graded with
+        # the new suite after the run started) still solves the problem
+        player = LeaderboardEntry.objects.create(name='player', score=10)
+        self.submit(player, self.broken, True)
+        newer = SubmissionCode.objects.store('def f(x):\n    return 1 + x\n')
+
+        with mock.patch('api.regrade.upstream.grade_submission', side_effect=self.grade):
+            report = regrade_problem(self.problem.id, progress=lambda report: self.submit(player, newer, True))
+
+        self.assertEqual((report.updated, report.flipped), (1, 1))
+        self.assertEqual(report.score_changes, {})
+        player.refresh_from_db()
+        self.assertEqual(player.score, 10)
+        self.assertFalse(ScoreEvent.objects.filter(reason='regrade').exists())
+
+
+class SubmissionStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='storage', points=10, assignment='Add one')
+        cls.user = LeaderboardEntry.objects.create(name='user', score=0)
+
+    def test_identical_code_is_stored_once(self):
+        for _ in range(3):
+            Submission.objects.create(
+                problem=self.problem, submisser=self.user,
+                source=SubmissionCode.objects.store('def f(x):\n    return x\n'),
+            )
+        self.assertEqual(SubmissionCode.objects.count(), 1)
+
+    def test_list_includes_blobs_only_when_asked(self):
+        Submission.objects.create(
+            problem=self.problem, submisser=self.user, status=Submission.STATUS_DONE,
+            source=SubmissionCode.objects.store('pass'), results=[{'test_id': 1, 'passed': True}],
+        )
+        path = f'/api/users/{self.user.id}/submissions/'
+        self.assertNotIn('code', self.client.get(path).json()['submissions'][0])
+        submission = self.client.get(f'{path}?include=code,results').json()['submissions'][0]
+        self.assertEqual(submission['code'], 'pass')
+        self.assertEqual(submission['results'], [{'test_id': 1, 'passed': True}])
+        self.assertEqual(self.client.get(f'{path}?include=secrets').status_code, 400)
+
+    def test_list_and_claim_skip_the_results_blob(self):
+        Submission.objects.create(
+            problem=self.problem, submisser=self.user, status=Submission.STATUS_DONE,
+            source=SubmissionCode.objects.store('pass'), results=[{'test_id': 1, 'passed': True}],
+        )
+        Submission.objects.create(
+            problem=self.problem, submisser=self.user, status=Submission.STATUS_PENDING,
+            source=SubmissionCode.objects.store('pass'),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/users/{self.user.id}/submissions/')
+            self.assertIsNotNone(claim_next_submission())
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            self.assertNotIn('results_blob', query['sql'])
+
+
+class SubmissionDedupeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='dedupe', points=10, assignment='Add one')
+        ProblemTestCase.objects.create(problem=cls.problem, input_data='[1]', expected_output='2')
+        cls.entry = LeaderboardEntry.objects.create(name=ADMIN['username'], score=0, zauth_id=ADMIN['id'])
+
+    def setUp(self):
+        cache.clear()
+        log_in(self.client, self.entry)
+
+    def test_retries_and_double_clicks_reuse_the_job(self):
+        data = {'problem_id': self.problem.id, 'submission': 'def g(x):\n    return x\n'}
+        first = post_json(self.client, '/api/test/', data, HTTP_IDEMPOTENCY_KEY='retry-1').json()
+        retried = post_json(self.client, '/api/test/', data, HTTP_IDEMPOTENCY_KEY='retry-1').json()
+        repeated = post_json(self.client, '/api/test/', data).json()
+        self.assertEqual(retried['submission_id'], first['submission_id'])
+        self.assertEqual(repeated['submission_id'], first['submission_id'])
+        self.assertTrue(repeated['deduplicated'])
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_concurrent_double_click_gets_the_queued_job(self):
+        data = {'problem_id': self.problem.id, 'submission': 'def g(x):\n    return x\n'}
+        first = post_json(self.client, '/api/test/', data).json()
+
+        # The second request's lookup runs before the first one's insert
+        # commits; the unique dedupe key catches it
+        afirst = QuerySet.afirst
+        calls = []
+
+        async def racing_afirst(queryset):
+            calls.append(queryset)
+            return None if len(calls) == 1 else await afirst(queryset)
+
+        with mock.patch.object(QuerySet, 'afirst', racing_afirst):
+            second = post_json(self.client, '/api/test/', data)
+        self.assertEqual(second.json().get('submission_id'), first['submission_id'], second.json())
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_reused_idempotency_key_with_other_code(self):
+        data = {'problem_id': self.problem.id, 'submission': 'def g(x):\n    return x\n'}
+        post_json(self.client, '/api/test/', data, HTTP_IDEMPOTENCY_KEY='retry-1')
+        response = post_json(self.client, '/api/test/', {**data, 'submission': 'pass'}, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(response.status_code, 422)
+
+
+@override_settings(RATE_LIMITS={
+    'generate_code': {'user': (2, 1), 'global': (100, 100)},
+    'test_problem': {'user': (100, 100), 'global': (100, 100)},
+})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.entry = LeaderboardEntry.objects.create(name=ADMIN['username'], score=0, zauth_id=ADMIN['id'])
+
+    def setUp(self):
+        cache.clear()
+        log_in(self.client, self.entry)
+
+    def test_generate_code_rate_limit(self):
+        data = {'prompt': 'add a docstring', 'code': 'pass'}
+        with mock.patch('api.views.upstream.generate_code', new=mock.AsyncMock(return_value={'code': 'pass'})):
+            for _ in range(2):
+                self.assertEqual(post_json(self.client, '/api/submit/', data).status_code, 200)
+            response = post_json(self.client, '/api/submit/', data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_deploy_check_warns_about_a_local_cache(self):
+        self.assertEqual([w.id for w in check_shared_rate_limits(None)], ['api.W001'])
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            self.assertEqual(check_shared_rate_limits(None), [])
+
+
+class TestCaseValidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(name='validation', points=10, assignment='Add one')
+
+    def test_bulk_tests_rejects_bad_items_before_writing(self):
+        for body in (
+            {'problem_id': 'one', 'upsert': [{'input_data': [1], 'expected_output': '2'}]},
+            {'problem_id': self.problem.id, 'upsert': [
+                {'input_data': [1], 'expected_output': '2'},
+                {'input_data': [2], 'expected_output': 3},
+            ]},
+            {'problem_id': self.problem.id, 'upsert': [{'input_data': [1], 'expected_output': '2', 'is_public': 'no'}]},
+        ):
+            self.assertEqual(post_json(self.client, '/api/tests/bulk/', body).status_code, 400)
+        self.assertFalse(ProblemTestCase.objects.exists())
+
+    def test_create_test_applies_the_same_checks(self):
+        body = {'problem_id': self.problem.id, 'input_data': [1], 'expected_output': 2}
+        self.assertEqual(post_json(self.client, '/api/tests/create/', body).status_code, 400)
+        body = {**body, 'problem_id': 'one', 'expected_output': '2'}
+        self.assertEqual(post_json(self.client, '/api/tests/create/', body).status_code, 400)
+
+    def test_update_test_checks_the_merged_fields_and_the_admin(self):
+        test_case = ProblemTestCase.objects.create(problem=self.problem, input_data=[1], expected_output='2')
+        path = f'/api/tests/{test_case.id}/'
+        self.assertEqual(self.client.patch(path, {'is_public': False}, content_type='application/json').status_code, 401)
+
+        log_in(self.client, LeaderboardEntry.objects.create(name=ADMIN['username'], score=0, zauth_id=ADMIN['id']))
+        for body in ({'expected_output': 2}, {'is_public': 'no'}, {'input_data': None}):
+            self.assertEqual(self.client.patch(path, body, content_type='application/json').status_code, 400)
+        test_case.refresh_from_db()
+        self.assertEqual((test_case.input_data, test_case.expected_output, test_case.is_public), ([1], '2', True))
+
+        session = self.client.session
+        session['user'] = {**ADMIN, 'username': 'someone'}
+        session.save()
+        self.assertEqual(self.client.patch(path, {'is_public': False}, content_type='application/json').status_code, 403)
+
+
+class ResponseCompressionTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.data = {'rows': ['x' * 50] * 100}  # well over RESPONSE_COMPRESSION_MIN_BYTES
+
+    def respond(self, accept_encoding=None, data=None):
+        extra = {'HTTP_ACCEPT_ENCODING': accept_encoding} if accept_encoding is not None else {}
+        return json_response(self.factory.get('/', **extra), self.data if data is None else data)
+
+    def test_gzip(self):
+        response = self.respond('gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.data)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = self.respond('gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(response.content)), self.data)
+
+    def test_refused_codings_are_not_used(self):
+        response = self.respond('br;q=0, gzip;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        for header in ('', 'identity', 'gzip;q=0'):
+            response = self.respond(header)
+            self.assertFalse(response.has_header('Content-Encoding'), header)
+            self.assertEqual(json.loads(response.content), self.data)
+
+    def test_small_bodies_are_sent_as_is(self):
+        response = self.respond('gzip, br', data={'ok': True})
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(RESPONSE_COMPRESSION_MIN_BYTES=1):
+            self.assertEqual(self.respond('gzip', data={'ok': True})['Content-Encoding'], 'gzip')
+
+    def test_vary_on_accept_encoding(self):
+        for header in (None, 'gzip'):
+            self.assertIn('Accept-Encoding', self.respond(header)['Vary'])
+        self.assertIn('Accept-Encoding', self.respond('gzip', data={'ok': True})['Vary'])
+
+
+class RenderingTests(TestCase):
+    def assertSafe(self, html):
+        """No script elements, event handler attributes or script URLs in the parsed HTML."""
+        tags = []
+        parser = HTMLParser()
+        parser.handle_starttag = lambda tag, attrs: tags.append((tag, attrs))
+        parser.feed(html)
+        for tag, attrs in tags:
+            self.assertNotIn(tag, ('script', 'div', 'iframe'))
+            for name, value in attrs:
+                self.assertFalse(name.startswith('on'), f'{name} on <{tag}>')
+                self.assertNotIn('javascript:', (value or '').lower())
+
+    def test_raw_html_is_escaped(self):
+        for source in (
+            '<script>alert(1)</script>',
+            '<img src=x onerror=alert(1)>',
+            '<a href="#" onclick="alert(1)">a</a>',
+            '<div>raw</div>',
+        ):
+            html = render_markdown(source)
+            self.assertSafe(html)
+            self.assertIn('&lt;', html)
+
+    def test_script_links_are_not_rendered(self):
+        for source in ('[x](javascript:alert(1))', '[x](JaVaScRiPt:alert(1))', '[x](data:text/html;base64,PHNjcmlwdD4=)'):
+            self.assertNotIn('<a', render_markdown(source))
+
+    def test_sanitiser_cleans_what_the_renderer_lets_through(self):
+        unsafe = (
+            '<p onclick="alert(1)">hi <script>alert(2)</script>'
+            '<a href="javascript:alert(3)" onmouseover="x">link</a><img src="x" onerror="alert(4)"></p>'
+        )
+        with mock.patch('api.rendering._markdown.render', return_value=unsafe):
+            html = render_markdown('anything')
+        self.assertSafe(html)
+        self.assertNotIn('onmouseover', html)
+        self.assertIn('link</a>', html)
+
+    def test_code_fences_keep_their_language(self):
+        self.assertIn('<code class="language-python">', render_markdown('```python\nprint(1)\n```'))
+
+    def test_save_refreshes_the_rendered_statement(self):
+        problem = Problem.objects.create(name='render', points=10, assignment='*one*')
+        self.assertEqual(problem.assignment_html, '<p><em>one</em></p>\n')
+        problem.assignment = '**two** <script>'
+        problem.save(update_fields=['assignment'])
+
+        problem.refresh_from_db()
+        self.assertEqual(problem.assignment_html, '<p><strong>two</strong> &lt;script&gt;</p>\n')
+        self.assertEqual(problem.assignment_html_hash, html_hash(problem.assignment_html))
+
+
+class JsonlRoundTripTests(TestCase):
+    def run_command(self, *args, **options):
+        out = io.StringIO()
+        call_command(*args, stdout=out, **options)
+        return out.getvalue()
+
+    def rows(self):
+        return (
+            sorted(Problem.objects.values_list('name', 'points', 'assignment', 'content_hash')),
+            sorted(
+                (name, json.dumps(input_data), expected_output, is_public)
+                for name, input_data, expected_output, is_public in ProblemTestCase.objects.values_list(
+                    'problem__name', 'input_data', 'expected_output', 'is_public'
+                )
+            ),
+        )
+
+    def test_export_then_import_into_an_empty_database(self):
+        for i, name in enumerate(('First', 'Second ✓')):
+            problem = Problem.objects.create(name=name, points=10 * (i + 1), assignment=f'Do *{name}*')
+            ProblemTestCase.objects.create(problem=problem, input_data=[i, {'k': 'ü'}], expected_output=str(i))
+            ProblemTestCase.objects.create(problem=problem, input_data=[i], expected_output='x', is_public=False)
+            # A duplicate test survives the round trip as a duplicate
+            ProblemTestCase.objects.create(problem=problem, input_data=[i], expected_output='x', is_public=False)
+        original = self.rows()
+
+        with tempfile.TemporaryDirectory() as directory:
+            problems_path = os.path.join(directory, 'problems.jsonl.gz')
+            tests_path = os.path.join(directory, 'testcases.jsonl')
+            self.run_command('export_problems', output=problems_path, chunk_size=1)
+            self.run_command('export_testcases', output=tests_path, chunk_size=1)
+            with gzip.open(problems_path, 'rt', encoding='utf-8') as f:
+                self.assertEqual(json.loads(f.readline())['model'], 'problem')
+
+            Problem.objects.all().delete()
+            self.assertFalse(ProblemTestCase.objects.exists())
+
+            self.run_command('import_jsonl', problems_path, batch_size=1)
+            self.run_command('import_jsonl', tests_path, batch_size=2)
+            self.assertEqual(self.rows(), original)
+
+            # Everything is already there the second time
+            self.assertIn('Skipped: 2 problem(s)', self.run_command('import_jsonl', problems_path))
+            self.assertIn('Skipped: 6 testcase(s)', self.run_command('import_jsonl', tests_path))
+            self.assertEqual(self.rows(), original)
+
+    def test_import_rejects_a_file_without_header(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rows.jsonl.gz')
+            with gzip.open(path, 'wt', encoding='utf-8') as f:
+                f.write('{"name": "no header"}\n')
+            with self.assertRaisesMessage(CommandError, 'missing header line'):
+                self.run_command('import_jsonl', path)
+
+
+class SeedingTests(TestCase):
+    def seed(self, command, **options):
+        out = io.StringIO()
+        call_command(command, stdout=out, stderr=io.StringIO(), **options)
+        return out.getvalue()
+
+    def test_reseeding_changes_nothing(self):
+        self.seed('add_problems')
+        self.seed('add_testcases')
+        problems = list(Problem.objects.values_list('id', 'name', 'content_hash').order_by('id'))
+        tests = list(ProblemTestCase.objects.values_list('id', 'expected_output', 'is_public').order_by('id'))
+        self.assertTrue(problems and tests)
+
+        out = self.seed('add_problems') + self.seed('add_testcases')
+        self.assertEqual(list(Problem.objects.values_list('id', 'name', 'content_hash').order_by('id')), problems)
+        self.assertEqual(
+            list(ProblemTestCase.objects.values_list('id', 'expected_output', 'is_public').order_by('id')), tests
+        )
+        for line in ('Added: 0 problem(s)', 'Updated: 0 problem(s)', 'Added: 0 test case(s)', 'Deleted: 0 test case(s)'):
+            self.assertIn(line, out)
+
+    def test_problems_are_matched_by_name(self):
+        with mock.patch('api.management.problems_data.PROBLEMS', [
+            {'name': 'Kept', 'points': 10, 'assignment': 'Add one'},
+            {'name': 'Old name', 'points': 20, 'assignment': 'Add two'},
+        ]):
+            self.seed('add_problems')
+        kept, renamed = Problem.objects.get(name='Kept'), Problem.objects.get(name='Old name')
+
+        data = [
+            {'name': 'Kept', 'points': 15, 'assignment': 'Add one'},
+            {'name': 'New name', 'points': 20, 'assignment': 'Add two'},
+        ]
+        with mock.patch('api.management.problems_data.PROBLEMS', data):
+            self.seed('add_problems', prune=True, dry_run=True)
+            self.assertEqual(set(Problem.objects.values_list('name', 'points')), {('Kept', 10), ('Old name', 20)})
+
+            self.seed('add_problems')  # without --prune the old name stays
+            self.assertTrue(Problem.objects.filter(id=renamed.id).exists())
+
+            out = self.seed('add_problems', prune=True)
+        self.assertIn('Deleted: 1 problem(s)', out)
+        self.assertEqual(set(Problem.objects.values_list('name', 'points')), {('Kept', 15), ('New name', 20)})
+        self.assertEqual(Problem.objects.get(name='Kept').id, kept.id)
+        self.assertFalse(Problem.objects.filter(id=renamed.id).exists())
+
+    def test_test_case_diff(self):
+        problem = Problem.objects.create(name='diff', points=10, assignment='Add one')
+        stored = [
+            ProblemTestCase.objects.create(problem=problem, input_data=[1], expected_output='2'),
+            ProblemTestCase.objects.create(problem=problem, input_data=[2], expected_output='4'),
+            ProblemTestCase.objects.create(problem=problem, input_data=[3], expected_output='4'),
+            ProblemTestCase.objects.create(problem=problem, input_data=[3], expected_output='4'),
+        ]
+        diff = TestCaseDiff(stored, [
+            {'input_data': [1], 'expected_output': '2', 'is_public': True},  # unchanged
+            {'input_data': [2], 'expected_output': '3', 'is_public': True},  # fixed in place
+            {'input_data': [3], 'expected_output': '4', 'is_public': True},  # one of the duplicates
+            {'input_data': [4], 'expected_output': '5', 'is_public': False},  # new
+        ])
+        self.assertEqual(diff.unchanged, 2)
+        self.assertEqual([(test.id, test.expected_output) for test in diff.update], [(stored[1].id, '3')])
+        self.assertEqual(diff.create, [{'input_data': [4], 'expected_output': '5', 'is_public': False}])
+        self.assertEqual(len(diff.delete), 1)
+        self.assertIn(diff.delete[0].id, {stored[2].id, stored[3].id})
+        self.assertFalse(TestCaseDiff(stored[:1], [{'input_data': [1], 'expected_output': '2', 'is_public': True}]).changed)
+
+    def test_add_testcases_dry_run_writes_nothing(self):
+        problem = Problem.objects.create(name='seeded', points=10, assignment='Add one')
+        ProblemTestCase.objects.create(problem=problem, input_data=[1], expected_output='old')
+        data = {'seeded': [{'input_data': [1], 'expected_output': '2'}, {'input_data': [2], 'expected_output': '3'}]}
+        with mock.patch('api.management.commands.add_testcases.TESTCASES', data):
+            out = self.seed('add_testcases', dry_run=True)
+            self.assertIn('Added: 1 test case(s)', out)
+            self.assertEqual(list(ProblemTestCase.objects.values_list('expected_output', flat=True)), ['old'])
+
+            self.seed('add_testcases')
+        self.assertEqual(
+            sorted(ProblemTestCase.objects.filter(problem=problem).values_list('expected_output', flat=True)), ['2', '3']
+        )
@@ -0,0 +1,123 @@
+"""
+Pooled HTTP clients for the grader and LLM services.
+
+The async views call the LLM through a shared httpx.AsyncClient so that
+concurrent requests reuse keep-alive connections instead of opening a new
+socket (and pinning a worker thread) per call. The grading worker threads
+share a single blocking httpx.Client to the grader in the same way.
+"""
+
+import asyncio
+import json
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+
+from .metrics import observe_upstream
+
+# One client per event loop: an AsyncClient's connections are bound to the
+# loop that opened them. Under uvicorn there is a single loop per worker.
+_async_clients = weakref.WeakKeyDictionary()
+
+_sync_client = None
+_sync_client_lock = threading.Lock()
+
+
+def _build_limits():
+    return httpx.Limits(
+        max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _build_timeout(read_timeout):
+    return httpx.Timeout(
+        read_timeout,
+        connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+        pool=read_timeout,
+    )
+
+
+def get_async_client():
+    """
+    Return the pooled AsyncClient for the running event loop.
+
+    Returns:
+        httpx.AsyncClient shared by every request served on this loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=_build_limits())
+        _async_clients[loop] = client
+    return client
+
+
+def get_sync_client():
+    """
+    Return the pooled blocking Client shared by all threads of this process.
+
+    Returns:
+        httpx.Client (thread-safe) used by the grading workers
+    """
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(limits=_build_limits())
+        return _sync_client
+
+
+def grade_submission(problem_id, code, tests_payload):
+    """
+    Send a submission to the grader and return its JSON verdict.
+
+    Called from the grading worker threads, never from a request.
+
+    Args:
+        problem_id: The problem being graded
+        code: The submitted source code
+        tests_payload: The problem's test suite, already JSON-encoded
+
+    Returns:
+        dict: The grader response
+    """
+    # Splice the cached suite bytes in rather than re-encoding every test
+    body = b''.join([
+        b'{"problem_id":', json.dumps(problem_id).encode('utf-8'),
+        b',"code":', json.dumps(code).encode('utf-8'),
+        b',"tests":', tests_payload,
+        b'}',
+    ])
+    with observe_upstream('grader'):
+        response = get_sync_client().post(
+            settings.GRADER_URL,
+            content=body,
+            headers={'Content-Type': 'application/json'},
+            timeout=_build_timeout(settings.GRADER_TIMEOUT),
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+async def generate_code(prompt, code):
+    """
+    Ask the LLM service to generate code for a prompt.
+
+    Args:
+        prompt: The user's instruction
+        code: The current code (or selection) to edit
+
+    Returns:
+        dict: The LLM service response
+    """
+    with observe_upstream('llm'):
+        response = await get_async_client().post(
+            settings.LLM_URL,
+            json={'prompt': prompt, 'code': code},
+            timeout=_build_timeout(settings.LLM_TIMEOUT),
+        )
+        response.raise_for_status()
+        return response.json()
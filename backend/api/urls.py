@@ -4,16 +4,20 @@ from . import views, auth_views
 urlpatterns = [
     # Existing endpoints
     path('process-text/', views.process_text, name='process_text'),
+    path('bootstrap/', views.bootstrap, name='bootstrap'),
     path('leaderboard/', views.get_leaderboard, name='get_leaderboard'),
+    path('leaderboard/events/', views.leaderboard_events, name='leaderboard_events'),
 
     path('problems/all/', views.get_all_problems, name='get_all_problems'),
-    path('problems/<int:problem_id>/', views.update_problem, name='update_problem'),
+    path('problems/<int:problem_id>/', views.problem_detail, name='problem_detail'),
     path('problems/solved/', views.get_solved_problems, name='get_solved_problems'),
+    path('problems/stats/', views.get_problem_stats, name='get_problem_stats'),
     path('users/<int:user_id>/solved-problems/', views.get_user_solved_problems, name='get_user_solved_problems'),
     path('tests/all/', views.get_all_tests, name='get_all_tests'),
     path('tests/create/', views.create_test, name='create_test'),
     path('tests/<int:test_id>/', views.update_test, name='update_test'),
     path('tests/<int:test_id>/delete/', views.delete_test, name='delete_test'),
+    path('tests/bulk/', views.bulk_tests, name='bulk_tests'),
 
     path('submit/', views.generate_code, name='generate_code'),
 
@@ -23,8 +27,11 @@ urlpatterns = [
     path('users/all/', views.get_all_users, name='get_all_users'),
     path('users/<int:user_id>/', views.update_user, name='update_user'),
     path('users/<int:user_id>/submissions/', views.get_user_submissions, name='get_user_submissions'),
+    path('users/<int:user_id>/score-history/', views.get_user_score_history, name='get_user_score_history'),
     path('submissions/<int:submission_id>/', views.update_submission, name='update_submission'),
     path('submissions/<int:submission_id>/delete/', views.delete_submission, name='delete_submission'),
+    path('submissions/<int:submission_id>/status/', views.get_submission_status, name='get_submission_status'),
+    path('submissions/<int:submission_id>/events/', views.submission_events, name='submission_events'),
     
     # Authentication endpoints
     path('auth/login', auth_views.login, name='auth_login'),
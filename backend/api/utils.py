@@ -1,50 +1,166 @@
+from django.db import connection, transaction
+from django.utils import timezone
 from .models import LeaderboardEntry
+from .score_history import record_score_events
 import random
 
-def add_score_delta(player_name, delta):
+# Rows per UPDATE statement in adjust_scores (keeps well under the
+# database's bound-parameter limit)
+SCORE_UPDATE_BATCH = 1000
+
+
+def _adjust_scores_postgresql(cursor, table, pairs, now):
+    # One statement: the subquery locks the rows and captures the old scores,
+    # the UPDATE clamps at zero and RETURNING reports both values
+    values = ', '.join(['(%s::bigint, %s::integer)'] * len(pairs))
+    cursor.execute(
+        f"""
+        UPDATE {table} AS t
+        SET score = GREATEST(t.score + d.delta, 0), updated_at = %s
+        FROM (
+            SELECT e.id, e.score, v.delta
+            FROM {table} AS e
+            JOIN (VALUES {values}) AS v(id, delta) ON e.id = v.id
+            FOR UPDATE OF e
+        ) AS d
+        WHERE t.id = d.id
+        RETURNING t.id, t.name, d.score, t.score
+        """,
+        [now, *[value for pair in pairs for value in pair]],
+    )
+    return cursor.fetchall()
+
+
+def _adjust_scores_generic(cursor, table, pairs, now):
+    # SQLite can't RETURN columns of an UPDATE ... FROM source, so read the
+    # old scores first; the surrounding transaction already holds the write
+    # lock (transaction_mode IMMEDIATE), so nothing can change in between
+    ids = [entry_id for entry_id, _ in pairs]
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f'SELECT id, score FROM {table} WHERE id IN ({placeholders})', ids)
+    old_scores = dict(cursor.fetchall())
+
+    cases = ' '.join(['WHEN %s THEN %s'] * len(pairs))
+    cursor.execute(
+        f"""
+        UPDATE {table}
+        SET score = MAX(score + CASE id {cases} ELSE 0 END, 0), updated_at = %s
+        WHERE id IN ({placeholders})
+        RETURNING id, name, score
+        """,
+        [*[value for pair in pairs for value in pair], now, *ids],
+    )
+    return [(entry_id, name, old_scores[entry_id], score) for entry_id, name, score in cursor.fetchall()]
+
+
+def adjust_scores(deltas, reason=''):
     """
-    Add a delta (positive or negative) to a player's score.
-    
+    Add a delta to many players' scores at once, clamping each at zero.
+
+    The change is made by the database (score = GREATEST(score + delta, 0)),
+    so concurrent adjustments of the same player are never lost. On
+    PostgreSQL each batch is a single UPDATE ... RETURNING statement.
+
+    Every change is also appended to the score ledger (ScoreEvent).
+
     Args:
-        player_name (str): The name of the player
+        deltas: dict mapping LeaderboardEntry id to the delta to apply
+        reason: Label stored on the ScoreEvents
+
+    Returns:
+        dict: entry id -> (name, old score, new score), for entries that exist
+    """
+    pairs = [(entry_id, delta) for entry_id, delta in deltas.items() if delta]
+    if not pairs:
+        return {}
+
+    table = connection.ops.quote_name(LeaderboardEntry._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    update = _adjust_scores_postgresql if connection.vendor == 'postgresql' else _adjust_scores_generic
+
+    results = {}
+    # No savepoint: a failed batch has to abort the caller's transaction anyway
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        for start in range(0, len(pairs), SCORE_UPDATE_BATCH):
+            for entry_id, name, old_score, new_score in update(
+                cursor, table, pairs[start:start + SCORE_UPDATE_BATCH], now
+            ):
+                results[entry_id] = (name, old_score, new_score)
+        record_score_events(
+            ((entry_id, old_score, new_score) for entry_id, (_, old_score, new_score) in results.items()),
+            reason,
+        )
+    return results
+
+
+def adjust_score(entry_id, delta, reason=''):
+    """
+    Add a delta (positive or negative) to one player's score, clamped at zero.
+
+    Args:
+        entry_id (int): The LeaderboardEntry id
         delta (int): The amount to add/subtract from the score
-    
+        reason (str): Label stored in the score ledger
+
     Returns:
         dict: Result with success status and details
     """
     try:
-        # Try to find the player by name (case-insensitive)
-        player = LeaderboardEntry.objects.filter(name__iexact=player_name).first()
-        
-        if not player:
+        if delta:
+            player = adjust_scores({entry_id: delta}, reason).get(entry_id)
+        else:
+            # Nothing to write; just report the current score
+            player = LeaderboardEntry.objects.filter(id=entry_id).values_list('name', 'score').first()
+            player = player and (player[0], player[1], player[1])
+
+        if player is None:
             return {
                 'success': False,
-                'error': f'Player "{player_name}" not found'
+                'error': f'Player with id {entry_id} not found'
             }
-        
-        old_score = player.score
-        player.score += delta
-        
-        # Ensure score doesn't go below 0
-        if player.score < 0:
-            player.score = 0
-        
-        player.save()
-        
+        name, old_score, new_score = player
+
         return {
             'success': True,
-            'player': player.name,
+            'player': name,
             'old_score': old_score,
-            'new_score': player.score,
+            'new_score': new_score,
             'delta': delta
         }
-        
+
     except Exception as e:
         return {
             'success': False,
             'error': str(e)
         }
 
+
+def add_score_delta(player_name, delta, reason=''):
+    """
+    Add a delta (positive or negative) to a player's score.
+    
+    Prefer adjust_score when the player's id is known; this looks the
+    player up by name first.
+    
+    Args:
+        player_name (str): The name of the player
+        delta (int): The amount to add/subtract from the score
+        reason (str): Label stored in the score ledger
+    
+    Returns:
+        dict: Result with success status and details
+    """
+    # Try to find the player by name (case-insensitive)
+    entry_id = LeaderboardEntry.objects.filter(name__iexact=player_name).values_list('id', flat=True).first()
+    
+    if entry_id is None:
+        return {
+            'success': False,
+            'error': f'Player "{player_name}" not found'
+        }
+    
+    return adjust_score(entry_id, delta, reason)
+
 def increase_score(player_name, amount):
     """
     Increase a player's score by a specific amount.
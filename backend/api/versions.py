@@ -0,0 +1,72 @@
+"""
+Named version counters kept in the cache.
+
+A counter is bumped whenever the data it describes changes, which lets read
+endpoints derive ETags / Last-Modified headers and cache keys without
+querying the data itself.
+
+Counters are bumped by every process that writes (web workers, the grading
+worker, management commands), so they only work in a cache shared by all of
+them: set REDIS_URL, as docker-compose does. With the default per-process
+cache, other processes keep serving the old version.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+PROBLEMS = 'problems'
+# Scores, ranks and which problems each user has solved
+LEADERBOARD = 'leaderboard'
+
+
+def _keys(name):
+    return f'version:{name}', f'version:{name}:modified'
+
+
+def _initialise(name):
+    # Start from the current time in ms rather than 1 so a counter that was
+    # evicted (or lived in a restarted process) never repeats an old value
+    # that a client may still hold as an ETag.
+    version_key, modified_key = _keys(name)
+    now = time.time()
+    cache.add(version_key, int(now * 1000), timeout=None)
+    cache.add(modified_key, now, timeout=None)
+
+
+def get_version(name):
+    """
+    Return the current value of a version counter.
+
+    Args:
+        name: Counter name
+
+    Returns:
+        tuple: (version int, last-modified unix timestamp)
+    """
+    version_key, modified_key = _keys(name)
+    values = cache.get_many([version_key, modified_key])
+    if len(values) < 2:
+        _initialise(name)
+        values = cache.get_many([version_key, modified_key])
+    return values.get(version_key, 0), values.get(modified_key, time.time())
+
+
+def bump_version(name):
+    """
+    Increment a version counter once the current transaction commits.
+
+    Args:
+        name: Counter name
+    """
+    def bump():
+        version_key, modified_key = _keys(name)
+        try:
+            cache.incr(version_key)
+        except ValueError:  # evicted; start a fresh counter
+            _initialise(name)
+        cache.set(modified_key, time.time(), timeout=None)
+
+    transaction.on_commit(bump)
+
@@ -1,17 +1,44 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-import requests
-from .models import LeaderboardEntry, Problem, TestCase
-from .utils import random_score_increase
-from .auth import login_required, get_current_user
+from django.views.decorators.http import condition
+from asgiref.sync import sync_to_async
+import httpx
+from .models import LeaderboardEntry, LeaderboardSnapshot, Problem, Submission, SubmissionCode, TestCase
+from .responses import add_cors_headers, json_response
+from .pagination import (
+    InvalidPageRequest, decode_cursor, get_page_size, ndjson_response, paginate, wants_ndjson
+)
+from .utils import adjust_score
+from .auth import login_required, get_current_user, aget_current_user
+from .ratelimit import rate_limit
+from .grading import FINISHED_STATUSES, serialize_submission_result, submission_dedupe_key
+from .suite_cache import get_test_suite, invalidate_test_suite
+from .versions import LEADERBOARD, PROBLEMS, bump_version, get_version
+from . import metrics as metrics_registry
+from . import blobs, leaderboard_push, problem_stats, score_history, upstream
+from datetime import datetime, timezone as dt_timezone
+import asyncio
 import json
+import logging
 import random
+import time
 
-def add_cors_headers(response):
-    response['Access-Control-Allow-Origin'] = '*'
-    response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
-    response['Access-Control-Allow-Headers'] = 'Content-Type'
-    return response
+logger = logging.getLogger(__name__)
+
+# Session key memoising the authenticated user's LeaderboardEntry id
+LEADERBOARD_ENTRY_SESSION_KEY = 'leaderboard_entry_id'
+
+# How often the submission event stream re-reads the job, and when it gives up
+SUBMISSION_EVENTS_POLL_INTERVAL = 0.5
+SUBMISSION_EVENTS_TIMEOUT = 300
+LEADERBOARD_EVENTS_KEEPALIVE = 15
 
 def get_random_avatar():
     """Return a random avatar emoji (fallback)"""
@@ -34,27 +61,59 @@ def get_or_create_user_leaderboard_entry(user_info):
     
     if not entry:
         # Create new entry with score of 100, using username as name
-        entry = LeaderboardEntry.objects.create(
-            name=username,
-            score=100,
-            zauth_id=zauth_id,
-            picture_url=picture_url
-        )
-        print(f"Created new leaderboard entry for {username} (score: 100)")
+        with transaction.atomic():
+            entry = LeaderboardEntry.objects.create(
+                name=username,
+                score=100,
+                zauth_id=zauth_id,
+                picture_url=picture_url
+            )
+            score_history.record_score_events([(entry.id, 0, entry.score)], score_history.REASON_SIGNUP)
+        logger.info("Created new leaderboard entry for %s (score: 100)", username)
     else:
         # Update picture URL if it changed
         if entry.picture_url != picture_url:
             entry.picture_url = picture_url
             entry.save()
-            print(f"Updated picture URL for {username}")
+            logger.info("Updated picture URL for %s", username)
     
     return entry
 
+def get_user_leaderboard_entry_id(request):
+    """
+    Return the authenticated user's leaderboard entry id.
+
+    The id is stored in the session at login; each call checks the entry
+    still exists (one indexed lookup) and resolves it again if it was
+    deleted or the leaderboard reseeded. Sessions created before login
+    stored it resolve the entry once and keep it.
+    """
+    entry_id = request.session.get(LEADERBOARD_ENTRY_SESSION_KEY)
+    if entry_id is not None and not LeaderboardEntry.objects.filter(id=entry_id).exists():
+        entry_id = None
+    if entry_id is None:
+        entry_id = get_or_create_user_leaderboard_entry(get_current_user(request)).id
+        request.session[LEADERBOARD_ENTRY_SESSION_KEY] = entry_id
+    return entry_id
+
+async def aget_user_leaderboard_entry_id(request, refresh=False):
+    """
+    Async version of get_user_leaderboard_entry_id.
+
+    Pass refresh=True to drop a memoised id whose entry no longer exists.
+    """
+    entry_id = None if refresh else await request.session.aget(LEADERBOARD_ENTRY_SESSION_KEY)
+    if entry_id is None:
+        user = await aget_current_user(request)
+        entry = await sync_to_async(get_or_create_user_leaderboard_entry)(user)
+        entry_id = entry.id
+        await request.session.aset(LEADERBOARD_ENTRY_SESSION_KEY, entry_id)
+    return entry_id
+
 @csrf_exempt
 def get_leaderboard(request):
     if request.method == 'OPTIONS':
-        response = JsonResponse({'success': True})
-        return add_cors_headers(response)
+        return json_response(request, {'success': True})
     
     try:
         # Get all leaderboard entries ordered by score
@@ -75,29 +134,68 @@ def get_leaderboard(request):
                 'avatar_url': avatar_url
             })
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'leaderboard': leaderboard_data
         })
-        return add_cors_headers(response)
         
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+@csrf_exempt
+async def leaderboard_events(request):
+    """
+    Server-sent events stream of leaderboard changes.
+
+    Sends a `snapshot` event with the full leaderboard on connect, every
+    LEADERBOARD_SNAPSHOT_INTERVAL seconds and after missed updates, and a
+    `delta` event with the new score and rank of the players whose score
+    changed in between. Closes after LEADERBOARD_STREAM_TIMEOUT seconds.
+    """
+    if request.method != 'GET':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    async def event_stream():
+        # Subscribe before the first snapshot so no change falls in between
+        async with leaderboard_push.subscribe() as subscription:
+            deadline = time.monotonic() + settings.LEADERBOARD_STREAM_TIMEOUT
+            next_snapshot = 0
+            while True:
+                now = time.monotonic()
+                if subscription.lagged or now >= next_snapshot:
+                    subscription.lagged = False
+                    rows = await sync_to_async(leaderboard_push.snapshot)()
+                    payload = json.dumps({'type': 'snapshot', 'leaderboard': rows})
+                    yield f'event: snapshot\ndata: {payload}\n\n'
+                    next_snapshot = now + settings.LEADERBOARD_SNAPSHOT_INTERVAL
+                if now >= deadline:
+                    return
+
+                message = await subscription.get(
+                    timeout=min(LEADERBOARD_EVENTS_KEEPALIVE, next_snapshot - now, deadline - now)
+                )
+                if message is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f'event: delta\ndata: {json.dumps(message)}\n\n'
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return add_cors_headers(response)
 
 @csrf_exempt
 @login_required
 def process_text(request):
     if request.method == 'OPTIONS':
-        response = JsonResponse({'success': True})
-        return add_cors_headers(response)
+        return json_response(request, {'success': True})
     
     if request.method != 'POST':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
     
     try:
         # Get the current authenticated user
@@ -108,7 +206,9 @@ def process_text(request):
         input_text = data.get('text', '')
         
         # Increase the authenticated user's score randomly on each text submission
-        score_result = random_score_increase(username, 100, 200)
+        score_result = adjust_score(
+            get_user_leaderboard_entry_id(request), random.randint(100, 200), score_history.REASON_BONUS
+        )
         
         # Simple text processing - you can make this more sophisticated
         if not input_text.strip():
@@ -145,56 +245,243 @@ def process_text(request):
         if score_result['success']:
             response_data['score_update'] = score_result
         
-        response = JsonResponse(response_data)
-        return add_cors_headers(response)
+        return json_response(request, response_data)
         
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
     
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+
+def _wants_problem_summary(request):
+    return request.GET.get('view') == 'summary'
+
+
+def _problems_etag(request, *args, **kwargs):
+    version, _ = get_version(PROBLEMS)
+    view = 'summary' if _wants_problem_summary(request) else 'full'
+    return f'W/"problems-{version}-{view}"'
+
+
+def _problems_last_modified(request, *args, **kwargs):
+    _, modified = get_version(PROBLEMS)
+    return datetime.fromtimestamp(modified, tz=dt_timezone.utc)
+
+
+def _load_problem_detail(problem_id):
+    """
+    Return a problem with its statement and pre-rendered HTML, from cache.
+
+    Entries are keyed on the problems version counter, which every write path
+    bumps (including the CLI commands and admin, through the shared cache and
+    the Problem signals), so a cached statement is never served after it
+    changed, nor for a new problem that reuses a deleted one's id.
+    """
+    version, _ = get_version(PROBLEMS)
+    key = f'problem-detail:{version}:{problem_id}'
+    problem = cache.get(key)
+    if problem is None:
+        problem = Problem.objects.filter(id=problem_id).values(
+            'id', 'name', 'points', 'assignment', 'assignment_html',
+            'assignment_html_hash', 'content_hash'
+        ).first()
+        if problem is not None:
+            cache.set(key, problem, timeout=settings.PROBLEM_DETAIL_CACHE_TIMEOUT)
+    return problem
+
+
+def _problem_etag(request, problem_id):
+    problem = _load_problem_detail(problem_id)
+    return f'W/"problem-{problem["content_hash"]}"' if problem else None
 
 
 @csrf_exempt
+@condition(etag_func=_problems_etag, last_modified_func=_problems_last_modified)
 def get_all_problems(request):
+    """
+    List problems.
+
+    With ?view=summary only id, name, points and content_hash are returned;
+    statements are then fetched per problem from problems/<id>/. Both forms
+    honour If-None-Match / If-Modified-Since, driven by the problems version
+    counter, so unchanged lists come back as an empty 304.
+    """
     if request.method != 'GET':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         problems = Problem.objects.all()
-        problems_data = list(problems.values())
-        response = JsonResponse({
+        if _wants_problem_summary(request):
+            problems_data = list(problems.values('id', 'name', 'points', 'content_hash'))
+        else:
+            problems_data = list(problems.values('id', 'name', 'points', 'assignment', 'content_hash'))
+        response = json_response(request, {
             'success': True,
             'problems': problems_data
         })
-        return add_cors_headers(response)
+        patch_cache_control(response, no_cache=True)
+        return response
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+def _bootstrap_user(user):
+    return {
+        'id': user.get('id'),
+        'username': user.get('username'),
+        'name': user.get('name', user.get('username')),
+        'picture': user.get('picture'),
+    }
+
+
+@csrf_exempt
+def bootstrap(request):
+    """
+    Everything the problem page needs on load, in one request: the auth
+    state and profile, the problem summary list, the user's solved problem
+    ids, score and rank.
+
+    The problem list is cached under the problems version counter. The
+    user's score, rank and solved problems are read fresh (two queries):
+    verdicts are recorded by the grading worker, whose leaderboard version
+    bumps only reach this process through a shared cache.
+    """
+    if request.method != 'GET':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    try:
+        user = get_current_user(request)
+        problems_version, _ = get_version(PROBLEMS)
+        problems = cache.get(f'bootstrap:problems:{problems_version}')
+        if problems is None:
+            problems = list(Problem.objects.values('id', 'name', 'points', 'content_hash'))
+            cache.set(f'bootstrap:problems:{problems_version}', problems, settings.BOOTSTRAP_CACHE_TIMEOUT)
+
+        if not user:
+            return json_response(request, {
+                'success': True,
+                'authenticated': False,
+                'problems': problems,
+            })
+
+        user_entry_id = get_user_leaderboard_entry_id(request)
+        standing = next(iter(leaderboard_push.ranks_of([user_entry_id])), {})
+        data = {
+            'success': True,
+            'authenticated': True,
+            'user': _bootstrap_user(user),
+            'score': standing.get('score'),
+            'rank': standing.get('rank'),
+            'problems': problems,
+            'solved_problem_ids': list(
+                Submission.objects.filter(submisser_id=user_entry_id, submission_correct=True)
+                .values_list('problem_id', flat=True).distinct()
+            ),
+        }
+
+        response = json_response(request, data)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    except Exception as e:
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+def get_problem_stats(request):
+    """
+    Solve rate, attempt counts and average attempts-to-solve per problem,
+    read from the ProblemStats table (one row per problem).
+    """
+    if request.method != 'GET':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    try:
+        rows = Problem.objects.order_by('id').values(
+            'id', 'name', 'points',
+            'stats__attempts', 'stats__correct_submissions', 'stats__attempters',
+            'stats__solvers', 'stats__solve_attempts',
+        )
+        problems_data = []
+        for row in rows:
+            # Problems nobody has submitted to yet have no stats row
+            attempts = row['stats__attempts'] or 0
+            attempters = row['stats__attempters'] or 0
+            solvers = row['stats__solvers'] or 0
+            problems_data.append({
+                'id': row['id'],
+                'name': row['name'],
+                'points': row['points'],
+                'attempts': attempts,
+                'correct_submissions': row['stats__correct_submissions'] or 0,
+                'attempters': attempters,
+                'solvers': solvers,
+                'solve_rate': solvers / attempters if attempters else None,
+                'avg_attempts_to_solve': (row['stats__solve_attempts'] or 0) / solvers if solvers else None,
+            })
+
+        return json_response(request, {
+            'success': True,
+            'problems': problems_data
+        })
+    except Exception as e:
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+def problem_detail(request, problem_id):
+    if request.method == 'GET':
+        return get_problem(request, problem_id)
+    return update_problem(request, problem_id)
+
+
+@condition(etag_func=_problem_etag, last_modified_func=_problems_last_modified)
+def get_problem(request, problem_id):
+    try:
+        problem = _load_problem_detail(problem_id)
+
+        if not problem:
+            return json_response(request, {
+                'success': False,
+                'error': 'Problem not found'
+            }, status=404)
+
+        response = json_response(request, {
+            'success': True,
+            'problem': problem
+        })
+        patch_cache_control(response, no_cache=True)
+        return response
+    except Exception as e:
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def update_problem(request, problem_id):
     if request.method == 'OPTIONS':
-        response = JsonResponse({'success': True})
-        return add_cors_headers(response)
+        return json_response(request, {'success': True})
     
     if request.method != 'PATCH' and request.method != 'PUT':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         # Check if user is tyboro (admin check)
@@ -202,21 +489,19 @@ def update_problem(request, problem_id):
         username = user.get('username', '')
         
         if username != 'tyboro':
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'Unauthorized - Admin access required'
             }, status=403)
-            return add_cors_headers(response)
 
         # Get the problem
         problem = Problem.objects.filter(id=problem_id).first()
         
         if not problem:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'Problem not found'
             }, status=404)
-            return add_cors_headers(response)
 
         # Parse request data
         data = json.loads(request.body)
@@ -231,9 +516,10 @@ def update_problem(request, problem_id):
         if 'name' in data:
             problem.name = data['name']
         
-        problem.save()
+        problem.save()  # bumps the PROBLEMS version (api/signals.py)
+        invalidate_test_suite(problem.id)
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'problem': {
                 'id': problem.id,
@@ -242,27 +528,23 @@ def update_problem(request, problem_id):
                 'assignment': problem.assignment
             }
         })
-        return add_cors_headers(response)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def create_test(request):
     if request.method != 'POST':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
     
     try:
         # # Admin check
@@ -281,22 +563,25 @@ def create_test(request):
         is_public = data.get('is_public', True)
         
         if not problem_id or input_data is None or expected_output is None:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'Missing required fields: problem_id, input_data, expected_output'
             }, status=400)
-            return add_cors_headers(response)
+        if not _is_id(problem_id):
+            return json_response(request, {'success': False, 'error': 'problem_id must be an integer'}, status=400)
+        error = _test_case_error({'expected_output': expected_output, 'is_public': is_public})
+        if error:
+            return json_response(request, {'success': False, 'error': error}, status=400)
         
         # Verify problem exists
         from .models import Problem
         try:
             problem = Problem.objects.get(id=problem_id)
         except Problem.DoesNotExist:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': f'Problem with id {problem_id} not found'
             }, status=404)
-            return add_cors_headers(response)
         
         # Create the test case
         test_case = TestCase.objects.create(
@@ -305,8 +590,9 @@ def create_test(request):
             expected_output=expected_output,
             is_public=is_public
         )
+        invalidate_test_suite(problem.id)
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'test': {
                 'id': test_case.id,
@@ -317,27 +603,23 @@ def create_test(request):
                 'is_public': test_case.is_public
             }
         })
-        return add_cors_headers(response)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def delete_test(request, test_id):
     if request.method != 'DELETE':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
     
     try:
         # Admin check
@@ -353,75 +635,229 @@ def delete_test(request, test_id):
         try:
             test_case = TestCase.objects.get(id=test_id)
         except TestCase.DoesNotExist:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': f'Test case with id {test_id} not found'
             }, status=404)
-            return add_cors_headers(response)
         
         test_case.delete()
+        invalidate_test_suite(test_case.problem_id)
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'message': f'Test case {test_id} deleted successfully'
         })
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+TEST_CASE_FIELDS = ('input_data', 'expected_output', 'is_public')
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _test_case_error(fields):
+    """
+    Check test case fields from a request body before they are written.
+
+    bulk_create and bulk_update skip model validation, so every write path
+    runs these checks itself.
+
+    Returns:
+        str or None: What is wrong with the fields, if anything
+    """
+    if 'input_data' in fields and fields['input_data'] is None:
+        return 'input_data must not be null'
+    if 'expected_output' in fields and not isinstance(fields['expected_output'], str):
+        return 'expected_output must be a string'
+    if 'is_public' in fields and not isinstance(fields['is_public'], bool):
+        return 'is_public must be a boolean'
+    return None
+
+
+@csrf_exempt
+# @login_required
+def bulk_tests(request):
+    """
+    Create, update and delete many test cases of one problem at once.
+
+    Body:
+        problem_id: The problem every test case belongs to
+        upsert: List of test cases; entries with an `id` update that test
+            (only the fields given), entries without one are created
+        delete: List of test case ids to delete
+
+    All changes are applied in one transaction and the problem's cached
+    test suite is invalidated once.
+    """
+    if request.method != 'POST':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        problem_id = data.get('problem_id')
+        upserts = data.get('upsert', [])
+        delete_ids = data.get('delete', [])
+
+        if not problem_id or not isinstance(upserts, list) or not isinstance(delete_ids, list):
+            return json_response(request, {
+                'success': False,
+                'error': 'Expected problem_id, and upsert and delete as lists'
+            }, status=400)
+        if not _is_id(problem_id):
+            return json_response(request, {'success': False, 'error': 'problem_id must be an integer'}, status=400)
+        if not all(_is_id(test_id) for test_id in delete_ids):
+            return json_response(request, {
+                'success': False,
+                'error': 'delete must be a list of test case ids'
+            }, status=400)
+
+        to_create = []
+        changes = {}
+        for index, item in enumerate(upserts):
+            if not isinstance(item, dict):
+                return json_response(request, {
+                    'success': False,
+                    'error': f'upsert[{index}] must be an object'
+                }, status=400)
+            fields = {field: item[field] for field in TEST_CASE_FIELDS if field in item}
+            if item.get('id') is not None and not _is_id(item['id']):
+                return json_response(request, {
+                    'success': False,
+                    'error': f'upsert[{index}]: id must be an integer'
+                }, status=400)
+            error = _test_case_error(fields)
+            if error:
+                return json_response(request, {'success': False, 'error': f'upsert[{index}]: {error}'}, status=400)
+            if item.get('id') is None:
+                if 'input_data' not in fields or 'expected_output' not in fields:
+                    return json_response(request, {
+                        'success': False,
+                        'error': f'upsert[{index}]: new test cases need input_data and expected_output'
+                    }, status=400)
+                to_create.append(TestCase(problem_id=problem_id, **fields))
+            else:
+                changes[item['id']] = fields
+
+        overlap = set(changes) & set(delete_ids)
+        if overlap:
+            return json_response(request, {
+                'success': False,
+                'error': f'Test cases both updated and deleted: {sorted(overlap)}'
+            }, status=400)
+
+        with transaction.atomic():
+            if not Problem.objects.filter(id=problem_id).exists():
+                return json_response(request, {
+                    'success': False,
+                    'error': f'Problem with id {problem_id} not found'
+                }, status=404)
+
+            # Every referenced test must exist and belong to this problem
+            referenced = set(changes) | set(delete_ids)
+            existing = {
+                test.id: test
+                for test in TestCase.objects.filter(problem_id=problem_id, id__in=referenced)
+            } if referenced else {}
+            missing = referenced - set(existing)
+            if missing:
+                return json_response(request, {
+                    'success': False,
+                    'error': f'Test cases not found for problem {problem_id}: {sorted(missing)}'
+                }, status=404)
+
+            to_update = []
+            update_fields = set()
+            for test_id, fields in changes.items():
+                test = existing[test_id]
+                for field, value in fields.items():
+                    setattr(test, field, value)
+                update_fields.update(fields)
+                to_update.append(test)
+
+            created = TestCase.objects.bulk_create(to_create)
+            if to_update and update_fields:
+                TestCase.objects.bulk_update(to_update, sorted(update_fields))
+            if delete_ids:
+                TestCase.objects.filter(id__in=delete_ids).delete()
+
+            if created or to_update or delete_ids:
+                invalidate_test_suite(problem_id)
+
+        def serialize(test):
+            return {
+                'id': test.id,
+                'problem_id': test.problem_id,
+                'input_data': test.input_data,
+                'expected_output': test.expected_output,
+                'is_public': test.is_public
+            }
+
+        return json_response(request, {
+            'success': True,
+            'created': [serialize(test) for test in created],
+            'updated': [serialize(test) for test in to_update],
+            'deleted': sorted(delete_ids)
+        })
+    except json.JSONDecodeError:
+        return json_response(request, {
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def get_solved_problems(request):
     if request.method != 'GET':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         # Get the current authenticated user
-        user = get_current_user(request)
-        user_entry = get_or_create_user_leaderboard_entry(user)
+        user_entry_id = get_user_leaderboard_entry_id(request)
 
         # Find all problems the user has solved (has at least one correct submission)
         from .models import Submission
         solved_problem_ids = Submission.objects.filter(
-            submisser=user_entry,
+            submisser_id=user_entry_id,
             submission_correct=True
         ).values_list('problem_id', flat=True).distinct()
 
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'solved_problem_ids': list(solved_problem_ids)
         })
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 def get_user_solved_problems(request, user_id):
     if request.method != 'GET':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         # Get the user's leaderboard entry
         user_entry = LeaderboardEntry.objects.filter(id=user_id).first()
         
         if not user_entry:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'User not found'
             }, status=404)
-            return add_cors_headers(response)
 
         # Find all problems the user has solved
         from .models import Submission
@@ -435,7 +871,7 @@ def get_user_solved_problems(request, user_id):
         
         total_points = sum(p['points'] for p in solved_problems)
 
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'user_name': user_entry.name,
             'total_score': user_entry.score,
@@ -443,85 +879,112 @@ def get_user_solved_problems(request, user_id):
             'total_points_from_problems': total_points,
             'problems_solved_count': len(solved_problems)
         })
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+
+def _serialize_test_row(row):
+    return {
+        'id': row['id'],
+        'problem_id': row['problem_id'],
+        'problem_name': row['problem__name'],
+        'input_data': row['input_data'],
+        'expected_output': row['expected_output'],
+        'is_public': row['is_public']
+    }
 
 
 @csrf_exempt
 def get_all_tests(request):
+    """
+    List test cases ordered by id, one page at a time.
+
+    Query parameters:
+        cursor: `next_cursor` from the previous page
+        limit: Page size (default API_PAGE_SIZE, max API_MAX_PAGE_SIZE)
+        format=ndjson: Stream every test case as newline-delimited JSON instead
+    """
     if request.method != 'GET':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
-        # Get all test cases with their associated problem information
-        testcases = TestCase.objects.select_related('problem').all()
-        
-        testcases_data = []
-        for tc in testcases:
-            testcases_data.append({
-                'id': tc.id,
-                'problem_id': tc.problem.id,
-                'problem_name': tc.problem.name,
-                'input_data': tc.input_data,
-                'expected_output': tc.expected_output,
-                'is_public': tc.is_public
-            })
-        
-        response = JsonResponse({
+        # Get test cases with their associated problem information
+        testcases = TestCase.objects.order_by('id').values(
+            'id', 'problem_id', 'problem__name', 'input_data', 'expected_output', 'is_public'
+        )
+
+        if wants_ndjson(request):
+            return ndjson_response(request, testcases, _serialize_test_row, filename='tests.ndjson')
+
+        limit = get_page_size(request)
+        cursor = request.GET.get('cursor')
+        page = testcases
+        if cursor:
+            (last_id,) = decode_cursor(cursor, (int,))
+            page = testcases.filter(id__gt=last_id)
+
+        rows, next_cursor = paginate(page, limit, key=lambda row: [row['id']])
+
+        return json_response(request, {
             'success': True,
-            'tests': testcases_data,
-            'total_count': len(testcases_data)
+            'tests': [_serialize_test_row(row) for row in rows],
+            'next_cursor': next_cursor,
+            'total_count': TestCase.objects.count()
         })
-        return add_cors_headers(response)
+    except InvalidPageRequest as e:
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def update_test(request, test_id):
     if request.method == 'OPTIONS':
-        response = JsonResponse({'success': True})
-        return add_cors_headers(response)
+        return json_response(request, {'success': True})
     
     if request.method != 'PATCH' and request.method != 'PUT':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         # Check if user is tyboro (admin check)
         user = get_current_user(request)
-        username = user.get('username', '')
-        
-        # if username != 'tyboro':
-        #     response = JsonResponse({
-        #         'success': False,
-        #         'error': 'Unauthorized - Admin access required'
-        #     }, status=403)
-        #     return add_cors_headers(response)
+        if not user:
+            return json_response(request, {'success': False, 'error': 'Authentication required'}, status=401)
+        if user.get('username', '') != 'tyboro':
+            return json_response(request, {
+                'success': False,
+                'error': 'Unauthorized - Admin access required'
+            }, status=403)
 
         # Get the test case
-        test_case = TestCase.objects.filter(id=test_id).first()
+        test_case = TestCase.objects.select_related('problem').filter(id=test_id).first()
         
         if not test_case:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'Test case not found'
             }, status=404)
-            return add_cors_headers(response)
 
         # Parse request data
         data = json.loads(request.body)
+        error = _test_case_error({
+            'input_data': test_case.input_data,
+            'expected_output': test_case.expected_output,
+            'is_public': test_case.is_public,
+            **{field: data[field] for field in ('input_data', 'expected_output', 'is_public') if field in data},
+        })
+        if error:
+            return json_response(request, {'success': False, 'error': error}, status=400)
         
         # Update fields if provided
         if 'is_public' in data:
@@ -534,8 +997,9 @@ def update_test(request, test_id):
             test_case.input_data = data['input_data']
         
         test_case.save()
+        invalidate_test_suite(test_case.problem_id)
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'test': {
                 'id': test_case.id,
@@ -546,170 +1010,305 @@ def update_test(request, test_id):
                 'is_public': test_case.is_public
             }
         })
-        return add_cors_headers(response)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 @login_required
-def generate_code(request):
+@rate_limit('generate_code')
+async def generate_code(request):
     if request.method != 'POST':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
     try:
         data = json.loads(request.body)
         prompt = data.get('prompt', '')
         code = data.get('code', '')
 
         # Call external code generation service
-        response = requests.post('http://llm:5555', json={
-            'prompt': prompt, 'code': code
-        })
-
-        result = response.json()
+        result = await upstream.generate_code(prompt, code)
         generated_code = result.get('code', '')
 
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'generated_code': generated_code
         })
-        return add_cors_headers(response)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
+    except httpx.TimeoutException:
+        return json_response(request, {
+            'success': False,
+            'error': 'Code generation service timed out'
+        }, status=504)
+    except httpx.HTTPError as e:
+        return json_response(request, {
+            'success': False,
+            'error': f'Code generation service unavailable: {e}'
+        }, status=502)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+
+def _reused_submission_response(request, submission, match):
+    """Answer a /test/ request with an earlier submission instead of grading again."""
+    metrics_registry.SUBMISSIONS_DEDUPLICATED.inc(match)
+    if submission.status == Submission.STATUS_DONE and submission.started_at and submission.finished_at:
+        metrics_registry.GRADER_SECONDS_SAVED.inc(
+            match, amount=(submission.finished_at - submission.started_at).total_seconds()
+        )
+
+    data = serialize_submission_result(submission)
+    data.update({
+        'status_url': f'/api/submissions/{submission.id}/status/',
+        'events_url': f'/api/submissions/{submission.id}/events/',
+        'deduplicated': True,
+    })
+    return json_response(request, data, status=200 if submission.status in FINISHED_STATUSES else 202)
 
 
 @csrf_exempt
 @login_required
-def test_problem(request):
+@rate_limit('test_problem')
+async def test_problem(request):
+    """
+    Queue a submission for grading.
+
+    Repeated requests don't grade again: a request carrying an
+    `Idempotency-Key` header already used by this user, or sending the same
+    code for the same problem while its test suite is unchanged, gets the
+    earlier submission back (with its verdict once graded).
+    """
     if request.method != 'POST':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         data = json.loads(request.body)
         problem_id = data.get('problem_id')
         submission_content = data.get('submission')
+        idempotency_key = request.headers.get('Idempotency-Key', '').strip()
 
-        # Get the current authenticated user
-        user = get_current_user(request)
-        user_entry = get_or_create_user_leaderboard_entry(user)
+        if not isinstance(submission_content, str) or not submission_content.strip():
+            return json_response(request, {
+                'success': False,
+                'error': 'Missing required field: submission'
+            }, status=400)
+        if len(idempotency_key) > 255:
+            return json_response(request, {
+                'success': False,
+                'error': 'Idempotency-Key must be at most 255 characters'
+            }, status=400)
+
+        # Get the current authenticated user's entry (memoised in the session)
+        user_entry_id = await aget_user_leaderboard_entry_id(request)
+
+        async def find_by_idempotency_key():
+            return await Submission.objects.select_related('source').filter(
+                submisser_id=user_entry_id, idempotency_key=idempotency_key
+            ).afirst()
+
+        def replay(submission):
+            if (str(submission.problem_id) != str(problem_id)
+                    or submission.source.code_hash != blobs.code_hash(submission_content)):
+                return json_response(request, {
+                    'success': False,
+                    'error': 'Idempotency-Key was already used for a different request'
+                }, status=422)
+            return _reused_submission_response(request, submission, 'idempotency_key')
+
+        if idempotency_key:
+            existing = await find_by_idempotency_key()
+            if existing:
+                return replay(existing)
 
         # Fetch the problem
-        problem = Problem.objects.filter(id=problem_id).first()
-        if not problem:
-            response = JsonResponse({
+        if not await Problem.objects.filter(id=problem_id).aexists():
+            return json_response(request, {
                 'success': False,
                 'error': 'Problem not found'
             }, status=404)
-            return add_cors_headers(response)
-
-        # Send submission to external grading service
-        testcases = TestCase.objects.filter(problem_id=problem_id)
-        
-        # Serialize test cases with JSON input_data
-        testcases_data = [
-            {
-                'id': tc.id,
-                'input_data': tc.input_data,  # Already JSON, no need to parse
-                'expected_output': tc.expected_output,
-                'is_public': tc.is_public
-            }
-            for tc in testcases
-        ]
-
-        response = requests.post('http://grader:5556', json={
-            'problem_id': problem_id,
-            'code': submission_content,
-            'tests': testcases_data
-        })
-
-        result = response.json()
-        is_correct = result.get('correct', False)
-        total_tests = result.get('total_tests', 0)
-        passed_tests = result.get('passed_tests', 0)
-
-        # Create submission record
-        from .models import Submission
-        submission = Submission.objects.create(
-            problem=problem,
-            submission_correct=is_correct,
-            submisser=user_entry
-        )
 
-        # If all tests passed, award points to the user
-        if total_tests > 0 and total_tests == passed_tests:
-            # Check if user has already solved this problem before
-            previous_correct = Submission.objects.filter(
-                problem=problem,
-                submisser=user_entry,
-                submission_correct=True
-            ).exclude(id=submission.id).exists()
-            
-            # Only award points if this is the first time solving
-            if not previous_correct:
-                user_entry.score += problem.points
-                user_entry.save()
+        async def find_by_dedupe_key():
+            return await Submission.objects.filter(dedupe_key=dedupe_key).exclude(
+                status=Submission.STATUS_FAILED
+            ).afirst()
+
+        # Same code against the same tests: reuse the run unless it failed
+        suite = await sync_to_async(get_test_suite)(problem_id)
+        dedupe_key = submission_dedupe_key(user_entry_id, problem_id, submission_content, suite.suite_hash)
+        existing = await find_by_dedupe_key()
+        if existing:
+            return _reused_submission_response(request, existing, 'content')
+
+        # Queue the submission; a grade_submissions worker picks it up
+        source = await SubmissionCode.objects.astore(submission_content)
+
+        @sync_to_async
+        def queue_submission(entry_id, key):
+            # In its own atomic block, so a constraint violation doesn't break
+            # an enclosing transaction and the lookups below can still run
+            with transaction.atomic():
+                return Submission.objects.create(
+                    problem_id=problem_id,
+                    submisser_id=entry_id,
+                    source=source,
+                    status=Submission.STATUS_PENDING,
+                    idempotency_key=idempotency_key,
+                    dedupe_key=key,
+                )
 
-        response = JsonResponse({
+        try:
+            submission = await queue_submission(user_entry_id, dedupe_key)
+        except IntegrityError:
+            # A concurrent request won the race: a retry with the same key, or
+            # the same code sent twice (submission_dedupe_uniq)
+            existing = idempotency_key and await find_by_idempotency_key()
+            if existing:
+                return replay(existing)
+            existing = await find_by_dedupe_key()
+            if existing:
+                return _reused_submission_response(request, existing, 'content')
+            # Otherwise the memoised entry may have been deleted (e.g. the
+            # leaderboard was reseeded); retry once with a fresh one
+            refreshed_id = await aget_user_leaderboard_entry_id(request, refresh=True)
+            if refreshed_id is None or refreshed_id == user_entry_id:
+                return json_response(request, {
+                    'success': False,
+                    'error': 'Could not queue the submission, please try again'
+                }, status=409)
+            submission = await queue_submission(
+                refreshed_id,
+                submission_dedupe_key(refreshed_id, problem_id, submission_content, suite.suite_hash),
+            )
+
+        return json_response(request, {
             'success': True,
+            'submission_id': submission.id,
             'problem_id': problem_id,
-            'submission_correct': is_correct,
-            'results': result.get('results', []),
-            'total_tests': total_tests,
-            'passed_tests': passed_tests
-        })
-        return add_cors_headers(response)
+            'status': submission.status,
+            'status_url': f'/api/submissions/{submission.id}/status/',
+            'events_url': f'/api/submissions/{submission.id}/events/'
+        }, status=202)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+async def _get_own_submission(request, submission_id):
+    """Fetch a submission only if it belongs to the authenticated user."""
+    user = await aget_current_user(request)
+    return await Submission.objects.filter(
+        id=submission_id,
+        submisser__zauth_id=user.get('id')
+    ).afirst()
+
+
+@csrf_exempt
+@login_required
+async def get_submission_status(request, submission_id):
+    if request.method != 'GET':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    try:
+        submission = await _get_own_submission(request, submission_id)
+        if not submission:
+            return json_response(request, {
+                'success': False,
+                'error': f'Submission with id {submission_id} not found'
+            }, status=404)
+
+        return json_response(request, serialize_submission_result(submission))
+    except Exception as e:
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+
+@csrf_exempt
+@login_required
+async def submission_events(request, submission_id):
+    """
+    Server-sent events stream for a submission job.
+
+    Emits a `status` event whenever the job changes state and a final
+    `result` event with the verdict, then closes the stream.
+    """
+    if request.method != 'GET':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    submission = await _get_own_submission(request, submission_id)
+    if not submission:
+        return json_response(request, {
+            'success': False,
+            'error': f'Submission with id {submission_id} not found'
+        }, status=404)
+
+    async def event_stream():
+        last_status = None
+        deadline = time.monotonic() + SUBMISSION_EVENTS_TIMEOUT
+        current = submission
+        while True:
+            if current.status in FINISHED_STATUSES:
+                payload = json.dumps(serialize_submission_result(current))
+                yield f'event: result\ndata: {payload}\n\n'
+                return
+            if current.status != last_status:
+                last_status = current.status
+                payload = json.dumps({'submission_id': current.id, 'status': current.status})
+                yield f'event: status\ndata: {payload}\n\n'
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+            if time.monotonic() > deadline:
+                yield 'event: timeout\ndata: {}\n\n'
+                return
+            await asyncio.sleep(SUBMISSION_EVENTS_POLL_INTERVAL)
+            # Poll without the results, loaded once the job has finished
+            current = await Submission.objects.defer('results_blob').aget(id=submission.id)
+            if current.status in FINISHED_STATUSES:
+                current = await Submission.objects.aget(id=submission.id)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return add_cors_headers(response)
 
 
 @csrf_exempt
 def get_all_users(request):
     if request.method != 'GET':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
-        # Get all users with their submission counts
-        from .models import Submission
-        users = LeaderboardEntry.objects.all()
+        # Get all users with their submission counts, counted in one grouped query
+        users = LeaderboardEntry.objects.annotate(
+            total_submissions=Count('submission'),
+            correct_submissions=Count('submission', filter=Q(submission__submission_correct=True))
+        )
         
         users_data = []
         for user in users:
-            total_submissions = Submission.objects.filter(submisser=user).count()
-            correct_submissions = Submission.objects.filter(submisser=user, submission_correct=True).count()
-            
             users_data.append({
                 'id': user.id,
                 'name': user.name,
@@ -717,55 +1316,55 @@ def get_all_users(request):
                 'zauth_id': user.zauth_id,
                 'picture_url': user.picture_url,
                 'created_at': user.created_at.isoformat(),
-                'total_submissions': total_submissions,
-                'correct_submissions': correct_submissions
+                'total_submissions': user.total_submissions,
+                'correct_submissions': user.correct_submissions
             })
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'users': users_data,
             'total_count': len(users_data)
         })
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 def update_user(request, user_id):
     if request.method == 'OPTIONS':
-        response = JsonResponse({'success': True})
-        return add_cors_headers(response)
+        return json_response(request, {'success': True})
     
     if request.method != 'PATCH' and request.method != 'PUT':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         # Get the user
         user_entry = LeaderboardEntry.objects.filter(id=user_id).first()
         
         if not user_entry:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'User not found'
             }, status=404)
-            return add_cors_headers(response)
 
         # Parse request data
         data = json.loads(request.body)
         
         # Update fields if provided
+        old_score = user_entry.score
         if 'score' in data:
-            user_entry.score = data['score']
+            user_entry.score = int(data['score'])
         
-        user_entry.save()
+        with transaction.atomic():
+            user_entry.save()
+            score_history.record_score_events(
+                [(user_entry.id, old_score, user_entry.score)], score_history.REASON_ADMIN
+            )
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'user': {
                 'id': user_entry.id,
@@ -775,91 +1374,217 @@ def update_user(request, user_id):
                 'picture_url': user_entry.picture_url
             }
         })
-        return add_cors_headers(response)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
+    except (TypeError, ValueError):
+        return json_response(request, {
+            'success': False,
+            'error': 'score must be an integer'
+        }, status=400)
+    except Exception as e:
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+def get_user_score_history(request, user_id):
+    """
+    A user's score over time, from the compacted leaderboard snapshots.
+
+    Query parameters:
+        resolution: hour, day (default) or week; one point per bucket
+        since: ISO datetime of the first bucket (default SCORE_HISTORY_DAYS ago)
+
+    Points are only present for buckets in which the score changed and lag
+    behind by up to one `compact_scores` run; `current_score` is live.
+    """
+    if request.method != 'GET':
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    resolution = request.GET.get('resolution', 'day')
+    if resolution not in score_history.RESOLUTIONS:
+        return json_response(request, {
+            'success': False,
+            'error': f"resolution must be one of: {', '.join(score_history.RESOLUTIONS)}"
+        }, status=400)
+
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return json_response(request, {
+                'success': False,
+                'error': 'since must be an ISO 8601 datetime'
+            }, status=400)
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=dt_timezone.utc)
+    else:
+        since = score_history.history_since(settings.SCORE_HISTORY_DAYS)
+
+    try:
+        user_entry = LeaderboardEntry.objects.filter(id=user_id).values('id', 'name', 'score').first()
+        if not user_entry:
+            return json_response(request, {
+                'success': False,
+                'error': 'User not found'
+            }, status=404)
+
+        snapshots = LeaderboardSnapshot.objects.filter(
+            entry_id=user_id, bucket_start__gte=since
+        ).order_by('bucket_start').values_list('bucket_start', 'score')
+        points = score_history.downsample(snapshots, score_history.RESOLUTIONS[resolution])
+
+        return json_response(request, {
+            'success': True,
+            'user_id': user_entry['id'],
+            'user_name': user_entry['name'],
+            'current_score': user_entry['score'],
+            'resolution': resolution,
+            'points': [{'time': start.isoformat(), 'score': score} for start, score in points]
+        })
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+
+# Optional blob fields of the submission list (?include=code,results) and the
+# columns they are read from
+SUBMISSION_BLOB_FIELDS = {
+    'code': 'source__data',
+    'results': 'results_blob',
+}
+
+
+def _serialize_submission_row(row):
+    data = {
+        'id': row['id'],
+        'problem_id': row['problem_id'],
+        'problem_name': row['problem__name'],
+        'problem_points': row['problem__points'],
+        'submission_time': row['submission_time'].isoformat(),
+        'submission_correct': row['submission_correct']
+    }
+    if 'source__data' in row:
+        data['code'] = blobs.unpack(row['source__data']).decode('utf-8') if row['source__data'] else ''
+    if 'results_blob' in row:
+        data['results'] = blobs.unpack_results(row['results_blob'])
+    return data
 
 
 @csrf_exempt
 def get_user_submissions(request, user_id):
+    """
+    List a user's submissions, newest first, one page at a time.
+
+    Query parameters:
+        cursor: `next_cursor` from the previous page
+        limit: Page size (default API_PAGE_SIZE, max API_MAX_PAGE_SIZE)
+        format=ndjson: Stream the full history as newline-delimited JSON instead
+        include: Comma-separated extras, `code` and/or `results`; the stored
+            blobs are only read when asked for
+    """
     if request.method != 'GET':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
+
+    include = [field for field in request.GET.get('include', '').split(',') if field]
+    unknown = set(include) - set(SUBMISSION_BLOB_FIELDS)
+    if unknown:
+        return json_response(request, {
+            'success': False,
+            'error': f"Unknown include field(s): {', '.join(sorted(unknown))}"
+        }, status=400)
 
     try:
         # Get the user's leaderboard entry
         user_entry = LeaderboardEntry.objects.filter(id=user_id).first()
         
         if not user_entry:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': 'User not found'
             }, status=404)
-            return add_cors_headers(response)
 
-        # Get all submissions for this user
-        from .models import Submission
-        submissions = Submission.objects.filter(submisser=user_entry).select_related('problem').order_by('-submission_time')
-        
-        submissions_data = []
-        for submission in submissions:
-            submissions_data.append({
-                'id': submission.id,
-                'problem_id': submission.problem.id,
-                'problem_name': submission.problem.name,
-                'problem_points': submission.problem.points,
-                'submission_time': submission.submission_time.isoformat(),
-                'submission_correct': submission.submission_correct
-            })
-        
-        response = JsonResponse({
+        # Get this user's submissions; (submission_time, id) is the page key
+        submissions = Submission.objects.filter(submisser=user_entry).order_by(
+            '-submission_time', '-id'
+        ).values(
+            'id', 'problem_id', 'problem__name', 'problem__points',
+            'submission_time', 'submission_correct',
+            *(SUBMISSION_BLOB_FIELDS[field] for field in include)
+        )
+
+        if wants_ndjson(request):
+            return ndjson_response(
+                request, submissions, _serialize_submission_row,
+                filename=f'user-{user_entry.id}-submissions.ndjson'
+            )
+
+        limit = get_page_size(request)
+        cursor = request.GET.get('cursor')
+        page = submissions
+        if cursor:
+            last_time, last_id = decode_cursor(cursor, (str, int))
+            try:
+                last_time = parse_datetime(last_time)
+            except ValueError:  # well formed but out of range, e.g. month 13
+                last_time = None
+            if last_time is None:
+                raise InvalidPageRequest('Invalid cursor')
+            page = submissions.filter(
+                Q(submission_time__lt=last_time) | Q(submission_time=last_time, id__lt=last_id)
+            )
+
+        rows, next_cursor = paginate(
+            page, limit,
+            key=lambda row: [row['submission_time'].isoformat(), row['id']]
+        )
+
+        return json_response(request, {
             'success': True,
             'user_name': user_entry.name,
             'user_score': user_entry.score,
-            'submissions': submissions_data,
-            'total_submissions': len(submissions_data)
+            'submissions': [_serialize_submission_row(row) for row in rows],
+            'next_cursor': next_cursor,
+            'total_submissions': Submission.objects.filter(submisser=user_entry).count()
         })
-        return add_cors_headers(response)
+    except InvalidPageRequest as e:
+        return json_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def update_submission(request, submission_id):
     if request.method == 'OPTIONS':
-        response = JsonResponse({'success': True})
-        return add_cors_headers(response)
+        return json_response(request, {'success': True})
     
     if request.method != 'PATCH' and request.method != 'PUT':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
 
     try:
         # Find the submission
         from .models import Submission
         try:
-            submission = Submission.objects.get(id=submission_id)
+            submission = Submission.objects.select_related('problem').defer('results_blob').get(id=submission_id)
         except Submission.DoesNotExist:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': f'Submission with id {submission_id} not found'
             }, status=404)
-            return add_cors_headers(response)
 
         # Parse request data
         data = json.loads(request.body)
@@ -868,9 +1593,12 @@ def update_submission(request, submission_id):
         if 'submission_correct' in data:
             submission.submission_correct = data['submission_correct']
         
-        submission.save()
+        with transaction.atomic():
+            submission.save(update_fields=['submission_correct'])
+            problem_stats.rebuild_problem(submission.problem_id)
+        bump_version(LEADERBOARD)  # the submitter's solved problems may have changed
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'submission': {
                 'id': submission.id,
@@ -881,50 +1609,62 @@ def update_submission(request, submission_id):
                 'submission_correct': submission.submission_correct
             }
         })
-        return add_cors_headers(response)
     except json.JSONDecodeError:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
 
 
 @csrf_exempt
 # @login_required
 def delete_submission(request, submission_id):
     if request.method != 'DELETE':
-        response = JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-        return add_cors_headers(response)
+        return json_response(request, {'success': False, 'error': 'Method not allowed'}, status=405)
     
     try:
         # Find the submission
         from .models import Submission
         try:
-            submission = Submission.objects.get(id=submission_id)
+            submission = Submission.objects.defer('results_blob').get(id=submission_id)
         except Submission.DoesNotExist:
-            response = JsonResponse({
+            return json_response(request, {
                 'success': False,
                 'error': f'Submission with id {submission_id} not found'
             }, status=404)
-            return add_cors_headers(response)
         
-        submission.delete()
+        with transaction.atomic():
+            submission.delete()
+            problem_stats.rebuild_problem(submission.problem_id)
+        bump_version(LEADERBOARD)
         
-        response = JsonResponse({
+        return json_response(request, {
             'success': True,
             'message': f'Submission {submission_id} deleted successfully'
         })
-        return add_cors_headers(response)
     except Exception as e:
-        response = JsonResponse({
+        return json_response(request, {
             'success': False,
             'error': str(e)
         }, status=500)
-        return add_cors_headers(response)
+
+
+def metrics(request):
+    """
+    Expose this process's metrics in the Prometheus text format.
+
+    Outside DEBUG the endpoint stays closed until METRICS_TOKEN is set.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    else:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not constant_time_compare(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics_registry.render(), content_type=metrics_registry.CONTENT_TYPE)
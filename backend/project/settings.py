@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -80,17 +82,35 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'project.wsgi.application'
 
+# Log at INFO by default (DJANGO_LOG_LEVEL overrides). SQL statements are
+# only logged at DEBUG by django.db.backends, which is kept at WARNING:
+# query counts and timings are exported on /metrics instead.
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "default": {
+            "format": "%(asctime)s %(levelname)s %(name)s: %(message)s",
+        },
+    },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
+            "formatter": "default",
         },
     },
     "root": {
         "handlers": ["console"],
-        "level": "DEBUG",
+        "level": os.environ.get("DJANGO_LOG_LEVEL", "INFO"),
+    },
+    "loggers": {
+        "django.db.backends": {
+            "level": "WARNING",
+        },
+        # httpx logs every upstream request at INFO
+        "httpx": {
+            "level": "WARNING",
+        },
     },
 }
 
@@ -98,12 +118,56 @@ LOGGING = {
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_DB_PROFILE selects the database:
+#   sqlite   - local development (default)
+#   postgres - the docker-compose `db` service; connections are pooled with
+#              psycopg's pool (DB_POOL=1, default) or kept open per worker
+#              thread for CONN_MAX_AGE seconds (DB_POOL=0)
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'mydatabase'),
+            'USER': os.environ.get('POSTGRES_USER', 'myuser'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'mysecretpassword'),
+            'HOST': os.environ.get('POSTGRES_HOST', 'db'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Check a reused connection is still alive before handing it out
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DB_POOL', '1') == '1':
+        from psycopg_pool import ConnectionPool
+
+        # Pooled connections are returned to the pool at the end of each
+        # request, so Django's own persistent connections must stay off.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+                'check': ConnectionPool.check_connection,
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 600))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so two
+                # read-then-write transactions queue instead of deadlocking
+                # (api.utils.adjust_scores relies on this)
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -164,8 +228,133 @@ SESSION_COOKIE_AGE = 86400  # 24 hours
 # Allow session cookies to work with frontend
 SESSION_COOKIE_DOMAIN = None
 
+# SESSION_BACKEND selects where sessions live:
+#   cached_db      - read from the cache, written through to the DB (default)
+#   cache          - cache only; use with REDIS_URL so all processes share it
+#   signed_cookies - no server-side storage at all, the session is the cookie
+#   db             - Django's default, one SELECT per authenticated request
+# The session only holds a compact user record (see api.auth.compact_user),
+# so it stays small enough for a cookie.
+# cached_db and cache keep sessions in the default cache: without REDIS_URL
+# that is per-process memory, which assumes a single backend process (a
+# logout in one worker would leave the session cached in the others).
+# Expired rows of the db-backed engines are removed with Django's own
+# `python manage.py clearsessions`, which the session_cleaner service in
+# docker-compose.yml runs daily; schedule it yourself elsewhere.
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'cached_db')]
+
 # CSRF settings
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
     "http://localhost:3000",
 ]
+
+# Cache
+# Per-process memory by default, which is only enough for a single process
+# (e.g. runserver and the tests). Set REDIS_URL (docker-compose does) so that
+# every backend process, the grading worker and the management commands share
+# and invalidate the same entries; grade_submissions refuses to start without.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Live leaderboard updates (see api/broker.py and api/leaderboard_push.py).
+# 'inprocess' only reaches clients connected to the publishing process; use
+# 'redis' when running several backend processes or the grading worker
+# (grade_submissions refuses to start with 'inprocess').
+REDIS_URL = os.environ.get('REDIS_URL', '')
+LEADERBOARD_BROKER = os.environ.get('LEADERBOARD_BROKER', 'redis' if REDIS_URL else 'inprocess')
+# Seconds between full leaderboard snapshots on the event stream (lets clients resync)
+LEADERBOARD_SNAPSHOT_INTERVAL = float(os.environ.get('LEADERBOARD_SNAPSHOT_INTERVAL', 60))
+# Seconds before the server closes an event stream; EventSource reconnects on its own
+LEADERBOARD_STREAM_TIMEOUT = float(os.environ.get('LEADERBOARD_STREAM_TIMEOUT', 600))
+
+# Seconds a problem's serialised test suite stays cached (writes invalidate it)
+SUITE_CACHE_TIMEOUT = int(os.environ.get('SUITE_CACHE_TIMEOUT', 3600))
+
+
+# Upstream services (grader and LLM)
+# The async views share one pooled httpx client per event loop, so these
+# limits bound how many sockets a single backend process keeps open.
+GRADER_URL = os.environ.get('GRADER_URL', 'http://grader:5556')
+LLM_URL = os.environ.get('LLM_URL', 'http://llm:5555')
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5))
+GRADER_TIMEOUT = float(os.environ.get('GRADER_TIMEOUT', 60))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 120))
+
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', 200))
+UPSTREAM_MAX_KEEPALIVE = int(os.environ.get('UPSTREAM_MAX_KEEPALIVE', 50))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.environ.get('UPSTREAM_KEEPALIVE_EXPIRY', 30))
+
+# Submission grading queue (see `manage.py grade_submissions`)
+SUBMISSION_MAX_ATTEMPTS = int(os.environ.get('SUBMISSION_MAX_ATTEMPTS', 3))
+# A running job whose worker has been silent this long is handed out again
+SUBMISSION_LEASE_SECONDS = float(os.environ.get('SUBMISSION_LEASE_SECONDS', GRADER_TIMEOUT * 2))
+
+# Rate limits of the endpoints holding upstream capacity (see api/ratelimit.py):
+# (burst, tokens per minute) for each user and for all users together. Keep a
+# user's burst well below the global one so no single user can exhaust it.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMITS = {
+    # The single GPU LLM
+    'generate_code': {
+        'user': (int(os.environ.get('RATE_LIMIT_SUBMIT_BURST', 5)), int(os.environ.get('RATE_LIMIT_SUBMIT_PER_MINUTE', 10))),
+        'global': (int(os.environ.get('RATE_LIMIT_SUBMIT_GLOBAL_BURST', 30)), int(os.environ.get('RATE_LIMIT_SUBMIT_GLOBAL_PER_MINUTE', 120))),
+    },
+    # The grader
+    'test_problem': {
+        'user': (int(os.environ.get('RATE_LIMIT_TEST_BURST', 10)), int(os.environ.get('RATE_LIMIT_TEST_PER_MINUTE', 30))),
+        'global': (int(os.environ.get('RATE_LIMIT_TEST_GLOBAL_BURST', 200)), int(os.environ.get('RATE_LIMIT_TEST_GLOBAL_PER_MINUTE', 1200))),
+    },
+}
+
+# API responses (see api/responses.py)
+# Bodies smaller than this go out uncompressed: the framing overhead isn't worth it
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 5
+
+# Pagination of the list endpoints (see api/pagination.py)
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 200))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+# Rows fetched per round trip when streaming an NDJSON export
+NDJSON_CHUNK_SIZE = int(os.environ.get('NDJSON_CHUNK_SIZE', 2000))
+
+# Seconds a problem's statement and rendered HTML stay cached for the detail
+# endpoint (entries are keyed on the problems version, so writes never serve stale data)
+PROBLEM_DETAIL_CACHE_TIMEOUT = int(os.environ.get('PROBLEM_DETAIL_CACHE_TIMEOUT', 3600))
+
+# Seconds the /api/bootstrap/ problem list stays cached (entries are keyed on
+# the problems version, so writes never serve stale data)
+BOOTSTRAP_CACHE_TIMEOUT = int(os.environ.get('BOOTSTRAP_CACHE_TIMEOUT', 300))
+
+# Score history (see api/score_history.py and `manage.py compact_scores`)
+# Width in seconds of one LeaderboardSnapshot bucket, the finest resolution of the history endpoint
+SCORE_SNAPSHOT_INTERVAL = int(os.environ.get('SCORE_SNAPSHOT_INTERVAL', 3600))
+# Days of history the endpoint returns when no `since` is given
+SCORE_HISTORY_DAYS = int(os.environ.get('SCORE_HISTORY_DAYS', 30))
+
+# Metrics and request logging (see api/metrics.py)
+# Requests slower than this are logged, at most for this fraction of them
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 500))
+SLOW_REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('SLOW_REQUEST_LOG_SAMPLE_RATE', 0.1))
+# When set, /metrics requires `Authorization: Bearer <token>`; unset, it is
+# only served with DEBUG on
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
@@ -0,0 +1,223 @@
+"""
+Drive scripted user journeys against a running backend and report latency.
+
+Every virtual user logs in through the (stub) zauth flow, then repeatedly
+walks a journey modelled on the frontend: check the session, load the
+problem list and a statement, look at the leaderboard, sometimes ask the
+LLM for code, submit a solution and poll it until it is graded.
+
+    python run.py --base-url http://localhost:8000 --users 50 --duration 120
+
+The backend must point its zauth endpoints at the stub (see stubs.py and
+the ZAUTH_* environment overrides in api/auth.py) and have problems and
+test cases loaded (`manage.py add_problems`, `manage.py add_testcases`).
+
+At the end it prints, per endpoint, the request count, error count,
+throughput and latency percentiles, plus the submit-to-verdict time.
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urljoin
+
+import httpx
+
+SOLUTIONS = [
+    'def solve(x):\n    return x\n',
+    'def solve(*args):\n    return sorted(args)\n',
+    'def solve(l):\n    return [i for i in l if i % 2 == 0]\n',
+]
+
+PROMPTS = [
+    'Add a docstring',
+    'Make this faster',
+    'Handle empty input',
+]
+
+_ids = re.compile(r'/\d+(?=/|$)')
+
+
+class Stats:
+    """Latencies and errors per endpoint template."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def report(self, elapsed):
+        rows = []
+        for name in sorted(self.latencies):
+            ordered = sorted(self.latencies[name])
+
+            def pct(p):
+                return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+            rows.append((
+                name, len(ordered), self.errors[name], len(ordered) / elapsed,
+                pct(0.50), pct(0.90), pct(0.99), ordered[-1] * 1000,
+            ))
+
+        width = max([len(row[0]) for row in rows] + [8])
+        header = f"{'endpoint':<{width}}  {'count':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        print('=' * len(header))
+        print(header)
+        print('-' * len(header))
+        for name, count, errors, rate, p50, p90, p99, worst in rows:
+            print(f'{name:<{width}}  {count:>7} {errors:>6} {rate:>8.1f} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f} {worst:>8.1f}')
+        print('-' * len(header))
+        total = sum(row[1] for row in rows if not row[0].startswith('~'))
+        errors = sum(row[2] for row in rows if not row[0].startswith('~'))
+        print(f'{total} requests, {errors} errors in {elapsed:.1f}s = {total / elapsed:.1f} req/s')
+        print('=' * len(header))
+
+
+class VirtualUser:
+    def __init__(self, index, args, stats):
+        self.username = f'loadtest-{index}'
+        self.args = args
+        self.stats = stats
+        self.client = httpx.AsyncClient(
+            base_url=args.base_url,
+            timeout=args.timeout,
+            follow_redirects=False,
+        )
+
+    async def call(self, method, path, name=None, **kwargs):
+        name = name or f'{method} {_ids.sub("/{id}", path.split("?")[0])}'
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(name, time.perf_counter() - started, False)
+            return None
+        self.stats.record(name, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    async def think(self):
+        await asyncio.sleep(random.uniform(0, self.args.think_time))
+
+    async def login(self):
+        response = await self.call('GET', '/api/auth/login')
+        if response is None or response.status_code != 302:
+            return False
+        # The stub authorize endpoint picks the user from `username`
+        authorize_url = f"{response.headers['location']}&{urlencode({'username': self.username})}"
+        response = await self.call('GET', authorize_url, name='GET zauth /oauth/authorize')
+        if response is None or response.status_code != 302:
+            return False
+        callback_url = urljoin(authorize_url, response.headers['location'])
+        response = await self.call('GET', callback_url, name='GET /api/auth/callback')
+        return response is not None and 'login=success' in response.headers.get('location', '')
+
+    async def submit_and_wait(self, problem_id, stop_at):
+        # A unique trailer keeps /test/ from answering with an earlier run of
+        # the same code, so every submission reaches the grader
+        submission = f"{random.choice(SOLUTIONS)}\n# {self.username} {random.getrandbits(64):x}\n"
+        response = await self.call('POST', '/api/test/', json={
+            'problem_id': problem_id,
+            'submission': submission,
+        })
+        if response is None or response.status_code not in (200, 202):
+            return
+        if response.status_code == 200:
+            # An earlier run was reused and is already graded: nothing to wait for
+            self.stats.record('~ submit deduplicated', 0, True)
+            return
+        submitted = time.perf_counter()
+        status_url = response.json()['status_url']
+        deadline = submitted + self.args.grading_timeout
+        while time.perf_counter() < min(deadline, stop_at):
+            await asyncio.sleep(self.args.poll_interval)
+            response = await self.call('GET', status_url)
+            if response is None or response.status_code != 200:
+                return
+            if response.json().get('status') in ('done', 'failed'):
+                self.stats.record('~ submit -> verdict', time.perf_counter() - submitted, True)
+                return
+        if time.perf_counter() >= deadline:
+            self.stats.record('~ submit -> verdict', time.perf_counter() - submitted, False)
+
+    async def journey(self, stop_at):
+        await self.call('GET', '/api/auth/check')
+        response = await self.call('GET', '/api/problems/all/?view=summary')
+        if response is None or response.status_code != 200:
+            return
+        problems = response.json().get('problems', [])
+        await self.think()
+
+        await self.call('GET', '/api/leaderboard/')
+        await self.call('GET', '/api/problems/solved/')
+        if not problems:
+            return
+
+        problem = random.choice(problems)
+        await self.call('GET', f"/api/problems/{problem['id']}/")
+        await self.think()
+
+        if random.random() < self.args.generate_rate:
+            await self.call('POST', '/api/submit/', json={
+                'prompt': random.choice(PROMPTS),
+                'code': random.choice(SOLUTIONS),
+            })
+            await self.think()
+
+        await self.submit_and_wait(problem['id'], stop_at)
+        await self.think()
+
+    async def run(self, stop_at):
+        try:
+            if not await self.login():
+                return
+            while time.perf_counter() < stop_at:
+                await self.journey(stop_at)
+        finally:
+            await self.client.aclose()
+
+
+async def main_async(args):
+    stats = Stats()
+    started = time.perf_counter()
+    stop_at = started + args.duration
+
+    users = [VirtualUser(i, args, stats) for i in range(args.users)]
+    tasks = []
+    for user in users:
+        tasks.append(asyncio.create_task(user.run(stop_at)))
+        # Ramp up rather than logging everybody in during the same instant
+        await asyncio.sleep(args.ramp_up / max(1, args.users))
+    await asyncio.gather(*tasks)
+
+    stats.report(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run scripted user journeys against the backend.')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--users', '-u', type=int, default=20, help='Concurrent virtual users (default: 20)')
+    parser.add_argument('--duration', '-d', type=float, default=60, help='Seconds to run (default: 60)')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which users start (default: 10)')
+    parser.add_argument('--think-time', type=float, default=1.0,
+                        help='Maximum pause between steps in seconds (default: 1.0)')
+    parser.add_argument('--generate-rate', type=float, default=0.3,
+                        help='Fraction of journeys that call the LLM (default: 0.3)')
+    parser.add_argument('--poll-interval', type=float, default=0.5,
+                        help='Seconds between submission status polls (default: 0.5)')
+    parser.add_argument('--grading-timeout', type=float, default=120,
+                        help='Give up waiting for a verdict after this many seconds (default: 120)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Stand-ins for the grader, the LLM service and zauth, for load testing.
+
+Each stub speaks the same HTTP API as the real service but answers after a
+configurable, randomly drawn delay instead of doing any work:
+
+    python stubs.py grader --port 5556 --latency lognormal:150,0.5 --pass-rate 0.4
+    python stubs.py llm    --port 5555 --latency lognormal:2000,0.4
+    python stubs.py zauth  --port 5557 --latency uniform:5,30
+
+Latency specs (all values in milliseconds):
+    fixed:MS
+    uniform:LOW,HIGH
+    normal:MEAN,STDDEV
+    lognormal:MEDIAN,SIGMA
+
+The zauth stub implements just enough of OAuth2 for `auth_views.login` and
+`auth_views.callback`: /oauth/authorize redirects straight back with a code,
+/oauth/token returns a token that embeds the user, and /current_user returns
+the same user. Pass `username=` to /oauth/authorize to pick who logs in.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import zlib
+from typing import Any, List
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Form, Header, HTTPException
+from fastapi.responses import RedirectResponse
+from pydantic import BaseModel
+import uvicorn
+
+
+def parse_latency(spec):
+    """
+    Parse a latency spec into a function returning a delay in seconds.
+
+    Args:
+        spec: e.g. "fixed:20" or "lognormal:150,0.5"
+
+    Returns:
+        callable: Draws one delay per call
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(*values) / 1000
+    if kind == 'normal' and len(values) == 2:
+        return lambda: max(0.0, random.gauss(*values)) / 1000
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise argparse.ArgumentTypeError(f'invalid latency spec: {spec!r}')
+
+
+class Behaviour:
+    """Latency and failure injection shared by every stub endpoint."""
+
+    def __init__(self, latency, error_rate):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    async def delay(self):
+        await asyncio.sleep(self.latency())
+        if random.random() < self.error_rate:
+            raise HTTPException(status_code=503, detail='Injected failure')
+
+
+# Grader -------------------------------------------------------------------
+
+class TestCase(BaseModel):
+    id: int
+    input_data: Any
+    expected_output: str
+    is_public: bool = True
+
+
+class GradeRequest(BaseModel):
+    problem_id: int
+    code: str
+    tests: List[TestCase]
+
+
+def grader_app(behaviour, pass_rate):
+    app = FastAPI()
+
+    @app.post('/')
+    async def grade_submission(request: GradeRequest):
+        await behaviour.delay()
+        correct = random.random() < pass_rate
+        results = []
+        for index, test in enumerate(request.tests):
+            # A wrong answer fails one test; everything else passes
+            passed = correct or index != 0
+            results.append({
+                'test_id': test.id,
+                'input': test.input_data,
+                'expected': test.expected_output,
+                'actual': test.expected_output if passed else 'None',
+                'passed': passed,
+                'is_public': test.is_public,
+            })
+        return {
+            'correct': correct,
+            'results': results,
+            'total_tests': len(request.tests),
+            'passed_tests': sum(1 for r in results if r['passed']),
+        }
+
+    @app.get('/health')
+    async def health_check():
+        return {'status': 'ok'}
+
+    return app
+
+
+# LLM ----------------------------------------------------------------------
+
+class CodeRequest(BaseModel):
+    code: str = ''
+    prompt: str = ''
+
+
+def llm_app(behaviour):
+    app = FastAPI()
+
+    @app.post('/')
+    async def generate_response(request: CodeRequest):
+        await behaviour.delay()
+        return {'code': f'# {request.prompt}\n{request.code}'}
+
+    return app
+
+
+# zauth --------------------------------------------------------------------
+
+def _user_for(username):
+    return {
+        'id': zlib.crc32(username.encode('utf-8')) & 0x7FFFFFFF,
+        'username': username,
+        'name': username,
+        'picture': None,
+    }
+
+
+def _encode(user):
+    return base64.urlsafe_b64encode(json.dumps(user).encode('utf-8')).decode('ascii')
+
+
+def _decode(value):
+    try:
+        return json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Unknown code or token')
+
+
+def zauth_app(behaviour):
+    app = FastAPI()
+
+    @app.get('/oauth/authorize')
+    async def authorize(redirect_uri: str, state: str = '', username: str = ''):
+        await behaviour.delay()
+        user = _user_for(username or f'loadtest-{random.randrange(10**6)}')
+        query = urlencode({'code': _encode(user), 'state': state})
+        return RedirectResponse(f'{redirect_uri}?{query}', status_code=302)
+
+    @app.post('/oauth/token')
+    async def token(code: str = Form(...)):
+        await behaviour.delay()
+        user = _decode(code)
+        return {
+            'access_token': _encode(user),
+            'token_type': 'Bearer',
+            'expires_in': 3600,
+            'scope': 'public',
+            'user': user,
+        }
+
+    @app.get('/current_user')
+    async def current_user(authorization: str = Header('')):
+        await behaviour.delay()
+        return _decode(authorization.removeprefix('Bearer '))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a stub grader, LLM or zauth service.')
+    parser.add_argument('service', choices=['grader', 'llm', 'zauth'])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--latency', type=parse_latency, default='fixed:0',
+                        help='Response delay distribution (default: fixed:0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a 503 (default: 0)')
+    parser.add_argument('--pass-rate', type=float, default=0.5,
+                        help='Grader only: fraction of submissions graded correct (default: 0.5)')
+    args = parser.parse_args()
+
+    behaviour = Behaviour(args.latency, args.error_rate)
+    if args.service == 'grader':
+        app = grader_app(behaviour, args.pass_rate)
+    elif args.service == 'llm':
+        app = llm_app(behaviour)
+    else:
+        app = zauth_app(behaviour)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()